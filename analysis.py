@@ -0,0 +1,182 @@
+"""
+Batch analysis: best move, score, nodes and time for every position of a FEN or EPD file.
+
+    python analysis.py positions.epd --depth 4 --workers 8 --format jsonl -o results.jsonl
+    zcat games.fen.gz | python analysis.py - --movetime 0.2 > results.csv
+
+Positions are read lazily, one per line: a full FEN or an EPD record, either
+followed by EPD operations, whose id operation (if any) is copied to the output.
+Lines that are empty or start with # are skipped; a line that isn't a position,
+or whose search fails, gets a row with an error.
+
+Work is sent to a process pool in chunks of --chunksize positions, and at most
+--in-flight chunks are out at a time, so memory stays bounded however long the
+input is. Rows come out in input order, written as soon as their chunk and all
+earlier ones are done. analyse() is the same pipeline as a generator for use
+from Python.
+"""
+import argparse
+import csv
+import itertools
+import json
+import multiprocessing as mp
+import sys
+from collections import deque
+from typing import IO, Iterable, Iterator, Optional
+
+import chess
+
+from chess_run import MAX_DEPTH, SearchOptions, search_move
+from engine import forking
+from transposition import TranspositionTable
+
+RESULT_FIELDS = ["index", "id", "fen", "move", "score", "depth", "nodes", "seconds", "error"]
+
+
+def read_positions(lines: Iterable[str]) -> Iterator[tuple[int, str]]:
+    """(line number, text) for each position line, read lazily."""
+    for number, line in enumerate(lines, 1):
+        line = line.strip()
+        if line and not line.startswith("#"):
+            yield number, line
+
+
+def _parse(record: str) -> tuple[chess.Board, str]:
+    """Board and EPD id of one input line: a FEN or an EPD record, either of them
+    followed by EPD operations. A FEN's move counters become its hmvc and fmvn."""
+    fields = record.split(None, 4)
+    if len(fields) < 4:
+        raise ValueError(f"expected at least 4 fields, got {len(fields)}")
+    rest = fields[4] if len(fields) > 4 else ""
+    counters = rest.split(None, 2)
+    if len(counters) >= 2 and counters[0].isdigit() and counters[1].rstrip(";").isdigit():
+        ops = f"hmvc {counters[0]}; fmvn {counters[1].rstrip(';')};"
+        rest = f"{ops} {counters[2]}" if len(counters) > 2 else ops
+    board = chess.Board()
+    ops = board.set_epd(" ".join(fields[:4] + [rest]).strip())
+    return board, str(ops.get("id", ""))
+
+
+#one table per side to move in each worker process, reused across positions
+_tables: dict = {}
+
+
+def analyse_position(number: int, record: str, depth: int, time_limit: Optional[float] = None,
+                     options: Optional[SearchOptions] = None, hash_mb: int = 16) -> dict:
+    """Result row for one input line."""
+    row = dict.fromkeys(RESULT_FIELDS, "")
+    row["index"] = number
+    try:
+        board, row["id"] = _parse(record)
+    except ValueError as e:
+        row["fen"], row["error"] = record, f"bad position: {e}"
+        return row
+    row["fen"] = board.fen()
+    if board.is_game_over():
+        row["error"] = "game over"
+        return row
+    #a position the search can't handle costs its own row, not the rest of the batch
+    try:
+        if board.turn not in _tables:
+            _tables[board.turn] = TranspositionTable(hash_mb)
+        mv, stats = search_move(board, board.turn, depth, tt=_tables[board.turn], time_limit=time_limit,
+                                options=options)
+    except Exception as e:
+        row["error"] = f"search failed: {type(e).__name__}: {e}"
+        return row
+    row.update(move=mv.uci(), score=stats.score, depth=stats.depth, nodes=stats.nodes,
+               seconds=round(stats.seconds, 6))
+    return row
+
+
+def _analyse_chunk(args) -> list[dict]:
+    """Pool worker: analyse a chunk of (line number, record) pairs."""
+    chunk, depth, time_limit, options, hash_mb = args
+    return [analyse_position(number, record, depth, time_limit, options, hash_mb) for number, record in chunk]
+
+
+def analyse(lines: Iterable[str], depth: int = 3, time_limit: Optional[float] = None,
+            workers: int = 1, options: Optional[SearchOptions] = None, chunksize: int = 64,
+            in_flight: Optional[int] = None, hash_mb: int = 16) -> Iterator[dict]:
+    """Result rows (see RESULT_FIELDS) for the positions in lines, in input order.
+
+    With time_limit (seconds per position) the search deepens up to depth until it
+    runs out. workers > 1 spreads chunks of chunksize positions over a process pool,
+    keeping at most in_flight chunks (default 2 per worker) queued or running.
+    """
+    positions = read_positions(lines)
+    if workers <= 1:
+        for number, record in positions:
+            yield analyse_position(number, record, depth, time_limit, options, hash_mb)
+        return
+    in_flight = in_flight or 2 * workers
+    chunks = iter(lambda: list(itertools.islice(positions, chunksize)), [])
+    with forking(), mp.Pool(workers) as pool:
+        pending: deque = deque()
+        for chunk in chunks:
+            pending.append(pool.apply_async(_analyse_chunk, ((chunk, depth, time_limit, options, hash_mb),)))
+            #hand back the oldest chunk before reading more, so at most in_flight are held
+            if len(pending) >= in_flight:
+                yield from pending.popleft().get()
+        while pending:
+            yield from pending.popleft().get()
+
+
+def write_results(rows: Iterable[dict], out: IO[str], fmt: str = "csv") -> int:
+    """Stream rows to out as CSV (with a header) or JSON lines; returns the number written."""
+    count = 0
+    if fmt == "csv":
+        writer = csv.DictWriter(out, fieldnames=RESULT_FIELDS)
+        writer.writeheader()
+        write = writer.writerow
+    elif fmt == "jsonl":
+        def write(row):
+            out.write(json.dumps(row) + "\n")
+    else:
+        raise ValueError(f"unknown format {fmt!r}")
+    for row in rows:
+        write(row)
+        count += 1
+        #keep the output current for whoever tails it
+        if count % 1000 == 0:
+            out.flush()
+    out.flush()
+    return count
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Best moves for a file of FEN/EPD positions.")
+    parser.add_argument("input", help="FEN/EPD file, one position per line, or - for stdin")
+    parser.add_argument("-o", "--output", default="-", help="output file (default stdout)")
+    parser.add_argument("--format", choices=["csv", "jsonl"], default="csv")
+    parser.add_argument("--depth", type=int, default=None,
+                        help="search depth (default 3, or the maximum with --movetime)")
+    parser.add_argument("--movetime", type=float, default=None,
+                        help="seconds per position, deepening up to --depth")
+    parser.add_argument("--workers", type=int, default=mp.cpu_count())
+    parser.add_argument("--chunksize", type=int, default=64, help="positions per pool task")
+    parser.add_argument("--in-flight", type=int, default=None,
+                        help="chunks queued or running at once (default 2 per worker)")
+    parser.add_argument("--qdepth", type=int, default=0, help="quiescence plies past the horizon")
+    parser.add_argument("--evaluate", action="store_true", help="score leaves with evaluation.py")
+    args = parser.parse_args()
+    depth = args.depth
+    if depth is None:
+        depth = MAX_DEPTH if args.movetime is not None else 3
+    options = SearchOptions(qdepth=args.qdepth, evaluate=args.evaluate)
+
+    source = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8")
+    out = sys.stdout if args.output == "-" else open(args.output, "w", newline="", encoding="utf-8")
+    try:
+        rows = analyse(source, depth, args.movetime, args.workers, options, args.chunksize, args.in_flight)
+        count = write_results(rows, out, args.format)
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if out is not sys.stdout:
+            out.close()
+    print(f"Analysed {count} positions.", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,528 @@
+"""
+Search benchmarks. Run with
+    python benchmark.py
+Numbers are wall-clock on the current machine, so compare runs made on the same box.
+
+The regression suite (perft, search vs minimax, move ordering / reward micro-benchmarks)
+writes its metrics as JSON and checks them against a stored baseline:
+
+    python benchmark.py --suite --json bench.json                     # record
+    python benchmark.py --suite --baseline benchmark_baseline.json    # exit 1 on a regression
+
+Each metric says which way is better. Rates and times regress when they are worse
+than the baseline by more than --threshold (a fraction, 0.25 by default); node
+counts are exact, so any change in them is reported (a search change, not noise).
+Timings are the best of --repeat samples, and are compared in units of a fixed
+python-chess workload timed in the same run (calibrate), so a baseline roughly
+carries over between machines; refresh it on the machine that runs the check
+before tightening the threshold.
+
+The start-up benchmark times a worker that evaluates one position from nothing:
+a fresh interpreter importing engine.py, chess_run.py, or the star imports the
+experiment scripts used to do (what a spawned pool worker pays), and a worker
+forked from a parent inside engine.forking().
+"""
+import argparse
+import json
+import multiprocessing as mp
+import platform
+import random
+import subprocess
+import sys
+import os
+import time
+from datetime import datetime
+from typing import Optional
+
+import chess
+
+from chess_run import *
+from engine import evaluate_fen, forking
+from evaluation import bitboards, evaluate, evaluate_batch
+from position import SearchPosition, board_perft, perft
+from see import see
+from testing_openings import OPENING_FENS
+from testing_position import PERFT_CASES
+
+BENCH_FENS = dict(OPENING_FENS, **{"Start": chess.STARTING_FEN})
+# the usual names of the perft positions, in PERFT_CASES order
+PERFT_NAMES = ["start", "kiwipete", "position3", "position4", "position5"]
+SUITE_THRESHOLD = 0.25
+# what a fresh worker process runs to evaluate one position, by import path
+STARTUP_SCRIPTS = {
+    "engine": "import engine; engine.evaluate_fen({fen!r})",
+    "chess_run": "import chess, chess_run; chess_run.evaluate(chess.Board({fen!r}))",
+    "star_imports": "from chess_run import *; from testing_openings import *; evaluate(chess.Board({fen!r}))",
+}
+
+
+def bench_search_nps(depth: int = 4) -> list[dict]:
+    """Fixed-depth alpha-beta on each benchmark position: nodes, seconds, nodes per second."""
+    rows = []
+    for name, fen in BENCH_FENS.items():
+        board = chess.Board(fen)
+        ctx = SearchContext()
+        start = time.perf_counter()
+        score, _ = search(board, depth, -10**9, 10**9, board.turn, ctx=ctx)
+        elapsed = time.perf_counter() - start
+        rows.append({
+            "position": name,
+            "depth": depth,
+            "score": score,
+            "nodes": ctx.stats.nodes,
+            "seconds": elapsed,
+            "nps": ctx.stats.nodes / elapsed if elapsed else 0.0,
+        })
+    return rows
+
+
+def bench_move_ordering(repeat: int = 200) -> list[dict]:
+    """Microseconds per call of the old sort-key ordering vs. the staged generator."""
+    rows = []
+    for name, fen in BENCH_FENS.items():
+        board = chess.Board(fen)
+        start = time.perf_counter()
+        for _ in range(repeat):
+            order_moves(board)
+        sorted_us = (time.perf_counter() - start) / repeat * 1e6
+        start = time.perf_counter()
+        for _ in range(repeat):
+            list(staged_moves(board))
+        staged_us = (time.perf_counter() - start) / repeat * 1e6
+        rows.append({"position": name, "order_moves_us": sorted_us, "staged_moves_us": staged_us})
+    return rows
+
+
+def _timed_move(board: chess.Board, depth: int, options: Optional[SearchOptions] = None):
+    """One alpha-beta decision for the side to move: (move, nodes, seconds)."""
+    ctx = SearchContext(options=options)
+    start = time.perf_counter()
+    _, mv = search(board, depth, -10**9, 10**9, board.turn, ctx=ctx)
+    if mv is None:
+        mv = choose_bot_move_capture_pref(board)
+    return mv, ctx.stats.nodes, time.perf_counter() - start
+
+
+def _material(board: chess.Board, color: chess.Color) -> int:
+    return sum(VAL[pt] * len(board.pieces(pt, color)) for pt in VAL)
+
+
+def bench_quiescence(shallow: int = 2, deep: int = 4, qdepth: int = 6, max_plies: int = 120) -> list[dict]:
+    """Depth `shallow` + quiescence against plain depth `deep`, from every benchmark position
+    with both colours. Games still running after max_plies are adjudicated on material.
+    Reports the result for the quiescence bot and the nodes/seconds each side spent.
+    """
+    quiet = SearchOptions(qdepth=qdepth)
+    rows = []
+    for name, fen in BENCH_FENS.items():
+        for q_color in (chess.WHITE, chess.BLACK):
+            board = chess.Board(fen)
+            spent = {True: [0, 0.0], False: [0, 0.0]}
+            for _ in range(max_plies):
+                if board.is_game_over():
+                    break
+                is_q = board.turn == q_color
+                mv, nodes, secs = _timed_move(board, shallow if is_q else deep, quiet if is_q else None)
+                spent[is_q][0] += nodes
+                spent[is_q][1] += secs
+                board.push(mv)
+            outcome = board.outcome()
+            if outcome is not None:
+                diff = 0 if outcome.winner is None else (1 if outcome.winner == q_color else -1)
+            else:
+                diff = _material(board, q_color) - _material(board, not q_color)
+            rows.append({
+                "position": name,
+                "q_color": side_name(q_color),
+                "result": "win" if diff > 0 else ("loss" if diff < 0 else "draw"),
+                "plies": len(board.move_stack),
+                f"d{shallow}q_nodes": spent[True][0],
+                f"d{deep}_nodes": spent[False][0],
+                f"d{shallow}q_seconds": spent[True][1],
+                f"d{deep}_seconds": spent[False][1],
+            })
+    return rows
+
+
+def bench_parallel(depth: int = 4, workers: int = 4, seed: int = 0) -> list[dict]:
+    """Serial search vs. root-split parallel_search: seconds and speedup per position."""
+    rows = []
+    for name, fen in BENCH_FENS.items():
+        board = chess.Board(fen)
+        start = time.perf_counter()
+        serial_score, _ = search(board, depth, -10**9, 10**9, board.turn)
+        serial_s = time.perf_counter() - start
+        ctx = SearchContext()
+        start = time.perf_counter()
+        par_score, _ = parallel_search(board, depth, board.turn, workers, ctx=ctx, seed=seed)
+        par_s = time.perf_counter() - start
+        rows.append({
+            "position": name,
+            "workers": workers,
+            "same_score": serial_score == par_score,
+            "serial_seconds": serial_s,
+            "parallel_seconds": par_s,
+            "speedup": serial_s / par_s if par_s else 0.0,
+            "parallel_nodes": ctx.stats.nodes,
+        })
+    return rows
+
+
+def bench_compact(depth: int = 4, perft_depth: int = 3) -> list[dict]:
+    """chess.Board vs. SearchPosition: perft seconds and alpha-beta nodes per second."""
+    rows = []
+    for name, fen in BENCH_FENS.items():
+        board = chess.Board(fen)
+        start = time.perf_counter()
+        board_perft(board, perft_depth)
+        board_perft_s = time.perf_counter() - start
+        pos = SearchPosition.from_board(board)
+        start = time.perf_counter()
+        perft(pos, perft_depth)
+        compact_perft_s = time.perf_counter() - start
+        row = {"position": name, "board_perft_s": board_perft_s, "compact_perft_s": compact_perft_s}
+        for compact in (False, True):
+            ctx = SearchContext(options=SearchOptions(compact=compact))
+            start = time.perf_counter()
+            search(board, depth, -10**9, 10**9, board.turn, ctx=ctx)
+            elapsed = time.perf_counter() - start
+            row["compact_nps" if compact else "board_nps"] = ctx.stats.nodes / elapsed if elapsed else 0.0
+        rows.append(row)
+    return rows
+
+
+def bench_evaluation(repeat: int = 5) -> list[dict]:
+    """Static evaluation of every position two plies below each benchmark position:
+    one evaluate_batch call vs. evaluate() in a Python loop, in positions per second."""
+    rows = []
+    for name, fen in BENCH_FENS.items():
+        board = chess.Board(fen)
+        leaves = []
+        for mv in board.legal_moves:
+            board.push(mv)
+            for reply in board.legal_moves:
+                board.push(reply)
+                leaves.append(board.copy(stack=False))
+                board.pop()
+            board.pop()
+        #the first batch loads NumPy and the weights
+        evaluate_batch([bitboards(board)])
+        start = time.perf_counter()
+        for _ in range(repeat):
+            loop = [evaluate(leaf) for leaf in leaves]
+        loop_s = (time.perf_counter() - start) / repeat
+        start = time.perf_counter()
+        for _ in range(repeat):
+            batch = evaluate_batch([bitboards(leaf) for leaf in leaves])
+        batch_s = (time.perf_counter() - start) / repeat
+        rows.append({
+            "position": name,
+            "leaves": len(leaves),
+            "same_scores": loop == batch,
+            "loop_pos_per_s": len(leaves) / loop_s,
+            "batch_pos_per_s": len(leaves) / batch_s,
+            "speedup": loop_s / batch_s,
+        })
+    return rows
+
+
+def bench_see(repeat: int = 20) -> list[dict]:
+    """Static exchange evaluation calls per second over the captures two plies below each
+    benchmark position, next to captured_piece_value (the victim-only ranking it refines)."""
+    rows = []
+    for name, fen in BENCH_FENS.items():
+        board = chess.Board(fen)
+        captures = []
+        for mv in board.legal_moves:
+            board.push(mv)
+            for reply in board.legal_moves:
+                board.push(reply)
+                leaf = board.copy(stack=False)
+                captures.extend((leaf, c) for c in leaf.generate_legal_captures())
+                board.pop()
+            board.pop()
+        start = time.perf_counter()
+        for _ in range(repeat):
+            for leaf, c in captures:
+                see(leaf, c)
+        see_s = (time.perf_counter() - start) / repeat
+        start = time.perf_counter()
+        for _ in range(repeat):
+            for leaf, c in captures:
+                captured_piece_value(leaf, c)
+        victim_s = (time.perf_counter() - start) / repeat
+        rows.append({
+            "position": name,
+            "captures": len(captures),
+            "see_calls_per_s": len(captures) / see_s,
+            "victim_calls_per_s": len(captures) / victim_s,
+        })
+    return rows
+
+
+def bench_see_tree(depth: int = 4, qdepth: int = 6) -> list[dict]:
+    """Alpha-beta with quiescence, captures ordered by MVV-LVA vs. by SEE (with losing
+    captures pruned in quiescence): nodes and seconds."""
+    rows = []
+    for name, fen in BENCH_FENS.items():
+        board = chess.Board(fen)
+        row = {"position": name}
+        for use_see in (False, True):
+            ctx = SearchContext(options=SearchOptions(qdepth=qdepth, see=use_see))
+            start = time.perf_counter()
+            score, _ = search(board, depth, -10**9, 10**9, board.turn, ctx=ctx)
+            tag = "see" if use_see else "mvv_lva"
+            row[f"{tag}_score"] = score
+            row[f"{tag}_nodes"] = ctx.stats.nodes
+            row[f"{tag}_s"] = time.perf_counter() - start
+        row["node_ratio"] = row["see_nodes"] / row["mvv_lva_nodes"]
+        rows.append(row)
+    return rows
+
+
+def _best_time(fn, repeat: int, min_seconds: float = 0.2):
+    """(result of fn, fewest seconds per call over repeat samples). A sample calls fn
+    as often as it takes to fill min_seconds, so short calls aren't timed one by one."""
+    best = float("inf")
+    for _ in range(repeat):
+        calls = 0
+        start = time.perf_counter()
+        while True:
+            result = fn()
+            calls += 1
+            elapsed = time.perf_counter() - start
+            if elapsed >= min_seconds:
+                break
+        best = min(best, elapsed / calls)
+    return result, best
+
+
+def calibrate(repeat: int = 5) -> float:
+    """Seconds for a fixed python-chess workload (perft 3 from the start position). Suite
+    timings are compared in units of it, so a slower or busier machine doesn't read as
+    a regression."""
+    board = chess.Board()
+    return _best_time(lambda: board_perft(board, 3), repeat)[1]
+
+
+def bench_perft(depth: int = 3, repeat: int = 3) -> list[dict]:
+    """Perft on the standard positions: node count, SearchPosition and chess.Board nodes per second."""
+    rows = []
+    for name, (fen, counts) in zip(PERFT_NAMES, PERFT_CASES.items()):
+        board = chess.Board(fen)
+        nodes, compact_s = _best_time(lambda: perft(SearchPosition.from_board(board), depth), repeat)
+        _, board_s = _best_time(lambda: board_perft(board, depth), repeat)
+        rows.append({
+            "position": name,
+            "depth": depth,
+            "nodes": nodes,
+            "correct": nodes == counts[depth - 1],
+            "compact_nps": nodes / compact_s,
+            "board_nps": nodes / board_s,
+        })
+    return rows
+
+
+def bench_search_vs_minimax(depth: int = 3, repeat: int = 1) -> list[dict]:
+    """Fixed-depth search vs. min_max_search on the opening positions: nodes, seconds, same score."""
+    rows = []
+    for name, fen in OPENING_FENS.items():
+        board = chess.Board(fen)
+
+        def alphabeta():
+            ctx = SearchContext()
+            #fixed tie-breaks, so the node count only moves when the search does
+            ctx.rng = random.Random(0)
+            score, _ = search(board, depth, -10**9, 10**9, board.turn, ctx=ctx)
+            return score, ctx.stats.nodes
+
+        def minimax():
+            stats = SearchStats(algorithm="minimax")
+            score, _ = min_max_search(board, depth, board.turn, stats=stats)
+            return score, stats.nodes
+
+        (ab_score, ab_nodes), ab_s = _best_time(alphabeta, repeat)
+        (mm_score, mm_nodes), mm_s = _best_time(minimax, repeat)
+        rows.append({
+            "position": name,
+            "depth": depth,
+            "same_score": ab_score == mm_score,
+            "search_nodes": ab_nodes,
+            "search_seconds": ab_s,
+            "minimax_nodes": mm_nodes,
+            "minimax_seconds": mm_s,
+            "node_ratio": ab_nodes / mm_nodes,
+        })
+    return rows
+
+
+def bench_reward_and_ordering(calls: int = 200, repeat: int = 3) -> list[dict]:
+    """Microseconds per order_moves call and per immediate_reward call on each benchmark
+    position (calls calls per timing, best of repeat timings)."""
+    rows = []
+    for name, fen in BENCH_FENS.items():
+        board = chess.Board(fen)
+        moves = list(board.legal_moves)
+        _, order_s = _best_time(lambda: [order_moves(board) for _ in range(calls)], repeat)
+        _, reward_s = _best_time(lambda: [immediate_reward(board, m, board.turn) for _ in range(calls) for m in moves],
+                                 repeat)
+        rows.append({
+            "position": name,
+            "order_moves_us": order_s / calls * 1e6,
+            "immediate_reward_us": reward_s / (calls * len(moves)) * 1e6,
+        })
+    return rows
+
+
+def _evaluate_into(conn, fen: str) -> None:
+    conn.send(evaluate_fen(fen))
+    conn.close()
+
+
+def bench_startup(repeat: int = 5) -> list[dict]:
+    """Milliseconds from starting a worker to its evaluation of one position (best of
+    repeat), and the modules it had loaded: a new interpreter for each STARTUP_SCRIPTS
+    entry, then a fork of this process inside forking()."""
+    fen = OPENING_FENS["Queen's Gambit"]
+    here = os.path.dirname(os.path.abspath(__file__))
+    rows = []
+    for name, script in STARTUP_SCRIPTS.items():
+        code = script.format(fen=fen) + "; import sys; print(len(sys.modules))"
+        best = float("inf")
+        for _ in range(repeat):
+            start = time.perf_counter()
+            out = subprocess.run([sys.executable, "-c", code], cwd=here, capture_output=True, text=True, check=True)
+            best = min(best, time.perf_counter() - start)
+        rows.append({"worker": name, "ms": best * 1000, "modules": int(out.stdout)})
+    if "fork" in mp.get_all_start_methods():
+        ctx = mp.get_context("fork")
+        best = float("inf")
+        with forking():
+            for _ in range(repeat):
+                start = time.perf_counter()
+                receive, send = ctx.Pipe(duplex=False)
+                worker = ctx.Process(target=_evaluate_into, args=(send, fen))
+                worker.start()
+                receive.recv()
+                best = min(best, time.perf_counter() - start)
+                worker.join()
+        rows.append({"worker": "fork_preloaded", "ms": best * 1000, "modules": len(sys.modules)})
+    return rows
+
+
+def run_suite(repeat: int = 3) -> dict:
+    """The regression suite as {"meta": ..., "metrics": {name: {"value", "better"}}};
+    better is "higher", "lower" or "exact"."""
+    metrics = {}
+    calibration = calibrate(max(repeat, 5))
+
+    def add(name: str, value, better: str) -> None:
+        metrics[name] = {"value": value, "better": better}
+
+    for row in bench_perft(3, repeat):
+        prefix = f"perft/{row['position']}/d{row['depth']}"
+        add(f"{prefix}/nodes", row["nodes"], "exact")
+        add(f"{prefix}/compact_nps", row["compact_nps"], "higher")
+        add(f"{prefix}/board_nps", row["board_nps"], "higher")
+    for row in bench_search_vs_minimax(3, repeat):
+        prefix = f"search/{row['position']}/d{row['depth']}"
+        add(f"{prefix}/search_nodes", row["search_nodes"], "exact")
+        add(f"{prefix}/search_seconds", row["search_seconds"], "lower")
+        add(f"{prefix}/minimax_nodes", row["minimax_nodes"], "exact")
+        add(f"{prefix}/minimax_seconds", row["minimax_seconds"], "lower")
+    for row in bench_reward_and_ordering(repeat=repeat):
+        prefix = f"micro/{row['position']}"
+        add(f"{prefix}/order_moves_us", row["order_moves_us"], "lower")
+        add(f"{prefix}/immediate_reward_us", row["immediate_reward_us"], "lower")
+    for row in bench_startup(max(repeat, 5)):
+        add(f"startup/{row['worker']}_ms", row["ms"], "lower")
+    meta = {
+        "date": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "chess": chess.__version__,
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "repeat": repeat,
+        "calibration_seconds": calibration,
+    }
+    return {"meta": meta, "metrics": metrics}
+
+
+def compare_results(current: dict, baseline: dict, threshold: float = SUITE_THRESHOLD) -> list[str]:
+    """One line per metric of current that regressed against baseline (see module docstring).
+    Rates and times are first rescaled by the two runs' calibration. Metrics missing
+    from either side are skipped."""
+    #how much slower the current machine ran the reference workload
+    speed = current["meta"]["calibration_seconds"] / baseline["meta"]["calibration_seconds"]
+    problems = []
+    for name, metric in current["metrics"].items():
+        if name not in baseline["metrics"]:
+            continue
+        value, base, better = metric["value"], baseline["metrics"][name]["value"], metric["better"]
+        if better == "exact":
+            bad = value != base
+        elif better == "higher":
+            value *= speed
+            bad = value < base * (1 - threshold)
+        else:
+            value /= speed
+            bad = value > base * (1 + threshold)
+        if bad:
+            change = f" ({value / base - 1:+.1%})" if better != "exact" and base else ""
+            problems.append(f"{name}: {value:.6g} (calibrated) vs baseline {base:.6g}{change}, {better} is better"
+                            if better != "exact" else f"{name}: {value} vs baseline {base}, must not change")
+    return problems
+
+
+def print_rows(title: str, rows: list[dict]) -> None:
+    print(f"\n{title}")
+    print("-" * len(title))
+    for row in rows:
+        print("  ".join(f"{k}={v:.3f}" if isinstance(v, float) else f"{k}={v}" for k, v in row.items()))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Search benchmarks.")
+    parser.add_argument("--suite", action="store_true",
+                        help="run the regression suite only (perft, search vs minimax, micro-benchmarks, start-up)")
+    parser.add_argument("--json", default=None, help="write the suite's metrics to this file")
+    parser.add_argument("--baseline", default=None, help="compare the suite against this JSON file")
+    parser.add_argument("--threshold", type=float, default=SUITE_THRESHOLD,
+                        help="allowed fractional slowdown before a timing counts as a regression")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per measurement (best is kept)")
+    args = parser.parse_args()
+    if not args.suite:
+        report()
+        return
+    results = run_suite(args.repeat)
+    for name, metric in results["metrics"].items():
+        value = metric["value"]
+        print(f"{name} = {value:.3f}" if isinstance(value, float) else f"{name} = {value}")
+    if args.json is not None:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    if args.baseline is not None:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        problems = compare_results(results, baseline, args.threshold)
+        for line in problems:
+            print(f"REGRESSION {line}")
+        print(f"{len(problems)} regressions against {args.baseline} (threshold {args.threshold:.0%})")
+        if problems:
+            sys.exit(1)
+
+
+def report() -> None:
+    print_rows("search nodes/second (depth 4)", bench_search_nps(4))
+    print_rows("move ordering, microseconds per node", bench_move_ordering())
+    print_rows("chess.Board vs SearchPosition", bench_compact())
+    print_rows("static evaluation, Python loop vs NumPy batch", bench_evaluation())
+    print_rows("static exchange evaluation, calls per second", bench_see())
+    print_rows("tree size, MVV-LVA vs SEE capture ordering (depth 4, qdepth 6)", bench_see_tree())
+    print_rows("worker start-up, evaluating one position", bench_startup())
+    print_rows(f"parallel root split, {os.cpu_count()} cores", bench_parallel())
+    print_rows("depth 2 + quiescence vs depth 4", bench_quiescence())
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,31 @@
 # File: /mnt/data/chess_run.py
 # -*- coding: utf-8 -*-
+import math
 import sys
 import random
-from datetime import datetime
-from typing import Optional, Tuple
+import threading
+import time
+from collections import Counter
+from contextlib import nullcontext
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Iterator, Optional, Tuple
 
 import chess
 
+from engine import forking
+from evaluation import bitboards, evaluate, evaluate_batch
+from position import SearchPosition, from_move, to_move
+from profiling import decision_profile
+from see import see as static_exchange
+from telemetry import SearchStats
+from transposition import EXACT, LOWER, UPPER, TranspositionTable
+from zobrist import board_key, push_keyed
+
+if TYPE_CHECKING:
+    #only in annotations; the book and tablebase modules load when a caller passes one
+    from opening_book import OpeningBook
+    from tablebase import Tablebase
+
 # ---------------- UI helpers ----------------
 def print_board(board: chess.Board) -> None:
     print("\nCurrent Board Position:")
@@ -101,6 +120,13 @@ PROMOTION_BONUS = {
     chess.KNIGHT: 2,  # 3 - 1
 }
 MATE_SCORE = 1_000
+# deepest iteration a time-limited search will attempt
+MAX_DEPTH = 64
+# score of a checkmated node below the root: its own MATE_SCORE plus the
+# MATE_SCORE immediate_reward gives the mating move
+_MATED_CHILD = 2 * MATE_SCORE
+# a bound seen from the other side points the other way
+_FLIP_BOUND = {EXACT: EXACT, LOWER: UPPER, UPPER: LOWER}
 
 
 def captured_piece_value(board: chess.Board, move: chess.Move) -> int:
@@ -117,7 +143,23 @@ def promotion_value(move: chess.Move) -> int:
     return PROMOTION_BONUS.get(move.promotion, 0) if move.promotion else 0
 
 
+def material_gain(board: chess.Board, move: chess.Move) -> int:
+    """Captured value plus promotion bonus won by the side to move, without pushing the move."""
+    gain = PROMOTION_BONUS.get(move.promotion, 0) if move.promotion else 0
+    to_sq = move.to_square
+    if board.occupied_co[not board.turn] & chess.BB_SQUARES[to_sq]:
+        gain += VAL[board.piece_type_at(to_sq)]
+    elif board.ep_square == to_sq and board.is_en_passant(move):
+        gain += VAL[chess.PAWN]
+    return gain
+
+
 def immediate_reward(board: chess.Board, move: chess.Move, bot_color: chess.Color) -> int:
+    """Reward of one edge for bot_color: material_gain, plus MATE_SCORE if the move mates.
+
+    The searches don't call this; they add material_gain per edge and let the
+    mated child score the mate (see _MATED_CHILD).
+    """
     mover = board.turn
     score = 0
 
@@ -153,143 +195,1280 @@ def order_moves(board: chess.Board) -> list[chess.Move]:
     moves.sort(key=key, reverse=True)
     return moves
 
+
+def _check_masks(board: chess.Board) -> dict:
+    """Squares from which each piece type of the side to move would attack the enemy king."""
+    king = board.king(not board.turn)
+    if king is None:
+        return {pt: 0 for pt in chess.PIECE_TYPES}
+    occ = board.occupied
+    diag = chess.BB_DIAG_ATTACKS[king][chess.BB_DIAG_MASKS[king] & occ]
+    line = (chess.BB_RANK_ATTACKS[king][chess.BB_RANK_MASKS[king] & occ]
+            | chess.BB_FILE_ATTACKS[king][chess.BB_FILE_MASKS[king] & occ])
+    return {
+        chess.PAWN: chess.BB_PAWN_ATTACKS[not board.turn][king],
+        chess.KNIGHT: chess.BB_KNIGHT_ATTACKS[king],
+        chess.BISHOP: diag,
+        chess.ROOK: line,
+        chess.QUEEN: diag | line,
+        chess.KING: 0,
+    }
+
+
+def staged_moves(board: chess.Board, hash_move: Optional[chess.Move] = None, killers=(),
+                 history: Optional[list[int]] = None, captures_only: bool = False,
+                 see: bool = False) -> Iterator[chess.Move]:
+    """Legal moves best-first, in stages:
+    hash move, captures/promotions by MVV-LVA, killer moves, quiet moves by (gives check, history).
+
+    A stage is only sorted once the caller asks for a move from it, so a cutoff on
+    the hash move or a capture never pays for ordering the quiet moves. The check
+    test is a bitboard lookup for direct checks (discovered checks are not seen).
+    history is indexed by from_square * 64 + to_square for the side to move.
+    captures_only generates just captures and promotions (hash move and killers are ignored).
+    see orders captures by static exchange (see.py) instead: those that win or break even
+    come first, best exchange first, and those that lose material come after the killers.
+    """
+    them = board.occupied_co[not board.turn]
+    if captures_only:
+        hash_move = None
+        noisy = list(board.generate_legal_captures())
+        noisy.extend(board.generate_legal_moves(board.pawns, chess.BB_BACKRANKS & ~board.occupied))
+        quiet = []
+    else:
+        if hash_move is not None:
+            if board.is_legal(hash_move):
+                yield hash_move
+            else:
+                hash_move = None
+        noisy = []
+        quiet = []
+        ep = board.ep_square
+        for mv in board.generate_legal_moves():
+            if mv == hash_move:
+                continue
+            if mv.promotion or them & chess.BB_SQUARES[mv.to_square] or (mv.to_square == ep and board.is_en_passant(mv)):
+                noisy.append(mv)
+            else:
+                quiet.append(mv)
+
+    #most valuable victim first, cheapest attacker breaks ties
+    def mvv_lva(m: chess.Move):
+        victim = board.piece_type_at(m.to_square)
+        gain = VAL[victim] if victim else (VAL[chess.PAWN] if board.is_en_passant(m) else 0)
+        if m.promotion:
+            gain += PROMOTION_BONUS[m.promotion]
+        return gain * 8 - board.piece_type_at(m.from_square)
+
+    losing = []
+    if see:
+        exchange = {m: static_exchange(board, m) for m in noisy}
+        losing = [m for m in noisy if exchange[m] < 0]
+        noisy = [m for m in noisy if exchange[m] >= 0]
+        losing.sort(key=lambda m: (exchange[m], mvv_lva(m)), reverse=True)
+        noisy.sort(key=lambda m: (exchange[m], mvv_lva(m)), reverse=True)
+    else:
+        noisy.sort(key=mvv_lva, reverse=True)
+    yield from noisy
+    if not quiet:
+        yield from losing
+        return
+
+    for killer in killers:
+        if killer is not None and killer != hash_move and killer in quiet:
+            quiet.remove(killer)
+            yield killer
+    yield from losing
+
+    masks = _check_masks(board)
+
+    def quiet_key(m: chess.Move):
+        chk = bool(masks[board.piece_type_at(m.from_square)] & chess.BB_SQUARES[m.to_square])
+        return (chk, history[m.from_square * 64 + m.to_square] if history is not None else 0)
+
+    quiet.sort(key=quiet_key, reverse=True)
+    yield from quiet
+
+def _root_score(board: chess.Board, depth: int, bot_color: chess.Color) -> Optional[int]:
+    """Score of a root that is not searched (depth 0 or game over), else None."""
+    if depth == 0 or board.is_game_over():
+        if board.is_checkmate():
+            return -MATE_SCORE if board.turn == bot_color else MATE_SCORE
+        return 0
+    return None
+
+
+def _leaf_score(board: chess.Board, depth: int, bot_color: chess.Color) -> Optional[int]:
+    """Like _root_score for a node reached by a move; a mate here also pays the mover's reward."""
+    if depth == 0:
+        if board.is_checkmate():
+            return -_MATED_CHILD if board.turn == bot_color else _MATED_CHILD
+        return 0
+    outcome = board.outcome()
+    if outcome is None:
+        return None
+    if outcome.termination == chess.Termination.CHECKMATE:
+        return -_MATED_CHILD if board.turn == bot_color else _MATED_CHILD
+    return 0
+
 # --- regular min and max algorithm WITHOUT alpha-beta pruning
 # Source pseudocode: https://www.chessprogramming.org/Minimax
-def min_value(board, depth, bot_color):
-    if depth ==0 or board.is_game_over():
-        #if game over mate score returned
-        if board.is_checkmate():
-            return (-MATE_SCORE if board.turn == bot_color else MATE_SCORE), None
-        return 0, None
+def min_value(board, depth, bot_color, tt=None, key=0, stats=None, ply=0):
+    if stats is not None:
+        stats.nodes += 1
+        if ply > stats.max_ply:
+            stats.max_ply = ply
+        if stats.ply_nodes is not None:
+            stats.ply_nodes[ply] += 1
+    leaf = _leaf_score(board, depth, bot_color)
+    if leaf is not None:
+        return leaf, None
+    if tt is not None:
+        entry = tt.probe(key, depth)
+        #minimax results are always exact, stored from the side to move's view
+        if (entry is not None and entry.flag == EXACT and entry.depth >= depth
+                and entry.move in board.legal_moves):
+            return -entry.score, entry.move
     best_score = 10**9
     best_move = None
-    for move in order_moves(board):
-        reward = immediate_reward(board, move, bot_color) 
-        board.push(move) 
-        child_score, _= min_value(board, depth -1, bot_color) 
+    if stats is not None:
+        stats.interior_nodes += 1
+    for move in staged_moves(board):
+        #opponent moves here, so material it wins counts against the bot
+        reward = -material_gain(board, move)
+        if tt is not None:
+            child_key = push_keyed(board, key, move)
+        else:
+            child_key = 0
+            board.push(move) 
+        child_score, _= max_value(board, depth -1, bot_color, tt, child_key, stats, ply + 1) 
         board.pop() #remove to avoid future illegal moves 
         #check reward at current depth + one above
         total = reward + child_score
         #update if best_score min found with this possibility
         if total < best_score:
             best_score, best_move = total, move
+    if tt is not None:
+        tt.store(key, depth, -best_score, EXACT, best_move)
     return best_score, best_move
 
-def max_value(board, depth, bot_color):
-    if depth ==0 or board.is_game_over():
-        #if game over mate score returned
-        if board.is_checkmate():
-            return (-MATE_SCORE if board.turn == bot_color else MATE_SCORE), None
-        return 0, None
+def max_value(board, depth, bot_color, tt=None, key=0, stats=None, ply=0):
+    if stats is not None:
+        stats.nodes += 1
+        if ply > stats.max_ply:
+            stats.max_ply = ply
+        if stats.ply_nodes is not None:
+            stats.ply_nodes[ply] += 1
+    leaf = _leaf_score(board, depth, bot_color)
+    if leaf is not None:
+        return leaf, None
+    if tt is not None:
+        entry = tt.probe(key, depth)
+        if (entry is not None and entry.flag == EXACT and entry.depth >= depth
+                and entry.move in board.legal_moves):
+            return entry.score, entry.move
     best_score = -10**9
     best_move = None 
-    for move in order_moves(board):
-        reward = immediate_reward(board, move, bot_color) 
-        board.push(move) 
-        child_score, _ = min_value(board, depth -1, bot_color)  
+    if stats is not None:
+        stats.interior_nodes += 1
+    for move in staged_moves(board):
+        reward = material_gain(board, move)
+        if tt is not None:
+            child_key = push_keyed(board, key, move)
+        else:
+            child_key = 0
+            board.push(move) 
+        child_score, _ = min_value(board, depth -1, bot_color, tt, child_key, stats, ply + 1)  
         board.pop()
         #check reward at current depth + one above
         total = reward + child_score
         #update if best_score exceeded with this possibility
         if total > best_score:
             best_score, best_move = total, move
+    if tt is not None:
+        tt.store(key, depth, best_score, EXACT, best_move)
     return best_score, best_move
 
-def min_max_search(board, depth, bot_color): 
+def min_max_search(board, depth, bot_color, tt: Optional[TranspositionTable] = None,
+                   stats: Optional[SearchStats] = None): 
+    #board may also be a SearchPosition
+    if isinstance(board, SearchPosition):
+        root = _position_root_score(board, depth, bot_color)
+        if root is not None:
+            return root, None
+        return _minimax_position(board, depth, bot_color, tt, stats, 0)
+    root = _root_score(board, depth, bot_color)
+    if root is not None:
+        return root, None
+    key = board_key(board) if tt is not None else 0
     if board.turn == bot_color:
         #alternate between min and max strategy by bot color
-        return max_value(board, depth, bot_color)
-    return min_value(board, depth, bot_color)
-
-#same as choose_bot_move except we call minmax instead of search (alpha-beta pruning)
-def minmax_choose_bot_move(board, bot_color, depth): 
-    if depth <= 0:
-        return choose_bot_move_capture_pref(board) 
-    _, move = min_max_search(board, depth, bot_color )
+        return max_value(board, depth, bot_color, tt, key, stats)
+    return min_value(board, depth, bot_color, tt, key, stats)
+
+#same as search_move except we call minmax instead of search (alpha-beta pruning)
+def minmax_search_move(board, bot_color, depth, tt: Optional[TranspositionTable] = None,
+                       book: Optional["OpeningBook"] = None,
+                       tablebase: Optional["Tablebase"] = None,
+                       profile: Optional[str] = None) -> Tuple[chess.Move, SearchStats]: 
+    """Minimax move for bot_color plus the SearchStats of the decision.
+    A position found in book, or covered by tablebase, is answered from it without searching.
+    profile is a directory to write a profile of the search to (see profiling.py)."""
+    stats = SearchStats(algorithm="minimax")
+    prof = decision_profile(profile, "minimax")
+    start = time.perf_counter()
+    move = book.choose(board) if book is not None else None
+    if move is not None:
+        stats.book = True
+        depth = 0
+    elif tablebase is not None:
+        move = tablebase.best_move(board, stats)
+        if move is not None:
+            stats.tablebase = True
+            depth = 0
+    if depth > 0:
+        if tt is not None:
+            tt.new_search()
+        if prof is not None:
+            stats.ply_nodes = Counter()
+        with prof if prof is not None else nullcontext():
+            stats.score, move = min_max_search(board, depth, bot_color, tt, stats)
+            stats.depth = depth
+            if prof is not None:
+                prof.record(stats)
     if move is None:
-        return choose_bot_move_capture_pref(board) 
-    return move
+        move = choose_bot_move_capture_pref(board) 
+    stats.seconds = time.perf_counter() - start
+    return move, stats
+
+def minmax_choose_bot_move(board, bot_color, depth, tt: Optional[TranspositionTable] = None,
+                           profile: Optional[str] = None): 
+    return minmax_search_move(board, bot_color, depth, tt, profile=profile)[0]
 #-----------
 
-def search(board: chess.Board, depth: int, alpha: int, beta: int, bot_color: chess.Color) -> Tuple[int, Optional[chess.Move]]:
-    """Alpha-beta minimax that sums rewards along the path for bot_color."""
+class SearchTimeout(Exception):
+    """Raised inside search when the wall-clock budget of a move decision runs out."""
+
+
+@dataclass(frozen=True)
+class SearchOptions:
+    """Optional search techniques. The defaults are plain fixed-depth alpha-beta."""
+    # plies of captures/promotions searched past depth 0 (0 = off, leaves score 0)
+    qdepth: int = 0
+    # skip quiescence captures that can't reach alpha even with this many extra pawns (None = off)
+    delta_margin: Optional[int] = 2
+    # search on a SearchPosition (position.py) instead of the chess.Board; no quiescence yet
+    compact: bool = False
+    # score leaves (and quiescence stand-pat) by piece-square tables and mobility from
+    # evaluation.py, in pawns, instead of 0; the children of depth-1 nodes are scored in one batch
+    evaluate: bool = False
+    # selective search, each on its own switch (board search only, not compact):
+    # null-move pruning with this depth reduction R (0 = off); skipped at the root, in check,
+    # right after another null move and when the side to move has only king and pawns (zugzwang)
+    null_move: int = 0
+    # late move reductions: quiet, non-checking moves after the first lmr_moves of a node at
+    # depth >= 3 get a null-window search one ply shallower, re-searched in full if they
+    # beat it (0 = off)
+    lmr_moves: int = 0
+    # futility pruning: at depth-1 nodes not in check, quiet moves after the first are skipped
+    # when the static score (0 without evaluate) plus this many pawns can't reach the window
+    # (None = off)
+    futility_margin: Optional[float] = None
+    # principal variation search: every move after a node's first gets a null-window search
+    # first and a full one only if it lands inside the window; ties keep the earlier move
+    pvs: bool = False
+    # aspiration windows: each iteration of iterative deepening after the first searches
+    # previous score +- this many pawns, then again with the failing side opened (None = off);
+    # a fixed-depth search_move deepens iteratively to get those scores. With evaluate the
+    # half-width is at least the last change of score between iterations (see _aspiration_width)
+    aspiration: Optional[float] = None
+    # static exchange evaluation (see.py): order captures by what the whole exchange nets,
+    # losing ones after the killers, and skip losing captures in quiescence (board search only)
+    see: bool = False
+    # seed of the random choice between equal moves, so a decision repeats exactly
+    # (None = the unseeded module generator, a different choice each run)
+    seed: Optional[int] = 0
+
+
+class SearchContext:
+    """State shared by every node of one move decision (table, clock, principal variation,
+    killer and history tables). It lives across the iterations of iterative deepening.
+    """
+
+    # check the clock once every this many nodes
+    CLOCK_MASK = 255
+
+    def __init__(self, tt: Optional[TranspositionTable] = None, deadline: Optional[float] = None,
+                 instrument: bool = False, options: Optional[SearchOptions] = None) -> None:
+        self.tt = tt
+        self.options = options if options is not None else SearchOptions()
+        self.deadline = deadline
+        #nodes, cutoffs, peak ply, ... of this decision
+        self.stats = SearchStats()
+        #best line of the previous iteration, searched first in the next one
+        self.prev_pv: list[chess.Move] = []
+        self.follow_pv = False
+        #pv[ply] is the best line found below the node at that ply
+        self.pv: list[list[chess.Move]] = []
+        #two quiet moves per ply that last caused a beta cutoff
+        self.killers: list[list[Optional[chess.Move]]] = [[None, None] for _ in range(MAX_DEPTH + 1)]
+        #butterfly history per color, indexed from_square * 64 + to_square
+        self.history: list[list[int]] = [[0] * 4096, [0] * 4096]
+        #print a summary line after the decision
+        self.instrument = instrument
+        #set from another thread to abort the search like a timeout
+        self.stop: Optional[threading.Event] = None
+        #endgame tables; covered nodes below the root return their exact score
+        self.tablebase: Optional["Tablebase"] = None
+        #width of a null window: material scores are whole pawns, evaluated ones step by
+        #centipawns, so a window this wide has no score strictly inside it
+        self.null_width = 0.005 if self.options.evaluate else 1
+        #breaks ties between equal moves; search_move's seed= replaces it
+        self.rng: random.Random = (random.Random(self.options.seed) if self.options.seed is not None
+                                   else _rng)
+
+    def out_of_time(self) -> bool:
+        """Checked every CLOCK_MASK + 1 nodes: deadline passed or stop requested."""
+        if self.stop is not None and self.stop.is_set():
+            return True
+        return self.deadline is not None and time.perf_counter() >= self.deadline
+
+    def record_cutoff(self, board: chess.Board, mv: chess.Move, depth: int, ply: int,
+                      quiet: bool, first: bool) -> None:
+        """mv just failed high at ply; remember it if it is quiet."""
+        self.stats.cutoffs += 1
+        self.stats.first_move_cutoffs += first
+        if quiet:
+            killers = self.killers[ply]
+            if killers[0] != mv:
+                killers[1] = killers[0]
+                killers[0] = mv
+            self.history[board.turn][mv.from_square * 64 + mv.to_square] += depth * depth
+
+
+def search(board: chess.Board, depth: int, alpha: int, beta: int, bot_color: chess.Color,
+           tt: Optional[TranspositionTable] = None,
+           ctx: Optional[SearchContext] = None) -> Tuple[int, Optional[chess.Move]]:
+    """Alpha-beta minimax that sums rewards along the path for bot_color.
+
+    board may also be a SearchPosition; with SearchOptions(compact=True) a chess.Board
+    is converted to one here, at the root. The move returned is a chess.Move either way.
+    """
+    if ctx is None:
+        ctx = SearchContext(tt)
+    if ctx.options.compact and not isinstance(board, SearchPosition):
+        board = SearchPosition.from_board(board)
+    if isinstance(board, SearchPosition):
+        opts = ctx.options
+        if (opts.qdepth or opts.evaluate or opts.null_move or opts.lmr_moves
+                or opts.futility_margin is not None or opts.pvs or opts.see):
+            raise ValueError("quiescence, evaluate and selective pruning are not implemented on SearchPosition")
+        root = _position_root_score(board, depth, bot_color)
+    else:
+        root = _root_score(board, depth, bot_color)
+    if root is not None:
+        return root, None
+    ctx.pv = [[] for _ in range(depth + 1)]
+    ctx.follow_pv = bool(ctx.prev_pv)
+    if isinstance(board, SearchPosition):
+        return _search_position(board, depth, alpha, beta, bot_color, ctx, 0)
+    key = board_key(board) if ctx.tt is not None else 0
+    return _search(board, depth, alpha, beta, bot_color, ctx, key, 0)
+
+
+def _search(board, depth, alpha, beta, bot_color, ctx, key, ply):
+    stats = ctx.stats
+    stats.nodes += 1
+    if ply > stats.max_ply:
+        stats.max_ply = ply
+    if stats.ply_nodes is not None:
+        stats.ply_nodes[ply] += 1
+    if not (stats.nodes & SearchContext.CLOCK_MASK) and ctx.out_of_time():
+        raise SearchTimeout
+    pv = ctx.pv[ply]
+    pv.clear()
+    tb = ctx.tablebase
+    if tb is not None and ply and tb.covers(board) and not board.is_checkmate():
+        score = tb.score(board, key if ctx.tt is not None else None, stats)
+        if score is not None:
+            return (score if board.turn == bot_color else -score), None
+    if depth == 0 and ctx.options.qdepth:
+        return _quiesce(board, alpha, beta, bot_color, ctx, ctx.options.qdepth, ply), None
+    if depth == 0 and ctx.options.evaluate and not board.is_checkmate():
+        return _static_score(board, bot_color), None
     #first check game enders
-    if depth == 0 or board.is_game_over():
-        if board.is_checkmate():
-            return (-MATE_SCORE if board.turn == bot_color else MATE_SCORE), None
-        return 0, None
+    leaf = _leaf_score(board, depth, bot_color)
+    if leaf is not None:
+        return leaf, None
 
+    tt = ctx.tt
     maximizing = (board.turn == bot_color)
     best_move: Optional[chess.Move] = None
+    hash_move: Optional[chess.Move] = None
+    if tt is not None:
+        entry = tt.probe(key, depth)
+        if entry is not None:
+            hash_move = entry.move
+            if entry.depth >= depth and hash_move in board.legal_moves:
+                #table keeps scores for the side to move, flip them back for bot_color
+                score, flag = entry.score, entry.flag
+                if not maximizing:
+                    score = -score
+                    flag = _FLIP_BOUND[flag]
+                if (flag == EXACT or (flag == LOWER and score >= beta)
+                        or (flag == UPPER and score <= alpha)):
+                    pv.append(hash_move)
+                    return score, hash_move
+    alpha_orig, beta_orig = alpha, beta
+    opts = ctx.options
+    in_check = (opts.null_move or opts.lmr_moves or opts.futility_margin is not None) and board.is_check()
+    #null move: let the other side move twice; if we still fail high, so would a real move
+    if (opts.null_move and ply and depth > opts.null_move and not in_check and board.move_stack[-1]
+            and board.occupied_co[board.turn] & ~(board.pawns | board.kings)):
+        ctx.follow_pv = False
+        if tt is not None:
+            null_key = push_keyed(board, key, chess.Move.null())
+        else:
+            board.push(chess.Move.null())
+            null_key = 0
+        reduced = depth - 1 - opts.null_move
+        if maximizing:
+            null_score, _ = _search(board, reduced, beta - ctx.null_width, beta, bot_color, ctx, null_key, ply + 1)
+        else:
+            null_score, _ = _search(board, reduced, alpha, alpha + ctx.null_width, bot_color, ctx, null_key, ply + 1)
+        board.pop()
+        if null_score >= beta if maximizing else null_score <= alpha:
+            stats.null_cutoffs += 1
+            return (beta if maximizing else alpha), None
+    #previous iteration's best line goes ahead of everything else
+    if ctx.follow_pv:
+        ctx.follow_pv = False
+        if ply < len(ctx.prev_pv) and board.is_legal(ctx.prev_pv[ply]):
+            hash_move = ctx.prev_pv[ply]
+            ctx.follow_pv = True
+    moves = staged_moves(board, hash_move, ctx.killers[ply], ctx.history[board.turn], see=ctx.options.see)
+    #not a leaf and not cut off by the table, so at least one child gets searched
+    stats.interior_nodes += 1
+    child_key = 0
+    #children are leaves: evaluate them all in one call instead of one _search each
+    frontier = None
+    if depth == 1 and ctx.options.evaluate and not ctx.options.qdepth:
+        moves = list(moves)
+        frontier = _frontier_scores(board, moves, bot_color, ctx, ply)
+    #futility: a quiet move at a frontier node can't move the score far from the static one
+    futile_bound = None
+    if opts.futility_margin is not None and depth == 1 and not in_check and frontier is None:
+        stand = _static_score(board, bot_color) if opts.evaluate else 0
+        if maximizing and stand + opts.futility_margin <= alpha:
+            futile_bound = stand + opts.futility_margin
+        elif not maximizing and stand - opts.futility_margin >= beta:
+            futile_bound = stand - opts.futility_margin
+    #late move reductions apply from this move on
+    lmr_from = opts.lmr_moves if opts.lmr_moves and depth >= 3 and not in_check else None
     #MAXIMIZING
     #iteratively increasing lower bound (alpha)
     if maximizing:
         #start with min best_score
         best_score = -10**9
-        for mv in order_moves(board):
-            #compute advantage of move
-            imm = immediate_reward(board, mv, bot_color)
-            board.push(mv)
-            #compute best of future moves, up to depth calls
-            child_score, _ = search(board, depth - 1, alpha, beta, bot_color)
-            board.pop()
+        for i, mv in enumerate(moves):
+            #compute advantage of move (a mate is scored by the child)
+            imm = material_gain(board, mv)
+            quiet = imm == 0 and not mv.promotion
+            if futile_bound is not None and i and quiet and not board.gives_check(mv):
+                stats.futility_pruned += 1
+                #what the skipped move could reach at most, so the bound stored below stays true
+                best_score = max(best_score, futile_bound)
+                continue
+            if frontier is not None:
+                child_score = frontier[i]
+            else:
+                if tt is not None:
+                    child_key = push_keyed(board, key, mv)
+                else:
+                    board.push(mv)
+                #compute best of future moves, up to depth calls
+                #the child scores only what happens after mv, so shift the window by imm
+                reduce = lmr_from is not None and i >= lmr_from and quiet and not board.is_check()
+                child_score = _search_child(board, depth, alpha, beta, imm, True, bot_color, ctx,
+                                            child_key, ply, reduce, opts.pvs and i > 0)
+                board.pop()
+            ctx.follow_pv = False
             #undo these moves and get the total advantage score 
             total = imm + child_score
-            if total > best_score or (total == best_score and _rng.random() < 0.5):
+            if total > best_score or (total == best_score and not opts.pvs and ctx.rng.random() < 0.5):
                 best_score, best_move = total, mv
+                pv[:] = [mv] + ctx.pv[ply + 1]
             #update alpha (lower bound) with best_score if exceeded, iteratively increasing alpha as you make moves
             alpha = max(alpha, best_score)
             #beta is upper boud, so can't be less than alpha
             if beta <= alpha:
+                ctx.record_cutoff(board, mv, depth, ply, imm == 0, i == 0)
                 break
-        return best_score, best_move
     else:
         #MINIMIZING
         #iteratively decreasing upper bound (beta)
         best_score = 10**9
-        for mv in order_moves(board):
-            imm = immediate_reward(board, mv, bot_color)
-            board.push(mv)
-            child_score, _ = search(board, depth - 1, alpha, beta, bot_color)
-            board.pop()
+        for i, mv in enumerate(moves):
+            imm = -material_gain(board, mv)
+            quiet = imm == 0 and not mv.promotion
+            if futile_bound is not None and i and quiet and not board.gives_check(mv):
+                stats.futility_pruned += 1
+                best_score = min(best_score, futile_bound)
+                continue
+            if frontier is not None:
+                child_score = frontier[i]
+            else:
+                if tt is not None:
+                    child_key = push_keyed(board, key, mv)
+                else:
+                    board.push(mv)
+                reduce = lmr_from is not None and i >= lmr_from and quiet and not board.is_check()
+                child_score = _search_child(board, depth, alpha, beta, imm, False, bot_color, ctx,
+                                            child_key, ply, reduce, opts.pvs and i > 0)
+                board.pop()
+            ctx.follow_pv = False
             total = imm + child_score
-            if total < best_score or (total == best_score and _rng.random() < 0.5):
+            if total < best_score or (total == best_score and not opts.pvs and ctx.rng.random() < 0.5):
                 best_score, best_move = total, mv
+                pv[:] = [mv] + ctx.pv[ply + 1]
             beta = min(beta, best_score)
             if beta <= alpha:
+                ctx.record_cutoff(board, mv, depth, ply, imm == 0, i == 0)
                 break
-        return best_score, best_move
+    if tt is not None:
+        if best_score <= alpha_orig:
+            flag = UPPER
+        elif best_score >= beta_orig:
+            flag = LOWER
+        else:
+            flag = EXACT
+        if maximizing:
+            tt.store(key, depth, best_score, flag, best_move)
+        else:
+            tt.store(key, depth, -best_score, _FLIP_BOUND[flag], best_move)
+    return best_score, best_move
 
 
-#calls alphabeta pruning minmax by default
-def choose_bot_move(board: chess.Board, bot_color: chess.Color, depth: int) -> chess.Move:
-    """Depth=0 → capture-pref/random; otherwise minimax with alpha-beat."""
-    if depth <= 0:
-        return choose_bot_move_capture_pref(board)
-    _, mv = search(board, depth, -10**9, 10**9, bot_color)
+def _search_child(board, depth, alpha, beta, imm, maximizing, bot_color, ctx, key, ply, reduce, zero_window):
+    """Score of the child just pushed by a move worth imm, at a node of this depth and window.
+
+    reduce (late move reductions) first searches it one ply shallower and zero_window
+    (PVS) first searches it with a null window; each probe is followed by the next,
+    fuller search only if the move may still beat the best so far.
+    """
+    stats = ctx.stats
+    alpha, beta = alpha - imm, beta - imm
+    #a null window at the bound the move has to beat
+    probe = (alpha, alpha + ctx.null_width) if maximizing else (beta - ctx.null_width, beta)
+    if reduce:
+        stats.lmr_reductions += 1
+        score, _ = _search(board, depth - 2, *probe, bot_color, ctx, key, ply + 1)
+        if score <= alpha if maximizing else score >= beta:
+            return score
+        stats.lmr_researches += 1
+    if zero_window:
+        score, _ = _search(board, depth - 1, *probe, bot_color, ctx, key, ply + 1)
+        #fails low (no better) or high past the window (a cutoff either way)
+        if not alpha < score < beta:
+            return score
+        stats.pvs_researches += 1
+    score, _ = _search(board, depth - 1, alpha, beta, bot_color, ctx, key, ply + 1)
+    return score
+
+
+def _static_score(board: chess.Board, bot_color: chess.Color) -> float:
+    """Positional part of the static evaluation for bot_color, in pawns (material is
+    already counted by the rewards along the path)."""
+    cp = evaluate(board, material=False)
+    return (cp if bot_color == chess.WHITE else -cp) / 100
+
+
+def _frontier_scores(board, moves, bot_color, ctx, ply) -> list:
+    """What _search would return at depth 0 for the child after each move, with every
+    non-mated child evaluated in a single evaluate_batch call."""
+    stats = ctx.stats
+    scores = [0] * len(moves)
+    rows, index = [], []
+    for i, mv in enumerate(moves):
+        board.push(mv)
+        stats.nodes += 1
+        if board.is_checkmate():
+            scores[i] = -_MATED_CHILD if board.turn == bot_color else _MATED_CHILD
+        else:
+            rows.append(bitboards(board))
+            index.append(i)
+        board.pop()
+    if moves and ply + 1 > stats.max_ply:
+        stats.max_ply = ply + 1
+    if stats.ply_nodes is not None:
+        stats.ply_nodes[ply + 1] += len(moves)
+    ctx.pv[ply + 1].clear()
+    sign = 1 if bot_color == chess.WHITE else -1
+    for i, cp in zip(index, evaluate_batch(rows, material=False)):
+        scores[i] = sign * cp / 100
+    return scores
+
+
+def _quiesce(board, alpha, beta, bot_color, ctx, qdepth, ply):
+    """Captures and promotions only, past the search horizon, so a hanging recapture is seen.
+
+    The side to move may stand pat (score 0: no more material changes hands, or the
+    static score with SearchOptions(evaluate=True)) unless it is in check, in which
+    case every evasion is searched.
+    """
+    stats = ctx.stats
+    stats.nodes += 1
+    if ply > stats.max_ply:
+        stats.max_ply = ply
+    if stats.ply_nodes is not None:
+        stats.ply_nodes[ply] += 1
+    if not (stats.nodes & SearchContext.CLOCK_MASK) and ctx.out_of_time():
+        raise SearchTimeout
+    maximizing = (board.turn == bot_color)
+    in_check = board.is_check()
+    stand = _static_score(board, bot_color) if ctx.options.evaluate else 0
+    if in_check:
+        moves = list(board.generate_legal_moves())
+        if not moves:
+            return -_MATED_CHILD if maximizing else _MATED_CHILD
+        if qdepth == 0:
+            return stand
+        best_score = -10**9 if maximizing else 10**9
+    else:
+        #stand pat
+        best_score = stand
+        if maximizing:
+            if best_score >= beta or qdepth == 0:
+                return best_score
+            alpha = max(alpha, best_score)
+        else:
+            if best_score <= alpha or qdepth == 0:
+                return best_score
+            beta = min(beta, best_score)
+        moves = staged_moves(board, captures_only=True)
+    margin = None if in_check else ctx.options.delta_margin
+    prune_losing = ctx.options.see and not in_check
+    expanded = False
+    for mv in moves:
+        gain = material_gain(board, mv)
+        #captures come biggest victim first, so once one can't matter none of the rest can
+        if margin is not None:
+            if (stand + gain + margin <= alpha) if maximizing else (stand - gain - margin >= beta):
+                break
+        if prune_losing and static_exchange(board, mv) < 0:
+            stats.see_pruned += 1
+            continue
+        imm = gain if maximizing else -gain
+        if not expanded:
+            expanded = True
+            stats.interior_nodes += 1
+        board.push(mv)
+        child_score = _quiesce(board, alpha - imm, beta - imm, bot_color, ctx, qdepth - 1, ply + 1)
+        board.pop()
+        total = imm + child_score
+        if maximizing:
+            if total > best_score:
+                best_score = total
+            alpha = max(alpha, best_score)
+        else:
+            if total < best_score:
+                best_score = total
+            beta = min(beta, best_score)
+        if beta <= alpha:
+            break
+    return best_score
+
+
+
+# --- the same searches on a SearchPosition (position.py): int moves, no Move objects or move stack
+def _position_gain(pos: SearchPosition, m: int) -> int:
+    """material_gain for an int move."""
+    gain = PROMOTION_BONUS[m >> 12] if m >> 12 else 0
+    to_sq = (m >> 6) & 63
+    captured = pos.squares[to_sq]
+    if captured:
+        gain += VAL[captured & 7]
+    elif to_sq == pos.ep and pos.squares[m & 63] & 7 == chess.PAWN:
+        gain += VAL[chess.PAWN]
+    return gain
+
+
+def _position_root_score(pos: SearchPosition, depth: int, bot_color: chess.Color) -> Optional[int]:
+    """_root_score for a SearchPosition."""
+    if depth > 0 and pos.legal_moves() and not pos.is_draw():
+        return None
+    if pos.in_check() and not pos.legal_moves():
+        return -MATE_SCORE if pos.turn == bot_color else MATE_SCORE
+    return 0
+
+
+def _order_position_moves(pos: SearchPosition, moves: list, first: int, killers, history) -> None:
+    """Sort moves in place like staged_moves: first, captures by MVV-LVA, killers, quiet by history."""
+    squares = pos.squares
+
+    def key(m: int) -> int:
+        if m == first:
+            return 4 << 40
+        if squares[(m >> 6) & 63] or m >> 12:
+            return (3 << 40) + _position_gain(pos, m) * 8 - (squares[m & 63] & 7)
+        if m in killers:
+            return 2 << 40
+        return history[(m & 63) * 64 + ((m >> 6) & 63)]
+
+    moves.sort(key=key, reverse=True)
+
+
+def _search_position(pos, depth, alpha, beta, bot_color, ctx, ply):
+    """_search on a SearchPosition; killer slots hold int moves, the table and PV chess.Moves."""
+    stats = ctx.stats
+    stats.nodes += 1
+    if ply > stats.max_ply:
+        stats.max_ply = ply
+    if stats.ply_nodes is not None:
+        stats.ply_nodes[ply] += 1
+    if not (stats.nodes & SearchContext.CLOCK_MASK) and ctx.out_of_time():
+        raise SearchTimeout
+    pv = ctx.pv[ply]
+    pv.clear()
+    maximizing = (pos.turn == bot_color)
+    if depth == 0:
+        if pos.in_check() and not pos.legal_moves():
+            return (-_MATED_CHILD if maximizing else _MATED_CHILD), None
+        return 0, None
+    moves = pos.legal_moves()
+    if not moves:
+        if pos.in_check():
+            return (-_MATED_CHILD if maximizing else _MATED_CHILD), None
+        return 0, None
+    if pos.is_draw():
+        return 0, None
+
+    tt = ctx.tt
+    first = -1
+    if tt is not None:
+        entry = tt.probe(pos.key, depth)
+        if entry is not None and entry.move is not None:
+            first = from_move(entry.move)
+            if entry.depth >= depth and first in moves:
+                score, flag = entry.score, entry.flag
+                if not maximizing:
+                    score = -score
+                    flag = _FLIP_BOUND[flag]
+                if (flag == EXACT or (flag == LOWER and score >= beta)
+                        or (flag == UPPER and score <= alpha)):
+                    pv.append(entry.move)
+                    return score, entry.move
+    alpha_orig, beta_orig = alpha, beta
+    if ctx.follow_pv:
+        ctx.follow_pv = False
+        if ply < len(ctx.prev_pv) and from_move(ctx.prev_pv[ply]) in moves:
+            first = from_move(ctx.prev_pv[ply])
+            ctx.follow_pv = True
+    killers = ctx.killers[ply]
+    history = ctx.history[pos.turn]
+    _order_position_moves(pos, moves, first, killers, history)
+    stats.interior_nodes += 1
+    best_score = -10**9 if maximizing else 10**9
+    best = -1
+    for i, m in enumerate(moves):
+        gain = _position_gain(pos, m)
+        imm = gain if maximizing else -gain
+        pos.make(m)
+        child_score, _ = _search_position(pos, depth - 1, alpha - imm, beta - imm, bot_color, ctx, ply + 1)
+        pos.unmake()
+        ctx.follow_pv = False
+        total = imm + child_score
+        if maximizing:
+            better = total > best_score
+        else:
+            better = total < best_score
+        if better or (total == best_score and ctx.rng.random() < 0.5):
+            best_score, best = total, m
+            pv[:] = [to_move(m)] + ctx.pv[ply + 1]
+        if maximizing:
+            alpha = max(alpha, best_score)
+        else:
+            beta = min(beta, best_score)
+        if beta <= alpha:
+            stats.cutoffs += 1
+            stats.first_move_cutoffs += i == 0
+            if not gain:
+                if killers[0] != m:
+                    killers[1] = killers[0]
+                    killers[0] = m
+                history[(m & 63) * 64 + ((m >> 6) & 63)] += depth * depth
+            break
+    best_move = to_move(best)
+    if tt is not None:
+        if best_score <= alpha_orig:
+            flag = UPPER
+        elif best_score >= beta_orig:
+            flag = LOWER
+        else:
+            flag = EXACT
+        if maximizing:
+            tt.store(pos.key, depth, best_score, flag, best_move)
+        else:
+            tt.store(pos.key, depth, -best_score, _FLIP_BOUND[flag], best_move)
+    return best_score, best_move
+
+
+def _minimax_position(pos, depth, bot_color, tt, stats, ply):
+    """max_value / min_value on a SearchPosition."""
+    if stats is not None:
+        stats.nodes += 1
+        if ply > stats.max_ply:
+            stats.max_ply = ply
+        if stats.ply_nodes is not None:
+            stats.ply_nodes[ply] += 1
+    maximizing = (pos.turn == bot_color)
+    if depth == 0:
+        if pos.in_check() and not pos.legal_moves():
+            return (-_MATED_CHILD if maximizing else _MATED_CHILD), None
+        return 0, None
+    moves = pos.legal_moves()
+    if not moves:
+        if pos.in_check():
+            return (-_MATED_CHILD if maximizing else _MATED_CHILD), None
+        return 0, None
+    if pos.is_draw():
+        return 0, None
+    if tt is not None:
+        entry = tt.probe(pos.key, depth)
+        if (entry is not None and entry.flag == EXACT and entry.depth >= depth
+                and entry.move is not None and from_move(entry.move) in moves):
+            return (entry.score if maximizing else -entry.score), entry.move
+    if stats is not None:
+        stats.interior_nodes += 1
+    best_score = -10**9 if maximizing else 10**9
+    best = -1
+    for m in moves:
+        gain = _position_gain(pos, m)
+        pos.make(m)
+        child_score, _ = _minimax_position(pos, depth - 1, bot_color, tt, stats, ply + 1)
+        pos.unmake()
+        total = (gain if maximizing else -gain) + child_score
+        if total > best_score if maximizing else total < best_score:
+            best_score, best = total, m
+    best_move = to_move(best)
+    if tt is not None:
+        tt.store(pos.key, depth, best_score if maximizing else -best_score, EXACT, best_move)
+    return best_score, best_move
+
+
+def iterative_deepening(board: chess.Board, bot_color: chess.Color, max_depth: int, time_limit: float,
+                        tt: Optional[TranspositionTable] = None,
+                        ctx: Optional[SearchContext] = None) -> Tuple[int, Optional[chess.Move], int]:
+    """Search depth 1, 2, ... until time_limit seconds are used up or max_depth is done.
+
+    Each iteration searches the previous iteration's principal variation first.
+    Returns (score, move, depth) of the deepest iteration that finished; depth 1
+    always runs to completion so there is a move to play. ctx.stop, if set, ends
+    the search early the same way (time_limit may be math.inf to wait for it).
+    With ctx.options.aspiration, iterations after the first start from a narrow
+    window around the previous score (see SearchOptions).
+    """
+    start = time.perf_counter()
+    deadline = start + time_limit
+    if ctx is None:
+        ctx = SearchContext(tt)
+    ctx.deadline = None
+    #depth 1 ignores a stop request too
+    stop, ctx.stop = ctx.stop, None
+    root_len = len(board.move_stack)
+    best_score, best_move, done_depth = 0, None, 0
+    #score change between the last two finished iterations
+    swing = 0
+    for d in range(1, max_depth + 1):
+        try:
+            alpha, beta = -10**9, 10**9
+            if ctx.options.aspiration is not None and done_depth:
+                width = _aspiration_width(ctx.options, swing)
+                alpha, beta = best_score - width, best_score + width
+            while True:
+                score, mv = search(board, d, alpha, beta, bot_color, ctx=ctx)
+                #outside the window the score is only a bound: open that side and search again
+                if alpha > -10**9 and score <= alpha:
+                    alpha = -10**9
+                elif beta < 10**9 and score >= beta:
+                    beta = 10**9
+                else:
+                    break
+                ctx.stats.aspiration_researches += 1
+        except SearchTimeout:
+            #unwind whatever the aborted iteration left pushed
+            while len(board.move_stack) > root_len:
+                board.pop()
+            break
+        if mv is None:
+            break
+        if done_depth:
+            swing = abs(score - best_score)
+        best_score, best_move, done_depth = score, mv, d
+        ctx.prev_pv = list(ctx.pv[0])
+        ctx.deadline = deadline
+        ctx.stop = stop
+        elapsed = time.perf_counter() - start
+        #the next ply costs several times this one; don't start what can't finish
+        if elapsed >= time_limit / 2 or (stop is not None and stop.is_set()):
+            break
+    ctx.stop = stop
+    return best_score, best_move, done_depth
+
+
+def _aspiration_width(options: SearchOptions, swing: float) -> float:
+    """Half-width of an aspiration window, in pawns like the scores. Material scores
+    change in whole pawns, and options.aspiration is used as given. Scores with
+    evaluate carry the positional terms as well, which move by a fraction of a pawn
+    from one iteration to the next (more between odd and even depths), so the window
+    is widened to the last swing of the score rather than failing on every iteration."""
+    if options.evaluate:
+        return max(options.aspiration, swing)
+    return options.aspiration
+
+
+def _score_root_move(board, mv, depth, alpha, beta, bot_color, ctx):
+    """Total score (edge reward + subtree) of root move mv searched with window (alpha, beta)."""
+    gain = material_gain(board, mv)
+    imm = gain if board.turn == bot_color else -gain
+    ctx.pv = [[] for _ in range(depth + 1)]
+    if ctx.options.compact:
+        pos = SearchPosition.from_board(board)
+        pos.make(from_move(mv))
+        child_score, _ = _search_position(pos, depth - 1, alpha - imm, beta - imm, bot_color, ctx, 1)
+        return imm + child_score
+    if ctx.tt is not None:
+        key = push_keyed(board, board_key(board), mv)
+    else:
+        key = 0
+        board.push(mv)
+    child_score, _ = _search(board, depth - 1, alpha - imm, beta - imm, bot_color, ctx, key, 1)
+    board.pop()
+    return imm + child_score
+
+
+def _root_move_job(job):
+    """Pool worker: score one root move in a fresh context (no table, so results don't
+    depend on which worker ran which move)."""
+    board, mv, depth, alpha, beta, bot_color, options, count_plies = job
+    ctx = SearchContext(options=options)
+    if count_plies:
+        ctx.stats.ply_nodes = Counter()
+    total = _score_root_move(board, mv, depth, alpha, beta, bot_color, ctx)
+    return total, ctx.stats
+
+
+_pools: dict = {}
+
+
+def _worker_pool(workers: int):
+    """Process pool kept alive between moves so each decision doesn't pay for startup."""
+    import multiprocessing as mp
+    if workers not in _pools:
+        #tables shared with the workers rather than built in each of them; the pool
+        #outlives this call, so the heap is frozen only while the workers fork
+        with forking():
+            _pools[workers] = mp.Pool(workers)
+    return _pools[workers]
+
+
+def parallel_search(board: chess.Board, depth: int, bot_color: chess.Color, workers: int,
+                    ctx: Optional[SearchContext] = None,
+                    seed: Optional[int] = None) -> Tuple[int, Optional[chess.Move]]:
+    """Root-split alpha-beta over a process pool.
+
+    The first ordered root move is searched here with the full window; every
+    other root move then goes to a worker with a null window at that score,
+    and moves that beat it are searched again for their exact score. Windows
+    never depend on how other workers are doing.
+    Scores equal search()'s; ties between equal root moves are broken in move order
+    by random.Random(seed), or ctx.rng (seeded by SearchOptions.seed) without it.
+    """
+    root = _root_score(board, depth, bot_color)
+    if root is not None:
+        return root, None
+    if ctx is None:
+        ctx = SearchContext()
+    moves = list(staged_moves(board))
+    #multiprocessing is imported only by searches that split the root
+    import multiprocessing as mp
+    #pool workers are daemonic and can't start pools of their own
+    if workers <= 1 or len(moves) == 1 or mp.current_process().daemon:
+        return search(board, depth, -10**9, 10**9, bot_color, ctx=ctx)
+    maximizing = (board.turn == bot_color)
+    #the root itself is searched here
+    ctx.stats.nodes += 1
+    ctx.stats.interior_nodes += 1
+    if ctx.stats.ply_nodes is not None:
+        ctx.stats.ply_nodes[0] += 1
+    first = _score_root_move(board, moves[0], depth, -10**9, 10**9, bot_color, ctx)
+    pool = _worker_pool(workers)
+
+    def run(batch, alpha, beta):
+        jobs = [(board, mv, depth, alpha, beta, bot_color, ctx.options, ctx.stats.ply_nodes is not None)
+                for mv in batch]
+        totals = []
+        for total, worker_stats in pool.map(_root_move_job, jobs, chunksize=1):
+            ctx.stats.merge(worker_stats)
+            totals.append(total)
+        return dict(zip(batch, totals))
+
+    #null window at the first score: as in search(), moves that can't beat it fail low,
+    #and only moves that fail high need a second, open-ended search
+    width = ctx.null_width
+    scores = run(moves[1:], first, first + width) if maximizing else run(moves[1:], first - width, first)
+    if maximizing:
+        better = [mv for mv in moves[1:] if scores[mv] > first]
+        if better:
+            scores.update(run(better, first, 10**9))
+    else:
+        better = [mv for mv in moves[1:] if scores[mv] < first]
+        if better:
+            scores.update(run(better, -10**9, first))
+    rng = random.Random(seed) if seed is not None else ctx.rng
+    best_score, best_move = first, moves[0]
+    for mv in moves[1:]:
+        total = scores[mv]
+        improves = total > best_score if maximizing else total < best_score
+        if improves or (total == best_score and rng.random() < 0.5):
+            best_score, best_move = total, mv
+    return best_score, best_move
+
+
+def search_move(board: chess.Board, bot_color: chess.Color, depth: int,
+                tt: Optional[TranspositionTable] = None,
+                time_limit: Optional[float] = None,
+                instrument: bool = False,
+                options: Optional[SearchOptions] = None,
+                workers: int = 1,
+                seed: Optional[int] = None,
+                book: Optional["OpeningBook"] = None,
+                stop: Optional[threading.Event] = None,
+                tablebase: Optional["Tablebase"] = None,
+                profile: Optional[str] = None) -> Tuple[chess.Move, SearchStats]:
+    """Alpha-beta move for bot_color plus the SearchStats of the decision.
+
+    Depth=0 → capture-pref/random. Pass a TranspositionTable to reuse results across
+    transpositions (and across moves).
+    With time_limit (seconds) the search deepens one ply at a time up to depth and
+    plays the best move of the last depth that finished in time.
+    instrument prints the node count and first-move cutoff rate of the decision.
+    options switches on optional techniques such as quiescence (see SearchOptions).
+    workers > 1 splits the root moves of a fixed-depth search across that many
+    processes (see parallel_search); seed makes its choice between equal moves repeatable.
+    book (see opening_book.py) is consulted first; a book hit skips the search and
+    seed, if given, also makes the book's weighted pick repeatable, and replaces
+    SearchOptions.seed for the search's choice between equal moves (with
+    SearchOptions(pvs=True) ties always keep the first move).
+    stop is an Event another thread can set to end the search early; the move of the
+    deepest finished iteration is played (the search deepens as with time_limit).
+    tablebase (see tablebase.py) answers covered roots without searching and gives
+    exact scores to covered nodes inside the search (not in pool workers or compact mode).
+    profile is a directory to write a profile of the search to: collapsed stacks for a
+    flamegraph, cProfile data and nodes per ply (see profiling.py). It defaults to
+    $CHESS_PROFILE; with neither set nothing is profiled.
+    """
+    start = time.perf_counter()
+    prof = decision_profile(profile, "alphabeta")
+    ctx = SearchContext(tt, instrument=instrument, options=options)
+    ctx.stop = stop
+    ctx.tablebase = tablebase
+    if seed is not None:
+        ctx.rng = random.Random(seed)
+    mv = None
+    if book is not None:
+        mv = book.choose(board, rng=random.Random(seed) if seed is not None else None)
+        if mv is not None:
+            ctx.stats.book = True
+            depth = 0
+    if mv is None and tablebase is not None:
+        mv = tablebase.best_move(board, ctx.stats)
+        if mv is not None:
+            ctx.stats.tablebase = True
+            depth = 0
+    if depth > 0:
+        if tt is not None:
+            tt.new_search()
+        stats = ctx.stats
+        if prof is not None:
+            stats.ply_nodes = Counter()
+        with prof if prof is not None else nullcontext():
+            if time_limit is not None or stop is not None or ctx.options.aspiration is not None:
+                limit = time_limit if time_limit is not None else math.inf
+                stats.score, mv, stats.depth = iterative_deepening(board, bot_color, depth, limit, ctx=ctx)
+                pv = ctx.prev_pv
+            elif workers > 1:
+                stats.score, mv = parallel_search(board, depth, bot_color, workers, ctx=ctx, seed=seed)
+                stats.depth = depth
+                #the workers keep their lines
+                pv = []
+            else:
+                stats.score, mv = search(board, depth, -10**9, 10**9, bot_color, ctx=ctx)
+                stats.depth = depth
+                pv = ctx.pv[0] if ctx.pv else []
+            if mv is not None:
+                stats.pv = [m.uci() for m in pv] if pv and pv[0] == mv else [mv.uci()]
+            if prof is not None:
+                prof.record(stats)
     if mv is None:
-        return choose_bot_move_capture_pref(board)
+        mv = choose_bot_move_capture_pref(board)
+    stats = ctx.stats
+    stats.seconds = time.perf_counter() - start
+    if instrument and not stats.book and not stats.tablebase:
+        print(f"Search: {stats.nodes} nodes, first-move cutoff rate {stats.cutoff_rate():.1%} "
+              f"({stats.first_move_cutoffs}/{stats.cutoffs})")
+    return mv, stats
+
+
+#calls alphabeta pruning minmax by default
+def choose_bot_move(board: chess.Board, bot_color: chess.Color, depth: int,
+                    tt: Optional[TranspositionTable] = None,
+                    time_limit: Optional[float] = None,
+                    instrument: bool = False,
+                    options: Optional[SearchOptions] = None,
+                    workers: int = 1,
+                    seed: Optional[int] = None,
+                    book: Optional["OpeningBook"] = None,
+                    stop: Optional[threading.Event] = None,
+                    tablebase: Optional["Tablebase"] = None,
+                    profile: Optional[str] = None) -> chess.Move:
+    """Depth=0 → capture-pref/random; otherwise minimax with alpha-beat.
+    Same arguments as search_move, without the stats.
+    """
+    mv, _ = search_move(board, bot_color, depth, tt=tt, time_limit=time_limit, instrument=instrument,
+                        options=options, workers=workers, seed=seed, book=book, stop=stop,
+                        tablebase=tablebase, profile=profile)
     return mv
 
 
-def run_game(board: chess.Board, bot_color: chess.Color, depth: int) -> None:
-    while True:
+class Ponder:
+    """Searches the human's likely reply on a background thread while run_game waits for input.
+
+    start() guesses the reply (the table's best move for the position, else a one-ply
+    search for the human) and searches the position after it as the bot. finish() is
+    called with the move actually played: on a hit the background search becomes the
+    bot's answer (given up to time_limit more seconds to deepen, or run to depth); on a
+    miss it is stopped and None returned, and the real search starts on the table it
+    warmed. Hits, and the search seconds they took off the bot's replies, are counted.
+    """
+
+    def __init__(self, bot_color: chess.Color, depth: int, tt: TranspositionTable,
+                 time_limit: Optional[float] = None, options: Optional[SearchOptions] = None,
+                 book: Optional["OpeningBook"] = None, tablebase: Optional["Tablebase"] = None) -> None:
+        self.bot_color = bot_color
+        self.depth = depth
+        self.tt = tt
+        self.time_limit = time_limit
+        self.options = options
+        self.book = book
+        self.tablebase = tablebase
+        self.guess: Optional[chess.Move] = None
+        self.ponders = 0
+        self.hits = 0
+        self.saved_seconds = 0.0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._result: Optional[Tuple[chess.Move, SearchStats]] = None
+
+    def predict(self, board: chess.Board) -> Optional[chess.Move]:
+        entry = self.tt.probe(board_key(board))
+        if entry is not None and entry.move is not None and board.is_legal(entry.move):
+            return entry.move
+        _, mv = search(board, 1, -10**9, 10**9, board.turn)
+        return mv
+
+    def start(self, board: chess.Board) -> None:
+        """Begin pondering board (the human to move); a no-op if the game is over."""
         if board.is_game_over():
-            announce_game_over(board)
             return
+        self.guess = self.predict(board)
+        if self.guess is None:
+            return
+        ahead = board.copy()
+        ahead.push(self.guess)
+        if ahead.is_game_over():
+            return
+        self.ponders += 1
+        self._result = None
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(ahead,), daemon=True)
+        self._thread.start()
 
-        if board.turn == bot_color:
-            mv = choose_bot_move(board, bot_color, depth)
-            print(f"Bot (as {side_name(bot_color)}): {mv.uci()}")
-            board.push(mv)
-            print_fen(board)
-            continue
+    def _run(self, board: chess.Board) -> None:
+        self._result = search_move(board, self.bot_color, self.depth, tt=self.tt, options=self.options,
+                                   book=self.book, stop=self._stop, tablebase=self.tablebase)
 
-        user_mv = prompt_user_move(board)
-        if user_mv is None:
-            return
-        board.push(user_mv)
-        print_fen(board)
+    def finish(self, move: Optional[chess.Move]) -> Optional[chess.Move]:
+        """The bot's answer to move if it was the guess, else None; pondering is over either way."""
+        thread, self._thread = self._thread, None
+        if thread is None:
+            return None
+        if move != self.guess:
+            self._stop.set()
+            thread.join()
+            return None
+        moved = time.perf_counter()
+        if self.time_limit is not None:
+            thread.join(self.time_limit)
+            self._stop.set()
+        thread.join()
+        if self._result is None:
+            return None
+        mv, stats = self._result
+        self.hits += 1
+        #what the search took beyond the wait the human actually saw
+        self.saved_seconds += max(0.0, stats.seconds - (time.perf_counter() - moved))
+        return mv
+
+    def report(self) -> dict:
+        return {
+            "ponders": self.ponders,
+            "hits": self.hits,
+            "hit_rate": self.hits / self.ponders if self.ponders else 0.0,
+            "saved_seconds": self.saved_seconds,
+        }
+
+
+def run_game(board: chess.Board, bot_color: chess.Color, depth: int,
+             time_limit: Optional[float] = None, book: Optional["OpeningBook"] = None,
+             tablebase: Optional["Tablebase"] = None, ponder: bool = False) -> None:
+    """Human vs bot on the console. ponder searches the predicted reply while the human
+    thinks (see Ponder) and prints the hit rate and seconds saved when the game ends."""
+    ponderer = Ponder(bot_color, depth, TranspositionTable(), time_limit, book=book,
+                      tablebase=tablebase) if ponder else None
+    tt = ponderer.tt if ponderer is not None else None
+    answer = None
+    try:
+        while True:
+            if board.is_game_over():
+                announce_game_over(board)
+                return
+
+            if board.turn == bot_color:
+                hit = answer is not None
+                mv = answer if hit else choose_bot_move(board, bot_color, depth, tt=tt, time_limit=time_limit,
+                                                        book=book, tablebase=tablebase)
+                answer = None
+                print(f"Bot (as {side_name(bot_color)}): {mv.uci()}" + (" (ponder hit)" if hit else ""))
+                board.push(mv)
+                print_fen(board)
+                if ponderer is not None:
+                    ponderer.start(board)
+                continue
+
+            user_mv = prompt_user_move(board)
+            if user_mv is None:
+                return
+            board.push(user_mv)
+            print_fen(board)
+            if ponderer is not None:
+                answer = ponderer.finish(user_mv)
+    finally:
+        if ponderer is not None:
+            ponderer.finish(None)
+            r = ponderer.report()
+            print(f"Pondering: {r['hits']}/{r['ponders']} hits ({r['hit_rate']:.0%}), "
+                  f"{r['saved_seconds']:.1f}s of search saved")
 
 #bot prioritizing capture vs bot that just plays randomly
 def run_game_two_bots_greedy_vs_random(board: chess.Board, greedy_color: chess.Color) -> None:
@@ -308,7 +1487,7 @@ def run_game_two_bots_greedy_vs_random(board: chess.Board, greedy_color: chess.C
                 board.push(mv)
             else:
                 #if it is greedy, it choosees the capture moves specificially
-                mv = choose_bot_move(board)
+                mv = choose_bot_move_capture_pref(board)
                 print(f"Bot 1, prioritizes capture (as white): {mv.uci()}")
                 board.push(mv)
         else:
@@ -320,7 +1499,7 @@ def run_game_two_bots_greedy_vs_random(board: chess.Board, greedy_color: chess.C
                 print(f"Bot 2, any legal move (as black): {mv.uci()}")
                 board.push(mv)
             else:
-                mv = choose_bot_move(board)
+                mv = choose_bot_move_capture_pref(board)
                 print(f"Bot 2, prioritizes capture (as black): {mv.uci()}")
                 board.push(mv)
         prints(board)
@@ -338,14 +1517,31 @@ def run_game_two_bots_greedy(board: chess.Board) -> None:
             return num_outcome
         #white bot
         if board.turn == chess.WHITE:
-            mv = choose_bot_move(board)
+            mv = choose_bot_move_capture_pref(board)
             print(f"Bot 1 (as white): {mv.uci()}")
+        else:
+            mv = choose_bot_move_capture_pref(board)
+            print(f"Bot 2 (as black): {mv.uci()}")
+        board.push(mv)
+        prints(board)
 
 """
 This function pits a bot using min max vs a bot using alpha-beta pruning to their min-max strategy
 You can set the colors yourself
+time_limit (seconds per move) switches the alpha-beta bot to iterative deepening capped at depth_alpha_beta
+instrument prints the alpha-beta bot's node count and first-move cutoff rate for every move
+on_move(move, stats) is called after every move is pushed with that move's SearchStats (used to
+checkpoint games and collect telemetry); the board may already hold moves from an earlier,
+interrupted run and play simply continues from there
+book (an OpeningBook) is consulted by both bots before they search
+tablebase (a Tablebase) ends covered endgames without search, for both bots
+options (SearchOptions) switches on optional techniques for the alpha-beta bot only
+tt_min_max / tt_alpha_beta are transposition tables for each bot (e.g. a position_cache.PositionCache
+shared with other games), none by default
 """
-def run_game_two_bots_minmax_vs_pruning(board,  min_max_color, depth_min_max, depth_alpha_beta): 
+def run_game_two_bots_minmax_vs_pruning(board,  min_max_color, depth_min_max, depth_alpha_beta, time_limit=None,
+                                        instrument=False, on_move=None, book=None, tablebase=None, options=None,
+                                        tt_min_max=None, tt_alpha_beta=None): 
     alpha_beta_color = not min_max_color 
     while True:
         if board.is_game_over():
@@ -353,10 +1549,14 @@ def run_game_two_bots_minmax_vs_pruning(board,  min_max_color, depth_min_max, de
             print("For the following configs", min_max_color, depth_min_max, depth_alpha_beta, " outcome is", num_outcome)
             return num_outcome, _
         if board.turn == min_max_color:
-            move = minmax_choose_bot_move(board, min_max_color, depth_min_max) 
+            move, stats = minmax_search_move(board, min_max_color, depth_min_max, tt=tt_min_max, book=book,
+                                             tablebase=tablebase) 
         else:
-            move = choose_bot_move(board, alpha_beta_color, depth_alpha_beta) 
+            move, stats = search_move(board, alpha_beta_color, depth_alpha_beta, tt=tt_alpha_beta, time_limit=time_limit,
+                                      instrument=instrument, book=book, tablebase=tablebase, options=options) 
         board.push(move) 
+        if on_move is not None:
+            on_move(move, stats)
         
 
 
@@ -372,20 +1572,9 @@ def play_polish_opening_kings_indian_sokolsky(board: chess.Board) -> None:
       6. d4
     
     """
+    from opening_book import OPENING_LINES
 
-    uci_sequence = [
-        "b2b4",  
-        "g8f6",  
-        "c1b2",  
-        "g7g6",  
-        "c2c4",  
-        "f8g7",  
-        "e2e3",  
-        "d7d6",  
-        "g1f3",  
-        "e8g8",  
-        "d2d4",  
-    ]
+    uci_sequence = OPENING_LINES["Polish Opening: King's Indian Variation, Sokolsky Attack"]
 
     for u in uci_sequence:
         try:
@@ -399,6 +1588,9 @@ def play_polish_opening_kings_indian_sokolsky(board: chess.Board) -> None:
 
     
 def main() -> None:
+    from datetime import datetime
+    from opening_book import default_book
+
     print("=====================================================")
     print("             CS 290 Chess Bot Version 0.2            ")
     print("=====================================================")
@@ -422,17 +1614,30 @@ def main() -> None:
     else:
         board.set_fen(chess.STARTING_FEN)
 
-    # Depth prompt (ENTER defaults to 2)
+    # Time prompt (ENTER keeps a fixed depth)
+    time_limit = None
     try:
-        d_in = input("Search depth? (ENTER for 2): ").strip()
-        depth = int(d_in) if d_in else 2
+        t_in = input("Seconds per move? (ENTER for fixed depth): ").strip()
+        time_limit = float(t_in) if t_in else None
     except ValueError:
-        print("Bad depth; using 2.")
-        depth = 2
+        print("Bad time; using fixed depth.")
+
+    if time_limit is not None:
+        depth = MAX_DEPTH
+    else:
+        # Depth prompt (ENTER defaults to 2)
+        try:
+            d_in = input("Search depth? (ENTER for 2): ").strip()
+            depth = int(d_in) if d_in else 2
+        except ValueError:
+            print("Bad depth; using 2.")
+            depth = 2
+
 
+    ponder = input("Think on your time? (y/N): ").strip().lower() in {"y", "yes"}
 
     play_polish_opening_kings_indian_sokolsky(board)
-    run_game(board, bot_color, depth)
+    run_game(board, bot_color, depth, time_limit, book=default_book(), ponder=ponder)
 
 
 if __name__ == "__main__":
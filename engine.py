@@ -0,0 +1,64 @@
+"""
+Lean entry point for short-lived worker processes.
+
+    import engine
+    with engine.forking():                   # in the parent, around starting a pool
+        pool = mp.Pool(8)
+    cp = engine.evaluate_fen(fen)            # in a worker
+    python engine.py FEN [FEN ...]           # centipawns for white, one per line
+
+Importing engine loads python-chess and the static evaluation, nothing else:
+a worker that only scores positions doesn't import chess_run's search, game
+loops, book, tablebase or profiling modules. A worker that searches imports
+chess_run, which defers its optional parts until they are used. The large
+tables are built once, not per process: the evaluate_batch weights are
+memory-mapped from a file (see evaluation.table_path), and forking() builds
+the lazily-built ones in the parent so that forked workers inherit them
+copy-on-write. `python benchmark.py` times a worker's start-up
+through each path.
+"""
+import gc
+import sys
+from contextlib import contextmanager
+from typing import Iterator
+
+import chess
+
+import evaluation
+from evaluation import bitboards, evaluate, evaluate_batch
+
+
+def preload() -> None:
+    """Build or map every lazily-built table now, so that workers forked afterwards
+    inherit it instead of building their own. Later calls do nothing."""
+    evaluation.weights()
+
+
+@contextmanager
+def forking() -> Iterator[None]:
+    """preload(), then keep the heap frozen (gc.freeze) while the block forks workers:
+    their collections skip the inherited objects, so they don't write to those pages
+    and force copies of them. The parent's heap is unfrozen when the block ends, so
+    start the pool inside it, or run the pool's whole life there."""
+    preload()
+    gc.collect()
+    gc.freeze()
+    try:
+        yield
+    finally:
+        gc.unfreeze()
+
+
+def evaluate_fen(fen: str) -> int:
+    """Centipawns for white of one position."""
+    return evaluate(chess.Board(fen))
+
+
+def evaluate_fens(fens: list[str]) -> list[int]:
+    """evaluate_fen for many positions, in one evaluate_batch call."""
+    return evaluate_batch([bitboards(chess.Board(fen)) for fen in fens])
+
+
+if __name__ == "__main__":
+    for fen in sys.argv[1:]:
+        print(evaluate_fen(fen))
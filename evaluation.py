@@ -0,0 +1,228 @@
+# -*- coding: utf-8 -*-
+"""
+Static evaluation: material, piece-square tables and a mobility approximation,
+in centipawns from white's point of view.
+
+evaluate_batch scores many positions in one NumPy call from their twelve piece
+bitboards (see bitboards); evaluate is the same function one position at a time
+in plain Python. Without NumPy, evaluate_batch falls back to that loop.
+
+NumPy and the batch weights are loaded on the first evaluate_batch call, so a
+process that never batches doesn't import NumPy. The weights are built once per
+machine and kept in an .npy file (table_path: the __pycache__ next to this file,
+or $CHESS_TABLE_DIR) that later processes memory-map read-only, so every worker
+shares the same pages instead of building its own copy.
+
+Mobility counts the squares each knight, bishop, rook and queen would attack on
+an empty board that are not occupied by its own side, so sliders are not
+stopped by blockers; it is an approximation, cheap enough to vectorize.
+"""
+import hashlib
+import os
+from typing import Sequence
+
+import chess
+
+# centipawn piece values (chess_run.VAL times 100)
+PIECE_CP = {chess.PAWN: 100, chess.KNIGHT: 300, chess.BISHOP: 300, chess.ROOK: 500, chess.QUEEN: 900, chess.KING: 0}
+# centipawns per attacked square
+MOBILITY_CP = {chess.KNIGHT: 4, chess.BISHOP: 4, chess.ROOK: 2, chess.QUEEN: 1}
+
+# piece-square tables from white's side, written rank 8 first (index ^ 56 is the square)
+_PST_RANK8_FIRST = {
+    chess.PAWN: [
+        0, 0, 0, 0, 0, 0, 0, 0,
+        50, 50, 50, 50, 50, 50, 50, 50,
+        10, 10, 20, 30, 30, 20, 10, 10,
+        5, 5, 10, 25, 25, 10, 5, 5,
+        0, 0, 0, 20, 20, 0, 0, 0,
+        5, -5, -10, 0, 0, -10, -5, 5,
+        5, 10, 10, -20, -20, 10, 10, 5,
+        0, 0, 0, 0, 0, 0, 0, 0,
+    ],
+    chess.KNIGHT: [
+        -50, -40, -30, -30, -30, -30, -40, -50,
+        -40, -20, 0, 0, 0, 0, -20, -40,
+        -30, 0, 10, 15, 15, 10, 0, -30,
+        -30, 5, 15, 20, 20, 15, 5, -30,
+        -30, 0, 15, 20, 20, 15, 0, -30,
+        -30, 5, 10, 15, 15, 10, 5, -30,
+        -40, -20, 0, 5, 5, 0, -20, -40,
+        -50, -40, -30, -30, -30, -30, -40, -50,
+    ],
+    chess.BISHOP: [
+        -20, -10, -10, -10, -10, -10, -10, -20,
+        -10, 0, 0, 0, 0, 0, 0, -10,
+        -10, 0, 5, 10, 10, 5, 0, -10,
+        -10, 5, 5, 10, 10, 5, 5, -10,
+        -10, 0, 10, 10, 10, 10, 0, -10,
+        -10, 10, 10, 10, 10, 10, 10, -10,
+        -10, 5, 0, 0, 0, 0, 5, -10,
+        -20, -10, -10, -10, -10, -10, -10, -20,
+    ],
+    chess.ROOK: [
+        0, 0, 0, 0, 0, 0, 0, 0,
+        5, 10, 10, 10, 10, 10, 10, 5,
+        -5, 0, 0, 0, 0, 0, 0, -5,
+        -5, 0, 0, 0, 0, 0, 0, -5,
+        -5, 0, 0, 0, 0, 0, 0, -5,
+        -5, 0, 0, 0, 0, 0, 0, -5,
+        -5, 0, 0, 0, 0, 0, 0, -5,
+        0, 0, 0, 5, 5, 0, 0, 0,
+    ],
+    chess.QUEEN: [
+        -20, -10, -10, -5, -5, -10, -10, -20,
+        -10, 0, 0, 0, 0, 0, 0, -10,
+        -10, 0, 5, 5, 5, 5, 0, -10,
+        -5, 0, 5, 5, 5, 5, 0, -5,
+        0, 0, 5, 5, 5, 5, 0, -5,
+        -10, 5, 5, 5, 5, 5, 0, -10,
+        -10, 0, 5, 0, 0, 0, 0, -10,
+        -20, -10, -10, -5, -5, -10, -10, -20,
+    ],
+    chess.KING: [
+        -30, -40, -40, -50, -50, -40, -40, -30,
+        -30, -40, -40, -50, -50, -40, -40, -30,
+        -30, -40, -40, -50, -50, -40, -40, -30,
+        -30, -40, -40, -50, -50, -40, -40, -30,
+        -20, -30, -30, -40, -40, -30, -30, -20,
+        -10, -20, -20, -20, -20, -20, -20, -10,
+        20, 20, 0, 0, 0, 0, 20, 20,
+        20, 30, 10, 0, 0, 10, 30, 20,
+    ],
+}
+# PST[color][piece_type][square]; black uses the table mirrored top to bottom
+PST = {
+    chess.WHITE: {pt: [t[sq ^ 56] for sq in range(64)] for pt, t in _PST_RANK8_FIRST.items()},
+    chess.BLACK: {pt: list(t) for pt, t in _PST_RANK8_FIRST.items()},
+}
+# empty-board attack sets
+ATTACKS = {
+    chess.KNIGHT: chess.BB_KNIGHT_ATTACKS,
+    chess.BISHOP: [chess.BB_DIAG_ATTACKS[sq][0] for sq in chess.SQUARES],
+    chess.ROOK: [chess.BB_RANK_ATTACKS[sq][0] | chess.BB_FILE_ATTACKS[sq][0] for sq in chess.SQUARES],
+}
+ATTACKS[chess.QUEEN] = [b | r for b, r in zip(ATTACKS[chess.BISHOP], ATTACKS[chess.ROOK])]
+
+# bitboard order used by bitboards() and evaluate_batch: white P..K, then black P..K
+PLANES = [(color, pt) for color in (chess.WHITE, chess.BLACK) for pt in chess.PIECE_TYPES]
+
+# overrides the directory of the weights file
+TABLE_DIR_ENV = "CHESS_TABLE_DIR"
+# rows of the weights array (64 columns each): per side, the (plane, square) -> attacked
+# square mobility matrix, then the signed PST and piece values as 12 rows of 64
+_MOBILITY_ROWS = {chess.WHITE: slice(0, 768), chess.BLACK: slice(768, 1536)}
+_PST_ROWS = slice(1536, 1548)
+_VALUE_ROWS = slice(1548, 1560)
+
+#NumPy once imported (False without it), and the weights array once loaded
+_numpy = None
+_weights = None
+
+
+def bitboards(board: chess.Board) -> list[int]:
+    """The twelve piece bitboards of board, in PLANES order."""
+    return [board.pieces_mask(pt, color) for color, pt in PLANES]
+
+
+def evaluate(board: chess.Board, material: bool = True) -> int:
+    """Centipawns for white, one position in plain Python. material=False leaves out piece values."""
+    score = 0
+    occupied_co = board.occupied_co
+    for sq, piece in board.piece_map().items():
+        pt, color = piece.piece_type, piece.color
+        value = PST[color][pt][sq] + (PIECE_CP[pt] if material else 0)
+        if pt in MOBILITY_CP:
+            value += MOBILITY_CP[pt] * chess.popcount(ATTACKS[pt][sq] & ~occupied_co[color])
+        score += value if color else -value
+    return score
+
+
+def _np():
+    """NumPy, imported on first use; None if it isn't installed."""
+    global _numpy
+    if _numpy is None:
+        try:
+            import numpy
+        except ImportError:  # pragma: no cover - the Python loop still works
+            numpy = False
+        _numpy = numpy
+    return _numpy or None
+
+
+def table_path() -> str:
+    """The weights file; its name changes with the tables, so a stale file is never read."""
+    source = repr((_PST_RANK8_FIRST, PIECE_CP, MOBILITY_CP, PLANES)).encode("utf-8")
+    directory = os.environ.get(TABLE_DIR_ENV) or os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                              "__pycache__")
+    return os.path.join(directory, f"evaluation-{hashlib.sha1(source).hexdigest()[:12]}.npy")
+
+
+def _build_weights(np) -> "np.ndarray":
+    out = np.zeros((1560, 64), dtype=np.float32)
+    sign = np.array([1 if color else -1 for color, _ in PLANES], dtype=np.float32)[:, None]
+    out[_PST_ROWS] = np.array([PST[color][pt] for color, pt in PLANES], dtype=np.float32) * sign
+    out[_VALUE_ROWS] = np.array([[PIECE_CP[pt]] * 64 for _, pt in PLANES], dtype=np.float32) * sign
+    for i, (color, pt) in enumerate(PLANES):
+        if pt in MOBILITY_CP:
+            rows = out[_MOBILITY_ROWS[color]][i * 64:(i + 1) * 64]
+            for sq, mask in enumerate(ATTACKS[pt]):
+                for target in chess.scan_forward(mask):
+                    rows[sq, target] = MOBILITY_CP[pt] * sign[i, 0]
+    return out
+
+
+def weights():
+    """The evaluate_batch weights (rows as in _MOBILITY_ROWS / _PST_ROWS / _VALUE_ROWS),
+    memory-mapped from table_path(), which is written first if missing; None without NumPy.
+    If the file can't be written the weights are kept in this process only."""
+    global _weights
+    if _weights is None:
+        np = _np()
+        if np is None:
+            return None
+        path = table_path()
+        try:
+            _weights = np.asarray(np.load(path, mmap_mode="r"))
+        except (OSError, ValueError):
+            _weights = _build_weights(np)
+            #written under another name and renamed, so a reader never maps half a file
+            tmp = f"{path}.{os.getpid()}.tmp"
+            try:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(tmp, "wb") as f:
+                    np.save(f, _weights)
+                os.replace(tmp, path)
+            except OSError:
+                pass
+    return _weights
+
+
+def evaluate_batch(rows: Sequence[Sequence[int]], material: bool = True) -> list[int]:
+    """evaluate() for many positions at once; rows are bitboards() of each position."""
+    np = _np()
+    if np is None:
+        return [_evaluate_row(row, material) for row in rows]
+    if not len(rows):
+        return []
+    w = weights()
+    n = len(rows)
+    masks = np.array(rows, dtype="<u8")
+    #(positions, 12 planes * 64 squares) of 0/1; small integers stay exact in float32 matmuls
+    bits = np.unpackbits(masks.view(np.uint8).reshape(n, 96), axis=1, bitorder="little").astype(np.float32)
+    pst = w[_PST_ROWS].reshape(768)
+    score = bits @ (pst + w[_VALUE_ROWS].reshape(768) if material else pst)
+    planes = bits.reshape(n, 12, 64)
+    #squares each side's pieces would attack, minus the ones its own pieces stand on
+    for color, own in ((chess.WHITE, planes[:, :6]), (chess.BLACK, planes[:, 6:])):
+        free = 1 - own.sum(axis=1)
+        score += ((bits @ w[_MOBILITY_ROWS[color]]) * free).sum(axis=1)
+    return np.rint(score).astype(np.int64).tolist()
+
+
+def _evaluate_row(row: Sequence[int], material: bool) -> int:
+    board = chess.Board.empty()
+    for (color, pt), mask in zip(PLANES, row):
+        for sq in chess.scan_forward(mask):
+            board.set_piece_at(sq, chess.Piece(pt, color))
+    return evaluate(board, material)
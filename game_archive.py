@@ -0,0 +1,166 @@
+"""
+Game records: PGN export and a compact binary archive of finished games.
+
+    archive = GameArchive("games.bin")          # creates games.bin and games.bin.idx
+    n = archive.append(board, headers)          # board holds the game's move stack
+    headers, board = archive.read(n)            # seek straight to game n
+    for headers, board in archive.games():      # stream them all back as replays
+        ...
+
+    python game_archive.py games.bin                     # number of games
+    python game_archive.py games.bin --game 12           # one game as PGN
+    python game_archive.py games.bin --pgn all.pgn       # the whole archive as PGN
+
+Each game in the data file is a record: two little-endian u16s (header bytes,
+move count), the headers as UTF-8 JSON, then one u16 per move in the Polyglot
+encoding of opening_book.encode_move. Starting positions other than the standard
+one go in a FEN header, as in PGN. The index file holds one u64 offset per game,
+so game n is found with two seeks. Both files are append-only; an index entry is
+written only after its record, so a torn write loses at most the last game.
+"""
+import argparse
+import json
+import os
+import struct
+from typing import Iterator, Optional, Sequence
+
+import chess
+import chess.pgn
+
+from opening_book import decode_move, encode_move
+
+MAGIC = b"CHGARC01"
+_RECORD = struct.Struct("<HH")  # header bytes, move count
+_OFFSET = struct.Struct("<Q")
+
+
+def game_pgn(board: chess.Board, headers: dict, seconds: Optional[Sequence[Optional[float]]] = None) -> chess.pgn.Game:
+    """PGN game for the moves on board; seconds[i], if known, becomes an [%emt] comment on move i."""
+    game = chess.pgn.Game.from_board(board)
+    for name, value in headers.items():
+        game.headers[name] = str(value)
+    if seconds is not None:
+        for node, spent in zip(game.mainline(), seconds):
+            if spent is not None:
+                node.comment = f"[%emt {spent:.3f}]"
+    return game
+
+
+def append_pgn(path: str, game: chess.pgn.Game) -> None:
+    with open(path, "a", encoding="utf-8") as f:
+        print(game, file=f, end="\n\n")
+        f.flush()
+        os.fsync(f.fileno())
+
+
+class GameArchive:
+    """Append-only binary game archive at path, with its index at path + ".idx"."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.index_path = path + ".idx"
+        new = not os.path.exists(path) or os.path.getsize(path) == 0
+        self._data = open(path, "a+b")
+        if new:
+            self._data.write(MAGIC)
+            self._data.flush()
+        else:
+            self._data.seek(0)
+            if self._data.read(len(MAGIC)) != MAGIC:
+                self._data.close()
+                raise ValueError(f"{path} is not a game archive")
+        self._index = open(self.index_path, "a+b")
+        #drop a torn index entry from a crash mid-write
+        size = os.path.getsize(self.index_path)
+        if size % _OFFSET.size:
+            self._index.truncate(size - size % _OFFSET.size)
+
+    def __len__(self) -> int:
+        return os.path.getsize(self.index_path) // _OFFSET.size
+
+    def __enter__(self) -> "GameArchive":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._data.close()
+        self._index.close()
+
+    def append(self, board: chess.Board, headers: Optional[dict] = None) -> int:
+        """Store the game on board (its root position and move stack); returns its number."""
+        headers = dict(headers or {})
+        root = board.root()
+        if root.fen() != chess.STARTING_FEN:
+            headers["FEN"] = root.fen()
+        raw = []
+        for mv in board.move_stack:
+            raw.append(encode_move(root, mv))
+            root.push(mv)
+        header = json.dumps(headers, separators=(",", ":")).encode("utf-8")
+        self._data.seek(0, os.SEEK_END)
+        offset = self._data.tell()
+        self._data.write(_RECORD.pack(len(header), len(raw)) + header + struct.pack(f"<{len(raw)}H", *raw))
+        self._data.flush()
+        os.fsync(self._data.fileno())
+        number = len(self)
+        self._index.write(_OFFSET.pack(offset))
+        self._index.flush()
+        os.fsync(self._index.fileno())
+        return number
+
+    def _read_record(self, f) -> tuple[dict, chess.Board]:
+        header_len, count = _RECORD.unpack(f.read(_RECORD.size))
+        headers = json.loads(f.read(header_len).decode("utf-8"))
+        board = chess.Board(headers.get("FEN", chess.STARTING_FEN))
+        for raw in struct.unpack(f"<{count}H", f.read(2 * count)):
+            mv = decode_move(board, raw)
+            if mv is None:
+                raise ValueError(f"corrupt move {raw:#06x} in {self.path} at ply {len(board.move_stack) + 1}")
+            board.push(mv)
+        return headers, board
+
+    def read(self, n: int) -> tuple[dict, chess.Board]:
+        """Headers and replayed board of game n (0-based)."""
+        if not 0 <= n < len(self):
+            raise IndexError(f"game {n} not in archive of {len(self)}")
+        self._index.seek(n * _OFFSET.size)
+        offset, = _OFFSET.unpack(self._index.read(_OFFSET.size))
+        self._data.seek(offset)
+        return self._read_record(self._data)
+
+    def games(self, start: int = 0) -> Iterator[tuple[dict, chess.Board]]:
+        """Every game from number start on, read sequentially in a separate file handle."""
+        count = len(self)
+        if start >= count:
+            return
+        self._index.seek(start * _OFFSET.size)
+        offset, = _OFFSET.unpack(self._index.read(_OFFSET.size))
+        with open(self.path, "rb") as f:
+            f.seek(offset)
+            for _ in range(start, count):
+                yield self._read_record(f)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Inspect or export a binary game archive.")
+    parser.add_argument("archive")
+    parser.add_argument("--game", type=int, default=None, help="print game N (0-based) as PGN")
+    parser.add_argument("--pgn", default=None, help="write every game to this PGN file")
+    args = parser.parse_args()
+    with GameArchive(args.archive) as archive:
+        if args.game is not None:
+            headers, board = archive.read(args.game)
+            print(game_pgn(board, headers))
+        elif args.pgn is not None:
+            with open(args.pgn, "w", encoding="utf-8") as f:
+                for headers, board in archive.games():
+                    print(game_pgn(board, headers), file=f, end="\n\n")
+            print(f"Wrote {len(archive)} games to {args.pgn}")
+        else:
+            print(f"{len(archive)} games in {args.archive}")
+
+
+if __name__ == "__main__":
+    main()
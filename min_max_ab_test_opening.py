@@ -1,83 +1,30 @@
-import csv
-import multiprocessing as mp
-from chess_run import *
-from testing_openings import *
-
-import sys
-import random
-from datetime import datetime
-from typing import Optional, Tuple
 import chess
-import os
-
-
-# Opening positions after the specified lines are played (from standard start).
-OPENING_FENS = {
-    "Queen's Gambit": "rnbqkbnr/ppp1pppp/8/3p4/2PP4/8/PP2PPPP/RNBQKBNR b KQkq - 0 2",
-    "Sicilian Defense (Dragon Variation)": "rnbqkb1r/pp2pp1p/3p1np1/8/3NP3/2N5/PPP2PPP/R1BQKB1R w KQkq - 0 6",
-    "Polish Opening: King's Indian Variation, Sokolsky Attack": "rnbq1rk1/ppp1ppbp/3p1np1/8/1PPP4/4PN2/PB3PPP/RN1QKB1R b KQ - 0 6",
-}
-
-def choose_opening_and_make_board(choice: int | None = None) -> "chess.Board":
-    """
-    Argument-driven, brute-force:
-    - 1 -> Queen's Gambit
-    - 2 -> Sicilian Defense (Dragon)
-    - 3 -> Polish Opening: King's Indian Variation, Sokolsky Attack
-    - Else -> standard start
-    Returns only the board; no prints.
-    """
-    board = chess.Board()
-    board.set_fen(chess.STARTING_FEN)
 
-    names = list(OPENING_FENS.keys())
-    if isinstance(choice, int) and 1 <= choice <= len(names):
-        fen = OPENING_FENS[names[choice - 1]]
-        try:
-            board.set_fen(fen)
-        except ValueError:
-            board.set_fen(chess.STARTING_FEN)
+from chess_run import side_name
+from tournament import expand_manifest, run_tournament
 
-    return board
-
-
-OUTCOME_LABELS = {
-    0: "game_over",
-    1: "checkmate",
-    2: "stalemate",
-    3: "insufficient_material",
-    4: "seventyfive_move_rule",
-    5: "fivefold_repetition",
-}
-
-def _run_single_match(job_args):
-    minimax_color, depth_minimax, depth_alphabeta = job_args
-    board = choose_opening_and_make_board(3)
-    outcome, winner = run_game_two_bots_minmax_vs_pruning(
-        board,
-        minimax_color,
-        depth_minimax,
-        depth_alphabeta,
-    )
-    outcome_label = OUTCOME_LABELS.get(outcome, "unknown")
-    return (
-        side_name(minimax_color),
-        depth_minimax,
-        depth_alphabeta,
-        outcome_label,
-        winner
-    )
+OPENING = "Polish Opening: King's Indian Variation, Sokolsky Attack"
 
 
 def run_all_minimax_vs_pruning_experiments(
     output_path=  "minimax_vs_alphabeta_results_opening_pt3.csv",
+    trace_path=None,
+    cache_path=None,
 ) -> None:
-    jobs = []
+    """Runs through tournament.run_tournament: games already in output_path are skipped
+    and interrupted games resume from their checkpointed moves. Rows carry per-game
+    search aggregates; trace_path adds a per-move JSONL trace. cache_path (an SQLite
+    file, see position_cache.py) lets every game reuse the searches of earlier ones."""
+    configs = []
 
     #add jobs per config
     def add_jobs(color: chess.Color, depth_minimax: int, depth_alphabeta: int, count: int):
-        for _ in range(count):
-            jobs.append((color, depth_minimax, depth_alphabeta))
+        configs.append({
+            "minimax_color": side_name(color),
+            "depth_minimax": depth_minimax,
+            "depth_alphabeta": depth_alphabeta,
+            "repetitions": count,
+        })
 
     #100 jobs total
     # add_jobs(chess.WHITE, 3, 3, 10)
@@ -93,25 +40,11 @@ def run_all_minimax_vs_pruning_experiments(
     add_jobs(chess.WHITE, 2, 2, 10)
     add_jobs(chess.BLACK, 2, 3, 10)
     add_jobs(chess.WHITE, 2, 3, 10)
-    #run on at a time
-    with open(output_path, "w", newline="", encoding="utf-8") as csvfile:
-        writer = csv.writer(csvfile)
-        writer.writerow(
-            ["minimax_color", "alphabeta_color", "depth_minimax", "depth_alphabeta", "outcome", "winner"]
-        )
-        csvfile.flush()
-        os.fsync(csvfile.fileno())
-
-        # Stream results as they arrive
-        with mp.Pool() as pool:
-            for color, depth_minimax, depth_alphabeta, outcome_label, winner in pool.imap(
-                _run_single_match, jobs, chunksize=1
-            ):
-                alphabeta_color = "white" if color == "black" else "black"
-                writer.writerow([color, alphabeta_color, depth_minimax, depth_alphabeta, outcome_label, winner])
-                # ensure the row is flushed to disk immediately
-                csvfile.flush()
-                os.fsync(csvfile.fileno())
+    jobs = expand_manifest({
+        "openings": [OPENING],
+        "configs": configs,
+    })
+    run_tournament(jobs, output_path, trace_path=trace_path, cache=cache_path)
 
 if __name__ == "__main__":
     run_all_minimax_vs_pruning_experiments()
\ No newline at end of file
@@ -0,0 +1,171 @@
+"""
+Opening book: known lines looked up by Zobrist key, so the bots can skip search early on.
+
+    book = load_book("book.bin")                 # standard Polyglot file
+    book = load_book("games.pgn")                # first plies of every game in a PGN file
+    book = load_book("default")                  # the named lines in OPENING_LINES
+    mv = book.choose(board)                      # None once the game leaves the book
+
+Entries live in three parallel arrays sorted by key (8 + 2 + 2 bytes each), moves in
+the Polyglot 16-bit encoding, so a PGN-derived book can be saved as a .bin file.
+"""
+import random
+import struct
+from array import array
+from bisect import bisect_left
+from collections import defaultdict
+from typing import Iterable, Optional
+
+import chess
+
+from zobrist import board_key, push_keyed
+
+# named lines from the standard start position; OPENING_FENS holds the positions they reach
+OPENING_LINES = {
+    "Queen's Gambit": ["d2d4", "d7d5", "c2c4"],
+    "Sicilian Defense (Dragon Variation)": [
+        "e2e4", "c7c5", "g1f3", "d7d6", "d2d4", "c5d4", "f3d4", "g8f6", "b1c3", "g7g6",
+    ],
+    "Polish Opening: King's Indian Variation, Sokolsky Attack": [
+        "b2b4", "g8f6", "c1b2", "g7g6", "c2c4", "f8g7", "e2e3", "d7d6", "g1f3", "e8g8", "d2d4",
+    ],
+}
+
+
+def line_fen(line: Iterable[str]) -> str:
+    board = chess.Board()
+    for uci in line:
+        board.push_uci(uci)
+    return board.fen()
+
+
+OPENING_FENS = {name: line_fen(line) for name, line in OPENING_LINES.items()}
+
+_ENTRY = struct.Struct(">QHHI")  # key, move, weight, learn
+_MAX_WEIGHT = 0xFFFF
+
+
+def encode_move(board: chess.Board, move: chess.Move) -> int:
+    """Polyglot move encoding; castling is written as king-takes-rook."""
+    to_sq = move.to_square
+    if board.is_castling(move) and not board.chess960:
+        rank = chess.square_rank(move.from_square)
+        to_sq = chess.square(7 if to_sq > move.from_square else 0, rank)
+    promo = move.promotion - 1 if move.promotion else 0
+    return to_sq | (move.from_square << 6) | (promo << 12)
+
+
+def decode_move(board: chess.Board, raw: int) -> Optional[chess.Move]:
+    """Inverse of encode_move for the side to move; None if not legal here (key collision)."""
+    from_sq = (raw >> 6) & 63
+    to_sq = raw & 63
+    promo = (raw >> 12) & 7
+    if (not board.chess960 and board.piece_type_at(from_sq) == chess.KING
+            and board.piece_type_at(to_sq) == chess.ROOK and board.color_at(to_sq) == board.turn):
+        to_sq = chess.square(6 if to_sq > from_sq else 2, chess.square_rank(from_sq))
+    move = chess.Move(from_sq, to_sq, promo + 1 if promo else None)
+    return move if board.is_legal(move) else None
+
+
+class OpeningBook:
+    """Read-only book index. weighted=True picks moves at random in proportion to their
+    weight; weighted=False always plays the heaviest move (first stored on ties)."""
+
+    def __init__(self, counts: dict, weighted: bool = True) -> None:
+        self.weighted = weighted
+        self.keys = array("Q")
+        self.moves = array("H")
+        self.weights = array("H")
+        for key in sorted(counts):
+            #heaviest first, so deterministic selection is the first legal entry
+            for raw, weight in sorted(counts[key].items(), key=lambda e: (-e[1], e[0])):
+                self.keys.append(key)
+                self.moves.append(raw)
+                self.weights.append(min(weight, _MAX_WEIGHT))
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    @classmethod
+    def from_polyglot(cls, path: str, weighted: bool = True) -> "OpeningBook":
+        counts: dict = defaultdict(lambda: defaultdict(int))
+        with open(path, "rb") as f:
+            data = f.read()
+        usable = len(data) - len(data) % _ENTRY.size
+        for key, raw, weight, _ in _ENTRY.iter_unpack(data[:usable]):
+            counts[key][raw] += weight
+        return cls(counts, weighted)
+
+    @classmethod
+    def from_lines(cls, lines: Iterable[Iterable[chess.Move]], weighted: bool = True,
+                   max_plies: Optional[int] = None) -> "OpeningBook":
+        """Book from move sequences played from the standard start (chess.Move or UCI strings);
+        each time a move is seen in a position adds one to its weight."""
+        counts: dict = defaultdict(lambda: defaultdict(int))
+        for line in lines:
+            board = chess.Board()
+            key = board_key(board)
+            for ply, mv in enumerate(line):
+                if max_plies is not None and ply >= max_plies:
+                    break
+                if isinstance(mv, str):
+                    mv = chess.Move.from_uci(mv)
+                counts[key][encode_move(board, mv)] += 1
+                key = push_keyed(board, key, mv)
+        return cls(counts, weighted)
+
+    @classmethod
+    def from_pgn(cls, path: str, max_plies: int = 16, weighted: bool = True) -> "OpeningBook":
+        """The first max_plies of the main line of every standard-start game in a PGN file."""
+        #imported here: chess.pgn pulls in chess.engine and asyncio, which the bots never need
+        import chess.pgn
+
+        def games():
+            with open(path, encoding="utf-8", errors="replace") as f:
+                while (game := chess.pgn.read_game(f)) is not None:
+                    if "FEN" not in game.headers and not game.errors:
+                        yield game.mainline_moves()
+        return cls.from_lines(games(), weighted, max_plies)
+
+    def save(self, path: str) -> None:
+        """Write the book as a Polyglot .bin file."""
+        with open(path, "wb") as f:
+            for key, raw, weight in zip(self.keys, self.moves, self.weights):
+                f.write(_ENTRY.pack(key, raw, weight, 0))
+
+    def entries(self, board: chess.Board, key: Optional[int] = None) -> list[tuple[chess.Move, int]]:
+        """Legal book moves for this position with their weights, heaviest first."""
+        if key is None:
+            key = board_key(board)
+        found = []
+        i = bisect_left(self.keys, key)
+        while i < len(self.keys) and self.keys[i] == key:
+            mv = decode_move(board, self.moves[i])
+            if mv is not None:
+                found.append((mv, self.weights[i]))
+            i += 1
+        return found
+
+    def choose(self, board: chess.Board, key: Optional[int] = None,
+               rng: Optional[random.Random] = None) -> Optional[chess.Move]:
+        """Book move for the side to move, or None when out of book."""
+        found = [(mv, w) for mv, w in self.entries(board, key) if w > 0]
+        if not found:
+            return None
+        if not self.weighted:
+            return found[0][0]
+        rng = rng or random
+        return rng.choices([mv for mv, _ in found], weights=[w for _, w in found])[0]
+
+
+def default_book(weighted: bool = True) -> OpeningBook:
+    return OpeningBook.from_lines(OPENING_LINES.values(), weighted)
+
+
+def load_book(spec: str, weighted: bool = True) -> OpeningBook:
+    """"default" for OPENING_LINES, a .pgn file, or anything else as a Polyglot .bin file."""
+    if spec == "default":
+        return default_book(weighted)
+    if spec.lower().endswith(".pgn"):
+        return OpeningBook.from_pgn(spec, weighted=weighted)
+    return OpeningBook.from_polyglot(spec, weighted)
@@ -0,0 +1,532 @@
+# -*- coding: utf-8 -*-
+"""
+Compact position for the search hot loop.
+
+chess.Board keeps a full move stack and builds Move objects for every move it
+generates. SearchPosition is a 64-byte mailbox plus a few ints: moves are plain
+ints (from | to << 6 | promotion << 12), make/unmake write into undo slots that
+are allocated once, and each ply reuses its own move list. Convert with
+from_board / to_board and to_move / from_move at the search root only.
+
+Standard chess only (no chess960). The Zobrist key is the Polyglot key, so it is
+interchangeable with zobrist.board_key and a TranspositionTable can be shared
+with chess.Board searches.
+"""
+
+import chess
+import chess.polyglot
+
+from zobrist import board_key, push_keyed
+
+PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING = chess.PAWN, chess.KNIGHT, chess.BISHOP, chess.ROOK, chess.QUEEN, chess.KING
+# piece codes: the piece type for white, piece type | BLACK for black, 0 for an empty square
+BLACK = 8
+# castling bits
+WHITE_OO, WHITE_OOO, BLACK_OO, BLACK_OOO = 1, 2, 4, 8
+# undo slots kept beyond the game history; grown if a search ever goes deeper
+_SPARE_PLIES = 256
+
+
+def _on_board(f: int, r: int) -> bool:
+    return 0 <= f < 8 and 0 <= r < 8
+
+
+def _targets(sq: int, steps) -> tuple:
+    f, r = sq & 7, sq >> 3
+    return tuple((r + dr) * 8 + f + df for df, dr in steps if _on_board(f + df, r + dr))
+
+
+def _rays(sq: int, steps) -> tuple:
+    rays = []
+    for df, dr in steps:
+        f, r = sq & 7, sq >> 3
+        ray = []
+        while _on_board(f + df, r + dr):
+            f, r = f + df, r + dr
+            ray.append(r * 8 + f)
+        if ray:
+            rays.append(tuple(ray))
+    return tuple(rays)
+
+
+_KNIGHT_STEPS = ((1, 2), (2, 1), (2, -1), (1, -2), (-1, -2), (-2, -1), (-2, 1), (-1, 2))
+_KING_STEPS = ((1, 0), (1, 1), (0, 1), (-1, 1), (-1, 0), (-1, -1), (0, -1), (1, -1))
+KNIGHT_TARGETS = tuple(_targets(sq, _KNIGHT_STEPS) for sq in range(64))
+KING_TARGETS = tuple(_targets(sq, _KING_STEPS) for sq in range(64))
+ORTHO_RAYS = tuple(_rays(sq, ((1, 0), (-1, 0), (0, 1), (0, -1))) for sq in range(64))
+DIAG_RAYS = tuple(_rays(sq, ((1, 1), (-1, 1), (1, -1), (-1, -1))) for sq in range(64))
+# PAWN_ATTACKS[color][sq]: squares a pawn of that color on sq attacks (color 1 = white)
+PAWN_ATTACKS = (tuple(_targets(sq, ((-1, -1), (1, -1))) for sq in range(64)),
+                tuple(_targets(sq, ((-1, 1), (1, 1))) for sq in range(64)))
+# castling rights kept when a move touches a square (king or rook home squares)
+CASTLE_KEEP = [15] * 64
+CASTLE_KEEP[chess.E1] = 15 & ~(WHITE_OO | WHITE_OOO)
+CASTLE_KEEP[chess.H1] = 15 & ~WHITE_OO
+CASTLE_KEEP[chess.A1] = 15 & ~WHITE_OOO
+CASTLE_KEEP[chess.E8] = 15 & ~(BLACK_OO | BLACK_OOO)
+CASTLE_KEEP[chess.H8] = 15 & ~BLACK_OO
+CASTLE_KEEP[chess.A8] = 15 & ~BLACK_OOO
+_PROMOTIONS = (QUEEN, ROOK, BISHOP, KNIGHT)
+
+# Polyglot key parts, indexed by piece code / castling bits / file
+_ARRAY = chess.polyglot.POLYGLOT_RANDOM_ARRAY
+PIECE_KEYS = [[0] * 64 for _ in range(16)]
+for _pt in chess.PIECE_TYPES:
+    for _sq in range(64):
+        PIECE_KEYS[_pt][_sq] = _ARRAY[64 * ((_pt - 1) * 2 + 1) + _sq]
+        PIECE_KEYS[_pt | BLACK][_sq] = _ARRAY[64 * ((_pt - 1) * 2) + _sq]
+CASTLE_KEYS = [0] * 16
+for _rights in range(16):
+    for _bit in range(4):
+        if _rights & (1 << _bit):
+            CASTLE_KEYS[_rights] ^= _ARRAY[768 + _bit]
+EP_KEYS = [_ARRAY[772 + f] for f in range(8)]
+TURN_KEY = _ARRAY[780]
+
+#chess.Move for each int move, made on first use so the root conversions don't allocate
+_MOVES: dict = {}
+
+
+def to_move(m: int) -> chess.Move:
+    mv = _MOVES.get(m)
+    if mv is None:
+        mv = _MOVES[m] = chess.Move(m & 63, (m >> 6) & 63, (m >> 12) or None)
+    return mv
+
+
+def from_move(move: chess.Move) -> int:
+    return move.from_square | (move.to_square << 6) | ((move.promotion or 0) << 12)
+
+
+class SearchPosition:
+    """Array-backed position with allocation-free make/unmake (see the module docstring).
+
+    turn is 1 for white and 0 for black, like chess.WHITE / chess.BLACK.
+    """
+
+    __slots__ = ("squares", "turn", "castling", "ep", "halfmove", "fullmove", "key", "kings",
+                 "counts", "ply", "_moves", "_captured", "_castling", "_ep", "_halfmove",
+                 "_keys", "_lists")
+
+    def __init__(self) -> None:
+        self.squares = bytearray(64)
+        self.turn = 1
+        self.castling = 0
+        self.ep = -1
+        self.halfmove = 0
+        self.fullmove = 1
+        self.key = 0
+        #king square per color, indexed by turn
+        self.kings = [0, 0]
+        #pieces on the board per piece code
+        self.counts = [0] * 16
+        #undo slot of the next move; slots below hold the game history
+        self.ply = 0
+        self._moves: list[int] = []
+        self._captured: list[int] = []
+        self._castling: list[int] = []
+        self._ep: list[int] = []
+        self._halfmove: list[int] = []
+        #key of the position before each move, also used for repetitions
+        self._keys: list[int] = []
+        #one reusable move list per ply
+        self._lists: list[list[int]] = []
+
+    @classmethod
+    def from_board(cls, board: chess.Board) -> "SearchPosition":
+        """Copy of board; the keys of its move stack are kept for repetition detection."""
+        if board.chess960:
+            raise ValueError("SearchPosition does not support chess960")
+        pos = cls()
+        for sq, piece in board.piece_map().items():
+            code = piece.piece_type | (0 if piece.color else BLACK)
+            pos.squares[sq] = code
+            pos.counts[code] += 1
+        for color in chess.COLORS:
+            king = board.king(color)
+            if king is None:
+                raise ValueError("SearchPosition needs a king of each color")
+            pos.kings[color] = king
+        pos.turn = int(board.turn)
+        pos.castling = ((WHITE_OO if board.has_kingside_castling_rights(chess.WHITE) else 0)
+                        | (WHITE_OOO if board.has_queenside_castling_rights(chess.WHITE) else 0)
+                        | (BLACK_OO if board.has_kingside_castling_rights(chess.BLACK) else 0)
+                        | (BLACK_OOO if board.has_queenside_castling_rights(chess.BLACK) else 0))
+        pos.ep = board.ep_square if board.ep_square is not None else -1
+        pos.halfmove = board.halfmove_clock
+        pos.fullmove = board.fullmove_number
+        pos.key = board_key(board)
+        history = []
+        if board.move_stack:
+            replay = board.root()
+            key = board_key(replay)
+            for mv in board.move_stack:
+                history.append(key)
+                key = push_keyed(replay, key, mv)
+        pos._reserve(len(history) + _SPARE_PLIES)
+        pos._keys[:len(history)] = history
+        pos.ply = len(history)
+        return pos
+
+    def _reserve(self, size: int) -> None:
+        grow = size - len(self._keys)
+        if grow > 0:
+            for slots in (self._moves, self._captured, self._castling, self._ep, self._halfmove, self._keys):
+                slots.extend([0] * grow)
+            self._lists.extend([] for _ in range(grow))
+
+    def fen(self) -> str:
+        rows = []
+        for rank in range(7, -1, -1):
+            row, empty = "", 0
+            for file in range(8):
+                code = self.squares[rank * 8 + file]
+                if not code:
+                    empty += 1
+                    continue
+                if empty:
+                    row, empty = row + str(empty), 0
+                symbol = chess.piece_symbol(code & 7)
+                row += symbol if code & BLACK else symbol.upper()
+            rows.append(row + (str(empty) if empty else ""))
+        castling = "".join(c for bit, c in ((WHITE_OO, "K"), (WHITE_OOO, "Q"), (BLACK_OO, "k"), (BLACK_OOO, "q"))
+                           if self.castling & bit) or "-"
+        ep = chess.square_name(self.ep) if self.ep >= 0 else "-"
+        return f"{'/'.join(rows)} {'w' if self.turn else 'b'} {castling} {ep} {self.halfmove} {self.fullmove}"
+
+    def to_board(self) -> chess.Board:
+        """chess.Board of the current position (without the move history)."""
+        return chess.Board(self.fen())
+
+    def _ep_key(self) -> int:
+        """Polyglot hashes the en passant file only if a pawn of the side to move could take."""
+        ep = self.ep
+        if ep < 0:
+            return 0
+        pawn = PAWN if self.turn else PAWN | BLACK
+        squares = self.squares
+        for sq in PAWN_ATTACKS[self.turn ^ 1][ep]:
+            if squares[sq] == pawn:
+                return EP_KEYS[ep & 7]
+        return 0
+
+    def attacked(self, sq: int, by: int) -> bool:
+        """Is sq attacked by a piece of color by?"""
+        squares = self.squares
+        side = 0 if by else BLACK
+        pawn = PAWN | side
+        for t in PAWN_ATTACKS[by ^ 1][sq]:
+            if squares[t] == pawn:
+                return True
+        knight = KNIGHT | side
+        for t in KNIGHT_TARGETS[sq]:
+            if squares[t] == knight:
+                return True
+        king = KING | side
+        for t in KING_TARGETS[sq]:
+            if squares[t] == king:
+                return True
+        rook, bishop, queen = ROOK | side, BISHOP | side, QUEEN | side
+        for ray in ORTHO_RAYS[sq]:
+            for t in ray:
+                code = squares[t]
+                if code:
+                    if code == rook or code == queen:
+                        return True
+                    break
+        for ray in DIAG_RAYS[sq]:
+            for t in ray:
+                code = squares[t]
+                if code:
+                    if code == bishop or code == queen:
+                        return True
+                    break
+        return False
+
+    def in_check(self) -> bool:
+        return self.attacked(self.kings[self.turn], self.turn ^ 1)
+
+    def make(self, m: int) -> None:
+        squares = self.squares
+        counts = self.counts
+        frm = m & 63
+        to = (m >> 6) & 63
+        promo = m >> 12
+        piece = squares[frm]
+        captured = squares[to]
+        white = self.turn
+        p = self.ply
+        if p == len(self._keys):
+            self._reserve(p + _SPARE_PLIES)
+        self._moves[p] = m
+        self._captured[p] = captured
+        self._castling[p] = self.castling
+        self._ep[p] = self.ep
+        self._halfmove[p] = self.halfmove
+        self._keys[p] = self.key
+        self.ply = p + 1
+
+        key = self.key ^ CASTLE_KEYS[self.castling] ^ self._ep_key() ^ TURN_KEY ^ PIECE_KEYS[piece][frm]
+        halfmove = self.halfmove + 1
+        ep = -1
+        squares[frm] = 0
+        if captured:
+            key ^= PIECE_KEYS[captured][to]
+            counts[captured] -= 1
+            halfmove = 0
+        kind = piece & 7
+        if kind == PAWN:
+            halfmove = 0
+            if to == self.ep:
+                gone = to - 8 if white else to + 8
+                key ^= PIECE_KEYS[squares[gone]][gone]
+                counts[squares[gone]] -= 1
+                squares[gone] = 0
+            elif to - frm == 16 or frm - to == 16:
+                ep = (frm + to) >> 1
+            if promo:
+                counts[piece] -= 1
+                piece = promo | (piece & BLACK)
+                counts[piece] += 1
+        elif kind == KING:
+            self.kings[white] = to
+            if to - frm == 2 or frm - to == 2:
+                rook_from, rook_to = (frm + 3, frm + 1) if to > frm else (frm - 4, frm - 1)
+                rook = squares[rook_from]
+                squares[rook_from] = 0
+                squares[rook_to] = rook
+                key ^= PIECE_KEYS[rook][rook_from] ^ PIECE_KEYS[rook][rook_to]
+        squares[to] = piece
+        key ^= PIECE_KEYS[piece][to]
+        castling = self.castling & CASTLE_KEEP[frm] & CASTLE_KEEP[to]
+        self.castling = castling
+        self.ep = ep
+        self.halfmove = halfmove
+        if not white:
+            self.fullmove += 1
+        self.turn = white ^ 1
+        self.key = key ^ CASTLE_KEYS[castling] ^ self._ep_key()
+
+    def unmake(self) -> None:
+        squares = self.squares
+        counts = self.counts
+        p = self.ply - 1
+        self.ply = p
+        m = self._moves[p]
+        frm = m & 63
+        to = (m >> 6) & 63
+        white = self.turn ^ 1
+        self.turn = white
+        if not white:
+            self.fullmove -= 1
+        self.castling = self._castling[p]
+        self.ep = ep = self._ep[p]
+        self.halfmove = self._halfmove[p]
+        self.key = self._keys[p]
+        piece = squares[to]
+        captured = self._captured[p]
+        if m >> 12:
+            counts[piece] -= 1
+            piece = PAWN | (piece & BLACK)
+            counts[piece] += 1
+        squares[frm] = piece
+        squares[to] = captured
+        if captured:
+            counts[captured] += 1
+        kind = piece & 7
+        if kind == PAWN:
+            if to == ep:
+                gone = to - 8 if white else to + 8
+                squares[gone] = (PAWN | BLACK) if white else PAWN
+                counts[squares[gone]] += 1
+        elif kind == KING:
+            self.kings[white] = frm
+            if to - frm == 2 or frm - to == 2:
+                rook_from, rook_to = (frm + 3, frm + 1) if to > frm else (frm - 4, frm - 1)
+                squares[rook_from] = squares[rook_to]
+                squares[rook_to] = 0
+
+    def generate(self, out: list) -> None:
+        """Append the pseudo-legal moves of the side to move to out."""
+        squares = self.squares
+        white = self.turn
+        us = 0 if white else BLACK
+        ep = self.ep
+        for frm, piece in enumerate(squares):
+            if not piece or (piece & BLACK) != us:
+                continue
+            kind = piece & 7
+            if kind == PAWN:
+                if white:
+                    step, start, last = 8, 1, 7
+                else:
+                    step, start, last = -8, 6, 0
+                to = frm + step
+                if not squares[to]:
+                    if to >> 3 == last:
+                        for promo in _PROMOTIONS:
+                            out.append(frm | (to << 6) | (promo << 12))
+                    else:
+                        out.append(frm | (to << 6))
+                        if frm >> 3 == start and not squares[to + step]:
+                            out.append(frm | ((to + step) << 6))
+                for to in PAWN_ATTACKS[white][frm]:
+                    target = squares[to]
+                    if target and (target & BLACK) != us:
+                        if to >> 3 == last:
+                            for promo in _PROMOTIONS:
+                                out.append(frm | (to << 6) | (promo << 12))
+                        else:
+                            out.append(frm | (to << 6))
+                    elif to == ep:
+                        out.append(frm | (to << 6))
+            elif kind == KNIGHT or kind == KING:
+                for to in (KNIGHT_TARGETS[frm] if kind == KNIGHT else KING_TARGETS[frm]):
+                    target = squares[to]
+                    if not target or (target & BLACK) != us:
+                        out.append(frm | (to << 6))
+            else:
+                if kind == ROOK:
+                    rays = ORTHO_RAYS[frm]
+                elif kind == BISHOP:
+                    rays = DIAG_RAYS[frm]
+                else:
+                    rays = ORTHO_RAYS[frm] + DIAG_RAYS[frm]
+                for ray in rays:
+                    for to in ray:
+                        target = squares[to]
+                        if target:
+                            if (target & BLACK) != us:
+                                out.append(frm | (to << 6))
+                            break
+                        out.append(frm | (to << 6))
+        rights = self.castling & ((WHITE_OO | WHITE_OOO) if white else (BLACK_OO | BLACK_OOO))
+        if rights:
+            king = chess.E1 if white else chess.E8
+            them = white ^ 1
+            rook = ROOK | us
+            if squares[king] == KING | us and not self.attacked(king, them):
+                if (rights & (WHITE_OO | BLACK_OO) and squares[king + 3] == rook
+                        and not squares[king + 1] and not squares[king + 2]
+                        and not self.attacked(king + 1, them) and not self.attacked(king + 2, them)):
+                    out.append(king | ((king + 2) << 6))
+                if (rights & (WHITE_OOO | BLACK_OOO) and squares[king - 4] == rook
+                        and not squares[king - 1] and not squares[king - 2] and not squares[king - 3]
+                        and not self.attacked(king - 1, them) and not self.attacked(king - 2, them)):
+                    out.append(king | ((king - 2) << 6))
+
+    def _pinned(self, king: int) -> int:
+        """Bitmask of the side to move's pieces pinned to its king."""
+        squares = self.squares
+        us = 0 if self.turn else BLACK
+        them = BLACK ^ us
+        pinned = 0
+        for rays, slider in ((ORTHO_RAYS[king], ROOK | them), (DIAG_RAYS[king], BISHOP | them)):
+            for ray in rays:
+                own = -1
+                for t in ray:
+                    code = squares[t]
+                    if not code:
+                        continue
+                    if own < 0 and (code & BLACK) == us:
+                        own = t
+                        continue
+                    if own >= 0 and (code == slider or code == QUEEN | them):
+                        pinned |= 1 << own
+                    break
+        return pinned
+
+    def legal_moves(self) -> list:
+        """Legal moves of the side to move, in this ply's reusable list (valid until the
+        next call at the same ply).
+
+        Out of check only king moves, pinned pieces and en passant captures can be
+        illegal, so only those are tried with make/unmake.
+        """
+        p = self.ply
+        if p >= len(self._lists):
+            self._reserve(p + _SPARE_PLIES)
+        out = self._lists[p]
+        out.clear()
+        self.generate(out)
+        mover = self.turn
+        king = self.kings[mover]
+        if self.attacked(king, mover ^ 1):
+            pinned = -1
+        else:
+            pinned = self._pinned(king)
+        ep = self.ep
+        j = 0
+        for m in out:
+            frm = m & 63
+            if (pinned < 0 or frm == king or (pinned >> frm) & 1
+                    or ((m >> 6) & 63 == ep and self.squares[frm] & 7 == PAWN)):
+                self.make(m)
+                legal = not self.attacked(self.kings[mover], mover ^ 1)
+                self.unmake()
+                if not legal:
+                    continue
+            out[j] = m
+            j += 1
+        del out[j:]
+        return out
+
+    def is_insufficient_material(self) -> bool:
+        """Same rule as chess.Board.is_insufficient_material."""
+        counts = self.counts
+        if (counts[PAWN] or counts[ROOK] or counts[QUEEN]
+                or counts[PAWN | BLACK] or counts[ROOK | BLACK] or counts[QUEEN | BLACK]):
+            return False
+        knights = counts[KNIGHT] + counts[KNIGHT | BLACK]
+        bishops = counts[BISHOP] + counts[BISHOP | BLACK]
+        if not knights:
+            if bishops < 2:
+                return True
+            #bishops all on one square color
+            shades = {(sq + (sq >> 3)) & 1 for sq, code in enumerate(self.squares) if code & 7 == BISHOP}
+            return len(shades) == 1
+        #a lone knight, and nothing else on the board
+        return knights == 1 and not bishops
+
+    def repetitions(self) -> int:
+        """How many times the current position has occurred, counting this one."""
+        count = 1
+        keys = self._keys
+        key = self.key
+        stop = max(self.ply - self.halfmove, 0)
+        for i in range(self.ply - 2, stop - 1, -2):
+            if keys[i] == key:
+                count += 1
+        return count
+
+    def is_draw(self) -> bool:
+        """Draws chess.Board.outcome() reports without a claim, once the side to move
+        is known to have a legal move: insufficient material, 75 moves, fivefold repetition."""
+        return self.is_insufficient_material() or self.halfmove >= 150 or self.repetitions() >= 5
+
+
+def perft(pos: SearchPosition, depth: int) -> int:
+    """Number of legal move sequences of length depth."""
+    moves = pos.legal_moves()
+    if depth <= 1:
+        return len(moves) if depth == 1 else 1
+    total = 0
+    for m in moves:
+        pos.make(m)
+        total += perft(pos, depth - 1)
+        pos.unmake()
+    return total
+
+
+def board_perft(board: chess.Board, depth: int) -> int:
+    """perft on python-chess, the reference for the position tests."""
+    if depth == 0:
+        return 1
+    if depth == 1:
+        return board.legal_moves.count()
+    total = 0
+    for mv in board.legal_moves:
+        board.push(mv)
+        total += board_perft(board, depth - 1)
+        board.pop()
+    return total
@@ -0,0 +1,182 @@
+"""
+Persistent search results, shared by every process that opens the same file.
+
+    cache = PositionCache("positions.db", variant="alphabeta")
+    mv, stats = search_move(board, color, 4, tt=cache)     # a TranspositionTable that remembers
+    cache.close()                                          # writes what is still pending
+
+    python tournament.py manifest.json --cache positions.db
+
+PositionCache is a TranspositionTable whose misses fall through to an SQLite
+file, keyed by (search variant, Zobrist key, depth). Results searched at least
+min_depth deep are queued as the search stores them and written in one
+transaction when the next search starts (new_search) or on close, so a worker
+pays for one write per move rather than per node. The file is in WAL mode with
+its reads memory-mapped: any number of processes read it while one at a time
+appends, and a writer waits its turn (timeout) instead of failing. Once the file
+holds more than max_entries rows the oldest-written are deleted, down to nine
+tenths of max_entries. Rows are counted when the file is opened; a flush adds
+what it wrote to that count and counts again only when it passes max_entries,
+or every RECOUNT_FLUSHES flushes to pick up what other processes wrote.
+
+The variant names everything besides the position that changes a result (the
+algorithm and its SearchOptions, tablebases), so searches that would score a
+node differently never share entries. Scores are from the side to move's view,
+as in the in-memory table, so both colors share them.
+"""
+import sqlite3
+import time
+from typing import Optional
+
+import chess
+
+from transposition import TTEntry, TranspositionTable
+
+# entries shallower than this are cheap to search again and are not written
+DEFAULT_MIN_DEPTH = 2
+DEFAULT_MAX_ENTRIES = 2_000_000
+# bytes of the file mapped into memory for reads
+MMAP_BYTES = 256 * 1024 * 1024
+# flushes between exact row counts (other processes' writes are seen only then)
+RECOUNT_FLUSHES = 64
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS positions (
+    variant TEXT NOT NULL,
+    key INTEGER NOT NULL,
+    depth INTEGER NOT NULL,
+    score NOT NULL,
+    flag INTEGER NOT NULL,
+    move TEXT,
+    stamp REAL NOT NULL,
+    UNIQUE (variant, key, depth)
+);
+CREATE INDEX IF NOT EXISTS positions_stamp ON positions (stamp);
+"""
+
+
+def _signed(key: int) -> int:
+    """Zobrist keys are unsigned 64-bit; SQLite integers are signed."""
+    return key - (1 << 64) if key >= 1 << 63 else key
+
+
+class PositionCache(TranspositionTable):
+    """In-memory table of size_mb backed by the SQLite file at path (see module docstring)."""
+
+    def __init__(self, path: str, variant: str = "", size_mb: float = 16,
+                 min_depth: int = DEFAULT_MIN_DEPTH, max_entries: int = DEFAULT_MAX_ENTRIES,
+                 timeout: float = 60.0) -> None:
+        super().__init__(size_mb)
+        self.path = path
+        self.variant = variant
+        self.min_depth = min_depth
+        self.max_entries = max_entries
+        self.disk_hits = 0
+        self.disk_misses = 0
+        self.disk_writes = 0
+        self.evicted = 0
+        self._pending: dict[tuple[int, int], tuple] = {}
+        #keys the file didn't have, so a revisited node isn't looked up twice in one search
+        self._absent: set[int] = set()
+        self._db = sqlite3.connect(path, timeout=timeout, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(f"PRAGMA mmap_size={MMAP_BYTES}")
+        self._db.executescript(_SCHEMA)
+        #rows in the file as far as this process knows: counted now and on each recount,
+        #plus every row written since (an update of an existing row counts too)
+        self._rows = self.entries()
+        self._flushes = 0
+
+    def __enter__(self) -> "PositionCache":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        if self._db is not None:
+            self.flush()
+            self._db.close()
+            self._db = None
+
+    def probe(self, key: int, depth: int = 0) -> Optional[TTEntry]:
+        entry = super().probe(key)
+        #the file only holds results of min_depth and deeper
+        if entry is not None or depth < self.min_depth or key in self._absent:
+            return entry
+        row = self._db.execute(
+            "SELECT depth, score, flag, move FROM positions WHERE variant = ? AND key = ? "
+            "ORDER BY depth DESC LIMIT 1", (self.variant, _signed(key))).fetchone()
+        if row is None:
+            self.disk_misses += 1
+            self._absent.add(key)
+            return None
+        self.disk_hits += 1
+        stored_depth, score, flag, move = row
+        entry = TTEntry(key, stored_depth, score, flag, chess.Move.from_uci(move) if move else None, self.age)
+        self.slots[key % self.size] = entry
+        return entry
+
+    def store(self, key: int, depth: int, score: int, flag: int, move: Optional[chess.Move]) -> None:
+        super().store(key, depth, score, flag, move)
+        if depth >= self.min_depth:
+            self._pending[(key, depth)] = (score, flag, move.uci() if move else None)
+            self._absent.discard(key)
+
+    def new_search(self) -> None:
+        self.flush()
+        self._absent.clear()
+        super().new_search()
+
+    def clear(self) -> None:
+        super().clear()
+        self._pending.clear()
+        self._absent.clear()
+
+    def flush(self) -> None:
+        """Write the queued results in one transaction, then evict if the file is over max_entries."""
+        if not self._pending:
+            return
+        stamp = time.time()
+        rows = [(self.variant, _signed(key), depth, score, flag, move, stamp)
+                for (key, depth), (score, flag, move) in self._pending.items()]
+        self._pending.clear()
+        db = self._db
+        #IMMEDIATE takes the write lock up front, so two writers queue rather than deadlock
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            db.executemany(
+                "INSERT INTO positions (variant, key, depth, score, flag, move, stamp) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?) ON CONFLICT (variant, key, depth) DO UPDATE SET "
+                "score = excluded.score, flag = excluded.flag, move = excluded.move, stamp = excluded.stamp",
+                rows)
+            self._rows += len(rows)
+            self._flushes += 1
+            #COUNT(*) reads the whole index, so only when the running count says it may be needed
+            if self._rows > self.max_entries or self._flushes % RECOUNT_FLUSHES == 0:
+                self._rows, = db.execute("SELECT COUNT(*) FROM positions").fetchone()
+                if self._rows > self.max_entries:
+                    #drop a tenth more than needed so the next flushes don't evict again
+                    excess = self._rows - self.max_entries + self.max_entries // 10
+                    db.execute("DELETE FROM positions WHERE rowid IN "
+                               "(SELECT rowid FROM positions ORDER BY stamp LIMIT ?)", (excess,))
+                    self.evicted += excess
+                    self._rows -= excess
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        self.disk_writes += len(rows)
+
+    def entries(self) -> int:
+        """Rows in the file, across every variant."""
+        return self._db.execute("SELECT COUNT(*) FROM positions").fetchone()[0]
+
+    def stats(self) -> dict:
+        stats = super().stats()
+        lookups = self.disk_hits + self.disk_misses
+        stats.update(disk_hits=self.disk_hits, disk_misses=self.disk_misses,
+                     disk_hit_rate=self.disk_hits / lookups if lookups else 0.0,
+                     disk_writes=self.disk_writes, evicted=self.evicted)
+        return stats
@@ -0,0 +1,172 @@
+"""
+Profiling of move decisions: where the time goes, and at which plies the nodes are.
+
+    CHESS_PROFILE=profiles python chess_run.py         # every decision of the game
+    mv = choose_bot_move(board, color, 4, profile="profiles")
+    python tournament.py manifest.json --profile profiles   # one profile per game
+
+Each profile is three files sharing a prefix (e.g. profiles/alphabeta-4121-0003):
+
+    .collapsed  sampled call stacks, one "outer;...;inner count" line per stack,
+                the input of flamegraph.pl, speedscope or inferno
+    .pstats     the cProfile data, for pstats / snakeviz
+    .txt        nodes per ply, and the functions with the most self and cumulative time
+
+Stacks are sampled every SAMPLE_SECONDS from a background thread, so a count is
+roughly a millisecond. Only the process that makes the decision is profiled:
+with workers > 1 the pool's search time shows up as waiting in parallel_search,
+though the worker nodes are in the ply histogram. A decision made while its
+thread is already profiled (a tournament game) is added to that profile instead
+of getting its own files. With profiling off a decision costs one environment lookup, and
+each node one test of SearchStats.ply_nodes.
+"""
+import io
+import itertools
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Optional
+
+# the output directory; set it to profile every decision without passing profile=
+ENV_VAR = "CHESS_PROFILE"
+SAMPLE_SECONDS = 0.001
+# functions listed in each table of the .txt summary
+TOP_FUNCTIONS = 25
+
+#the profile running in each thread, if any (a ponder thread gets its own)
+_local = threading.local()
+_sequence = itertools.count(1)
+
+
+def _label(code) -> str:
+    path, name = os.path.split(code.co_filename)
+    module = os.path.splitext(name)[0]
+    if module == "__init__":
+        module = os.path.basename(path)
+    return f"{module}:{code.co_qualname}".replace(";", ":").replace(" ", "_")
+
+
+class StackSampler:
+    """Counts the call stacks of one thread, below the frame it was started from."""
+
+    def __init__(self, interval: float = SAMPLE_SECONDS) -> None:
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self, root) -> None:
+        self._root = root
+        self._target = threading.get_ident()
+        self._switch = sys.getswitchinterval()
+        #the sampler needs the GIL at least once per interval
+        sys.setswitchinterval(min(self._switch, self.interval / 2))
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+        sys.setswitchinterval(self._switch)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._target)
+            stack = []
+            while frame is not None:
+                stack.append(_label(frame.f_code))
+                if frame is self._root:
+                    break
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+class Profile:
+    """cProfile plus stack sampling over one or more decisions, written to prefix.* on exit.
+
+    Re-entrant: entering it again (a decision inside a profiled game) only adds to it.
+    record() adds a decision's SearchStats to the summary and ply histogram.
+    """
+
+    def __init__(self, prefix: str, title: str = "") -> None:
+        self.prefix = prefix
+        self.title = title or os.path.basename(prefix)
+        self.decisions = 0
+        self.nodes = 0
+        self.ply_nodes: Counter = Counter()
+        self.seconds = 0.0
+        self._level = 0
+        #cProfile and pstats are imported by profiled runs only
+        import cProfile
+        self._profiler = cProfile.Profile()
+        self._sampler = StackSampler()
+
+    def __enter__(self) -> "Profile":
+        self._level += 1
+        if self._level == 1:
+            _local.current = self
+            self._start = time.perf_counter()
+            self._sampler.start(sys._getframe(1))
+            self._profiler.enable()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._level -= 1
+        if self._level == 0:
+            self._profiler.disable()
+            self._sampler.stop()
+            self.seconds = time.perf_counter() - self._start
+            _local.current = None
+            self.write()
+
+    def record(self, stats) -> None:
+        self.decisions += 1
+        self.nodes += stats.nodes
+        if stats.ply_nodes:
+            self.ply_nodes.update(stats.ply_nodes)
+
+    def write(self) -> None:
+        directory = os.path.dirname(self.prefix)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.prefix + ".collapsed", "w", encoding="utf-8") as f:
+            f.write(self._sampler.collapsed())
+        self._profiler.dump_stats(self.prefix + ".pstats")
+        with open(self.prefix + ".txt", "w", encoding="utf-8") as f:
+            f.write(self.summary())
+
+    def summary(self) -> str:
+        import pstats
+
+        out = io.StringIO()
+        out.write(f"{self.title}: {self.decisions} decision(s), {self.nodes} nodes, "
+                  f"{self.seconds:.3f}s, {sum(self._sampler.stacks.values())} stack samples\n\n")
+        out.write("nodes per ply\n")
+        for ply in sorted(self.ply_nodes):
+            count = self.ply_nodes[ply]
+            out.write(f"  {ply:>3} {count:>10} {count / self.nodes:7.1%}\n")
+        for key, heading in (("tottime", "self time"), ("cumulative", "cumulative time")):
+            out.write(f"\nby {heading}\n")
+            stats = pstats.Stats(self._profiler, stream=out)
+            stats.sort_stats(key).print_stats(TOP_FUNCTIONS)
+        return out.getvalue()
+
+
+def decision_profile(directory: Optional[str], algorithm: str) -> Optional[Profile]:
+    """The Profile a decision should run under: the running one, else a new one in
+    directory (default: $CHESS_PROFILE), else None when profiling is off."""
+    current = getattr(_local, "current", None)
+    if current is not None:
+        return current
+    if directory is None:
+        directory = os.environ.get(ENV_VAR)
+    if not directory:
+        return None
+    return Profile(os.path.join(directory, f"{algorithm}-{os.getpid()}-{next(_sequence):04d}"))
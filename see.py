@@ -0,0 +1,74 @@
+"""
+Static exchange evaluation: what a capture wins or loses once every piece that
+attacks the square has had its turn, cheapest attacker first, without searching.
+
+    see(board, move)        # in pawns (VAL units), e.g. -2 for NxP defended by a pawn
+
+Attackers come from precomputed bitboard tables (python-chess's knight, king and
+pawn attack sets, and its rank/file/diagonal slider tables indexed by occupancy,
+all built at import), so taking a piece off the occupancy uncovers the sliders
+behind it (x-rays). Pins and checks are ignored, as is usual for SEE.
+"""
+import chess
+
+# piece values for exchanges (chess_run.VAL, with a king worth more than anything it can win)
+SEE_VALUES = [0, 1, 3, 3, 5, 9, 100]
+_PROMOTION_GAIN = [0, 0, 2, 2, 4, 8, 0]
+
+_SQUARES = chess.BB_SQUARES
+_KNIGHT = chess.BB_KNIGHT_ATTACKS
+_KING = chess.BB_KING_ATTACKS
+_PAWN = chess.BB_PAWN_ATTACKS
+_DIAG_MASKS, _DIAG = chess.BB_DIAG_MASKS, chess.BB_DIAG_ATTACKS
+_RANK_MASKS, _RANK = chess.BB_RANK_MASKS, chess.BB_RANK_ATTACKS
+_FILE_MASKS, _FILE = chess.BB_FILE_MASKS, chess.BB_FILE_ATTACKS
+
+
+def attackers(board: chess.Board, square: chess.Square, occupied: int) -> int:
+    """Pieces of both colors in occupied that attack square, seen through occupied."""
+    diag = _DIAG[square][_DIAG_MASKS[square] & occupied]
+    line = _RANK[square][_RANK_MASKS[square] & occupied] | _FILE[square][_FILE_MASKS[square] & occupied]
+    pawns = board.pawns
+    return ((_KNIGHT[square] & board.knights)
+            | (_KING[square] & board.kings)
+            #a white pawn attacks square from where a black pawn on square would attack
+            | (_PAWN[chess.BLACK][square] & pawns & board.occupied_co[chess.WHITE])
+            | (_PAWN[chess.WHITE][square] & pawns & board.occupied_co[chess.BLACK])
+            | (diag & (board.bishops | board.queens))
+            | (line & (board.rooks | board.queens))) & occupied
+
+
+def see(board: chess.Board, move: chess.Move) -> int:
+    """Material the side to move nets from move and the exchange it starts on move.to_square."""
+    to_sq, from_sq = move.to_square, move.from_square
+    occupied = board.occupied
+    if board.is_en_passant(move):
+        victim = chess.PAWN
+        occupied ^= _SQUARES[to_sq - 8 if board.turn == chess.WHITE else to_sq + 8]
+    else:
+        victim = board.piece_type_at(to_sq) or 0
+    gains = [SEE_VALUES[victim] + (_PROMOTION_GAIN[move.promotion] if move.promotion else 0)]
+    #the piece now standing on the square, next in line to be taken
+    on_square = move.promotion or board.piece_type_at(from_sq)
+    occupied ^= _SQUARES[from_sq]
+    side = not board.turn
+    while True:
+        attacking = attackers(board, to_sq, occupied)
+        ours = attacking & board.occupied_co[side]
+        if not ours:
+            break
+        for piece_type in chess.PIECE_TYPES:
+            bb = ours & board.pieces_mask(piece_type, side)
+            if bb:
+                break
+        #a king can only take last
+        if piece_type == chess.KING and attacking & board.occupied_co[not side]:
+            break
+        gains.append(SEE_VALUES[on_square] - gains[-1])
+        on_square = piece_type
+        occupied ^= bb & -bb
+        side = not side
+    #each side may stop capturing when going on would cost it
+    for i in range(len(gains) - 1, 0, -1):
+        gains[i - 1] = -max(-gains[i - 1], gains[i])
+    return gains[0]
@@ -0,0 +1,317 @@
+"""
+Asyncio game server: many people play the bot at once over a line protocol.
+
+    python server.py --port 8765 --workers 4 --budget 120
+    nc localhost 8765
+
+Each connection is one game session with its own chess.Board. Commands:
+
+    new [white|black] [depth N] [budget SECONDS] [fen FEN]   start a game as that color
+    move e2e4        play a move; the bot answers with "bot <uci>"
+    fen              current position
+    metrics          server-wide queue and latency figures as one JSON line
+    quit
+
+Replies are "game <id> <fen>", "bot <uci>", "gameover <result> <reason>",
+"fen <fen>", "metrics <json>" and "error <text>".
+
+Bot moves run choose_bot_move's search in a bounded process pool. A request
+waits for a free worker slot in the event loop, so the queue depth and the wait
+are known exactly, and the move's time limit is worked out from the session's
+remaining budget only when its slot comes up. Every search is time-limited
+(the budget is a per-game clock for the bot), so one deep search holds one
+worker for a bounded time while the others keep serving the other sessions.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import math
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Optional
+
+import chess
+
+from chess_run import MAX_DEPTH, parse_color, search_move
+from telemetry import SearchStats
+from transposition import TranspositionTable
+from uci import think_time
+
+DEFAULT_DEPTH = 3
+# seconds of bot thinking per game and session
+DEFAULT_BUDGET = 60.0
+# latency samples kept for the percentiles
+METRIC_SAMPLES = 1000
+
+
+@dataclass
+class Session:
+    """One game: the board, which side the bot plays and its remaining clock."""
+    game_id: int
+    board: chess.Board
+    bot_color: chess.Color
+    depth: int = DEFAULT_DEPTH
+    budget: float = DEFAULT_BUDGET
+    bot_moves: int = 0
+    bot_seconds: float = 0.0
+
+
+def _summary(samples) -> dict:
+    if not samples:
+        return {"mean": 0.0, "p95": 0.0, "max": 0.0}
+    ordered = sorted(samples)
+    return {"mean": sum(ordered) / len(ordered),
+            "p95": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+            "max": ordered[-1]}
+
+
+@dataclass
+class ServerMetrics:
+    """Queue depth and per-move latencies, updated from the event loop."""
+    sessions_active: int = 0
+    sessions_total: int = 0
+    moves: int = 0
+    queue_depth: int = 0        # requests waiting for a worker right now
+    max_queue_depth: int = 0
+    # seconds waiting for a worker, in the search, and from request to reply
+    queue_wait: deque = field(default_factory=lambda: deque(maxlen=METRIC_SAMPLES))
+    search: deque = field(default_factory=lambda: deque(maxlen=METRIC_SAMPLES))
+    latency: deque = field(default_factory=lambda: deque(maxlen=METRIC_SAMPLES))
+
+    def snapshot(self) -> dict:
+        return {
+            "sessions_active": self.sessions_active,
+            "sessions_total": self.sessions_total,
+            "moves": self.moves,
+            "queue_depth": self.queue_depth,
+            "max_queue_depth": self.max_queue_depth,
+            "queue_wait": _summary(self.queue_wait),
+            "search": _summary(self.search),
+            "latency": _summary(self.latency),
+        }
+
+
+#one table per bot color in each worker process, kept across moves and sessions
+_tables: dict = {}
+
+
+def _bot_move_job(args) -> tuple[str, SearchStats]:
+    """Pool worker: replay the game and search the bot's move within time_limit."""
+    fen, moves, bot_color, depth, time_limit, hash_mb = args
+    board = chess.Board(fen)
+    for uci in moves:
+        board.push_uci(uci)
+    if bot_color not in _tables:
+        _tables[bot_color] = TranspositionTable(hash_mb)
+    mv, stats = search_move(board, bot_color, depth, tt=_tables[bot_color], time_limit=time_limit)
+    return mv.uci(), stats
+
+
+class GameServer:
+    """Hosts the sessions and the worker pool. workers bounds the searches running at once."""
+
+    def __init__(self, workers: int = 2, depth: int = DEFAULT_DEPTH, budget: float = DEFAULT_BUDGET,
+                 hash_mb: int = 16) -> None:
+        self.workers = workers
+        self.depth = depth
+        self.budget = budget
+        self.hash_mb = hash_mb
+        self.metrics = ServerMetrics()
+        self.sessions: dict[int, Session] = {}
+        self._ids = itertools.count(1)
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._server: Optional[asyncio.AbstractServer] = None
+        #open connections, closed by close() so their handlers end normally
+        self._connections: dict[asyncio.Task, asyncio.StreamWriter] = {}
+
+    async def start(self, host: str = "127.0.0.1", port: int = 8765) -> int:
+        """Start listening; returns the port (useful with port=0)."""
+        self._pool = ProcessPoolExecutor(self.workers)
+        self._slots = asyncio.Semaphore(self.workers)
+        self._server = await asyncio.start_server(self._handle, host, port)
+        return self._server.sockets[0].getsockname()[1]
+
+    async def close(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        for writer in self._connections.values():
+            writer.close()
+        if self._connections:
+            await asyncio.gather(*self._connections, return_exceptions=True)
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+
+    def new_session(self, args: list[str]) -> Session:
+        """Session for the arguments of a new command (the color is the human's)."""
+        human, depth, budget, fen = chess.WHITE, self.depth, self.budget, chess.STARTING_FEN
+        i = 0
+        while i < len(args):
+            if args[i] == "fen":
+                fen = " ".join(args[i + 1:])
+                break
+            if args[i] == "depth" and i + 1 < len(args):
+                depth = max(1, min(MAX_DEPTH, int(args[i + 1])))
+                i += 1
+            elif args[i] == "budget" and i + 1 < len(args):
+                budget = float(args[i + 1])
+                if not math.isfinite(budget) or budget < 0:
+                    raise ValueError(f"bad budget {args[i + 1]!r}")
+                i += 1
+            else:
+                color = parse_color(args[i])
+                if color is None:
+                    raise ValueError(f"unknown argument {args[i]!r}")
+                human = color
+            i += 1
+        return Session(next(self._ids), chess.Board(fen), not human, depth, budget)
+
+    async def bot_move(self, session: Session) -> chess.Move:
+        """Queue the session's search for a worker and play the move it returns."""
+        metrics = self.metrics
+        requested = time.perf_counter()
+        if self._slots.locked():
+            #every worker is busy: wait in line
+            metrics.queue_depth += 1
+            metrics.max_queue_depth = max(metrics.max_queue_depth, metrics.queue_depth)
+            try:
+                await self._slots.acquire()
+            finally:
+                metrics.queue_depth -= 1
+        else:
+            await self._slots.acquire()
+        try:
+            started = time.perf_counter()
+            board = session.board
+            #the clock is read when the slot comes up, so time spent queued isn't charged to it
+            left = max(session.budget - session.bot_seconds, 0) * 1000
+            limit = think_time(board, {"wtime": left, "btime": left})
+            root = board.root()
+            args = (root.fen(), [m.uci() for m in board.move_stack], session.bot_color,
+                    session.depth, limit, self.hash_mb)
+            uci, stats = await asyncio.get_running_loop().run_in_executor(self._pool, _bot_move_job, args)
+        finally:
+            self._slots.release()
+        done = time.perf_counter()
+        session.bot_seconds += stats.seconds
+        session.bot_moves += 1
+        metrics.moves += 1
+        metrics.queue_wait.append(started - requested)
+        metrics.search.append(done - started)
+        metrics.latency.append(done - requested)
+        mv = chess.Move.from_uci(uci)
+        board.push(mv)
+        return mv
+
+    async def _reply_bot(self, session: Session, send) -> None:
+        if not session.board.is_game_over() and session.board.turn == session.bot_color:
+            mv = await self.bot_move(session)
+            send(f"bot {mv.uci()}")
+        if session.board.is_game_over():
+            outcome = session.board.outcome()
+            send(f"gameover {outcome.result()} {outcome.termination.name.lower()}")
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        session: Optional[Session] = None
+        self._connections[asyncio.current_task()] = writer
+        self.metrics.sessions_active += 1
+
+        def send(line: str) -> None:
+            writer.write((line + "\n").encode())
+
+        try:
+            while True:
+                raw = await reader.readline()
+                if not raw:
+                    break
+                tokens = raw.decode(errors="replace").split()
+                if not tokens:
+                    continue
+                cmd, args = tokens[0], tokens[1:]
+                if cmd == "new":
+                    try:
+                        new = self.new_session(args)
+                    except ValueError as e:
+                        send(f"error {e}")
+                    else:
+                        if session is not None:
+                            self.sessions.pop(session.game_id, None)
+                        session = new
+                        self.sessions[session.game_id] = session
+                        self.metrics.sessions_total += 1
+                        send(f"game {session.game_id} {session.board.fen()}")
+                        await self._reply_bot(session, send)
+                elif cmd == "move":
+                    if session is None:
+                        send("error no game, send new first")
+                    elif session.board.is_game_over() or session.board.turn == session.bot_color:
+                        send("error not your move")
+                    else:
+                        try:
+                            mv = session.board.parse_uci(args[0] if args else "")
+                        except ValueError:
+                            send(f"error illegal move {' '.join(args)}")
+                        else:
+                            session.board.push(mv)
+                            await self._reply_bot(session, send)
+                elif cmd == "fen":
+                    send(f"fen {session.board.fen()}" if session is not None else "error no game")
+                elif cmd == "metrics":
+                    send(f"metrics {json.dumps(self.metrics.snapshot())}")
+                elif cmd == "quit":
+                    send("bye")
+                    break
+                else:
+                    send(f"error unknown command {cmd}")
+                await writer.drain()
+        except ConnectionError:
+            pass
+        except (ValueError, asyncio.IncompleteReadError) as e:
+            #an over-long line (readline's limit) or a bad request ends the connection
+            try:
+                send(f"error {e or type(e).__name__}")
+                await writer.drain()
+            except ConnectionError:
+                pass
+        finally:
+            self.metrics.sessions_active -= 1
+            self._connections.pop(asyncio.current_task(), None)
+            if session is not None:
+                self.sessions.pop(session.game_id, None)
+            writer.close()
+
+
+async def serve(host: str, port: int, workers: int, depth: int, budget: float, report: float) -> None:
+    server = GameServer(workers, depth, budget)
+    port = await server.start(host, port)
+    print(f"Serving on {host}:{port} with {workers} search workers")
+    try:
+        while True:
+            await asyncio.sleep(report)
+            print(json.dumps(server.metrics.snapshot()), flush=True)
+    finally:
+        await server.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Serve games against the bot over TCP.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=2, help="searches running at once")
+    parser.add_argument("--depth", type=int, default=DEFAULT_DEPTH, help="default search depth")
+    parser.add_argument("--budget", type=float, default=DEFAULT_BUDGET,
+                        help="default seconds of bot thinking per game")
+    parser.add_argument("--report", type=float, default=60.0, help="seconds between metrics lines")
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.host, args.port, args.workers, args.depth, args.budget, args.report))
+    except KeyboardInterrupt:
+        print("\nServer stopped.")
+
+
+if __name__ == "__main__":
+    main()
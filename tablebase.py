@@ -0,0 +1,138 @@
+"""
+Syzygy endgame tablebases, probed through python-chess with an in-memory cache.
+
+    tb = load_tablebase("/path/to/syzygy")      # directory of .rtbw / .rtbz files
+    mv = choose_bot_move(board, color, 4, tablebase=tb)
+
+At the root a position the tables cover is answered without searching (best_move
+ranks the moves by their WDL result, then by distance to zeroing). Inside the
+alpha-beta search a covered node returns an exact score from its WDL value:
+TB_WIN_SCORE for a win, 0 for a draw, a cursed win or a blessed loss (those are
+draws under the 50-move rule). Probes are counted in SearchStats (tb_probes,
+tb_hits) and tablebase root moves in the per-game aggregates.
+"""
+import os
+from collections import OrderedDict
+from typing import Optional
+
+import chess
+import chess.syzygy
+
+from telemetry import SearchStats
+from zobrist import board_key
+
+# score of a won tablebase position: above any material line, below a mate the search can see
+TB_WIN_SCORE = 500
+# cached WDL / DTZ values kept per table
+DEFAULT_CACHE_SIZE = 1 << 16
+
+
+class Tablebase:
+    """Syzygy tables (see load_tablebase) plus LRU caches of WDL and DTZ values by Zobrist key."""
+
+    def __init__(self, tables: chess.syzygy.Tablebase, max_pieces: int,
+                 cache_size: int = DEFAULT_CACHE_SIZE) -> None:
+        self._tables = tables
+        self.max_pieces = max_pieces
+        self.cache_size = cache_size
+        self._wdl: OrderedDict = OrderedDict()
+        self._dtz: OrderedDict = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def close(self) -> None:
+        self._tables.close()
+
+    def covers(self, board: chess.Board) -> bool:
+        """Few enough pieces and no castling rights (the tables have none)."""
+        return chess.popcount(board.occupied) <= self.max_pieces and not board.castling_rights
+
+    def _probe(self, cache: OrderedDict, probe, board: chess.Board, key: Optional[int],
+               stats: Optional[SearchStats]) -> Optional[int]:
+        if stats is not None:
+            stats.tb_probes += 1
+        if key is None:
+            key = board_key(board)
+        if key in cache:
+            self.hits += 1
+            cache.move_to_end(key)
+            value = cache[key]
+        else:
+            self.misses += 1
+            #None when a table is missing, so the search carries on as usual
+            value = probe(board, None)
+            cache[key] = value
+            if len(cache) > self.cache_size:
+                cache.popitem(last=False)
+        if stats is not None and value is not None:
+            stats.tb_hits += 1
+        return value
+
+    def wdl(self, board: chess.Board, key: Optional[int] = None,
+            stats: Optional[SearchStats] = None) -> Optional[int]:
+        """WDL for the side to move (2 win, 1 cursed win, 0 draw, -1 blessed loss, -2 loss)."""
+        return self._probe(self._wdl, self._tables.get_wdl, board, key, stats)
+
+    def dtz(self, board: chess.Board, key: Optional[int] = None,
+            stats: Optional[SearchStats] = None) -> Optional[int]:
+        """Distance to the next zeroing move, signed like wdl."""
+        return self._probe(self._dtz, self._tables.get_dtz, board, key, stats)
+
+    def score(self, board: chess.Board, key: Optional[int] = None,
+              stats: Optional[SearchStats] = None) -> Optional[int]:
+        """Exact search score for the side to move, or None if no table covers board."""
+        wdl = self.wdl(board, key, stats)
+        if wdl is None:
+            return None
+        if wdl == 2:
+            return TB_WIN_SCORE
+        if wdl == -2:
+            return -TB_WIN_SCORE
+        return 0
+
+    def best_move(self, board: chess.Board, stats: Optional[SearchStats] = None) -> Optional[chess.Move]:
+        """Best move by the tables: mate if there is one, else the best WDL result,
+        winning by the shortest and losing by the longest distance to zeroing.
+        None if board isn't covered or a table is missing."""
+        if not self.covers(board):
+            return None
+        best_move, best_rank = None, None
+        for mv in board.legal_moves:
+            board.push(mv)
+            try:
+                if board.is_checkmate():
+                    return mv
+                wdl = self.wdl(board, stats=stats)
+                dtz = self.dtz(board, stats=stats) if wdl is not None else None
+            finally:
+                board.pop()
+            if wdl is None or dtz is None:
+                return None
+            ours = -wdl
+            rank = (ours, -abs(dtz) if ours > 0 else abs(dtz))
+            if best_rank is None or rank > best_rank:
+                best_move, best_rank = mv, rank
+        return best_move
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "cached": len(self._wdl) + len(self._dtz),
+        }
+
+
+def load_tablebase(directory: Optional[str], cache_size: int = DEFAULT_CACHE_SIZE) -> Optional[Tablebase]:
+    """Tablebase for the Syzygy files in directory, or None when no directory is given."""
+    if not directory:
+        return None
+    if not os.path.isdir(directory):
+        raise ValueError(f"no such tablebase directory: {directory}")
+    #table names look like KQvK; their length minus the v is the piece count
+    names = [os.path.splitext(f)[0] for f in os.listdir(directory) if f.endswith(".rtbw")]
+    max_pieces = max((len(name) - 1 for name in names), default=0)
+    if not max_pieces:
+        raise ValueError(f"no Syzygy WDL tables in {directory}")
+    return Tablebase(chess.syzygy.open_tablebase(directory), max_pieces, cache_size)
@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+"""Search counters for one move decision, and per-game aggregation for the experiment CSVs."""
+import json
+import os
+from collections import Counter
+from dataclasses import asdict, dataclass, field
+from typing import Optional
+
+import chess
+
+
+@dataclass
+class SearchStats:
+    """Counters filled in by search / max_value / min_value during one move decision."""
+    algorithm: str = "alphabeta"
+    depth: int = 0              # deepest fully searched depth
+    nodes: int = 0              # every position visited, root included
+    interior_nodes: int = 0     # nodes that searched at least one child
+    cutoffs: int = 0            # beta cutoffs (alpha-beta only)
+    first_move_cutoffs: int = 0  # cutoffs caused by the first move searched
+    max_ply: int = 0            # peak recursion depth below the root
+    seconds: float = 0.0        # wall time of the decision
+    book: bool = False          # move came from the opening book, nothing was searched
+    score: float = 0            # search score of the move for the side that played it
+    tablebase: bool = False     # move came from the endgame tablebase, nothing was searched
+    tb_probes: int = 0          # tablebase lookups (WDL or DTZ)
+    tb_hits: int = 0            # lookups a table answered
+    null_cutoffs: int = 0       # nodes cut off by a null-move search
+    lmr_reductions: int = 0     # late moves searched at reduced depth
+    lmr_researches: int = 0     # of those, searched again at full depth
+    futility_pruned: int = 0    # quiet frontier moves skipped by futility pruning
+    pvs_researches: int = 0     # null-window searches that had to be repeated in full
+    aspiration_researches: int = 0  # root searches repeated after failing their window
+    see_pruned: int = 0         # quiescence captures skipped as losing by static exchange
+    ply_nodes: Optional[Counter] = None  # nodes per ply below the root, only while profiling
+    pv: list = field(default_factory=list)  # principal variation of the search, UCI moves
+
+    @property
+    def branching_factor(self) -> float:
+        """Average number of children searched per expanded node."""
+        return (self.nodes - 1) / self.interior_nodes if self.interior_nodes else 0.0
+
+    def cutoff_rate(self) -> float:
+        """Share of cutoffs produced by the first move searched."""
+        return self.first_move_cutoffs / self.cutoffs if self.cutoffs else 0.0
+
+    def merge(self, other: "SearchStats") -> None:
+        """Add the counters of a search run elsewhere (e.g. a pool worker)."""
+        self.nodes += other.nodes
+        self.interior_nodes += other.interior_nodes
+        self.cutoffs += other.cutoffs
+        self.first_move_cutoffs += other.first_move_cutoffs
+        self.max_ply = max(self.max_ply, other.max_ply)
+        self.tb_probes += other.tb_probes
+        self.tb_hits += other.tb_hits
+        self.null_cutoffs += other.null_cutoffs
+        self.lmr_reductions += other.lmr_reductions
+        self.lmr_researches += other.lmr_researches
+        self.futility_pruned += other.futility_pruned
+        self.pvs_researches += other.pvs_researches
+        self.see_pruned += other.see_pruned
+        if self.ply_nodes is not None and other.ply_nodes:
+            self.ply_nodes.update(other.ply_nodes)
+
+    def as_dict(self) -> dict:
+        d = asdict(self)
+        if self.ply_nodes is None:
+            del d["ply_nodes"]
+        d["branching_factor"] = self.branching_factor
+        return d
+
+
+# per-side aggregate columns, prefixed with "minimax_" / "alphabeta_" in the CSVs
+AGGREGATE_FIELDS = ["moves", "nodes", "cutoffs", "seconds", "nodes_per_move",
+                    "seconds_per_move", "branching_factor", "max_ply",
+                    "book_moves", "book_rate", "book_seconds_saved",
+                    "tb_moves", "tb_probes", "tb_hits", "tb_seconds_saved"]
+
+
+class GameTelemetry:
+    """Collects the SearchStats of every move of one game.
+
+    Pass record as the on_move callback of run_game_two_bots_minmax_vs_pruning.
+    With trace_path, every move is also appended to that JSONL file as one line
+    (a single O_APPEND write, so pool workers can share the file).
+    """
+
+    def __init__(self, game_id: str = "", trace_path: Optional[str] = None) -> None:
+        self.game_id = game_id
+        self.trace_path = trace_path
+        self.moves: list[tuple[chess.Move, SearchStats]] = []
+
+    def record(self, move: chess.Move, stats: SearchStats) -> None:
+        self.moves.append((move, stats))
+        if self.trace_path is not None:
+            line = dict(game_id=self.game_id, ply=len(self.moves), move=move.uci(), **stats.as_dict())
+            fd = os.open(self.trace_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, (json.dumps(line) + "\n").encode("utf-8"))
+            finally:
+                os.close(fd)
+
+    def aggregates(self) -> dict:
+        """Per-side totals for the result row, keyed e.g. alphabeta_nodes.
+        book_seconds_saved estimates the search time book moves avoided as
+        (book moves) x (mean wall time of that side's searched moves), and
+        tb_seconds_saved the same for tablebase root moves."""
+        row = {}
+        for algorithm in ("minimax", "alphabeta"):
+            side = [s for _, s in self.moves if s.algorithm == algorithm]
+            n = len(side)
+            nodes = sum(s.nodes for s in side)
+            interior = sum(s.interior_nodes for s in side)
+            seconds = sum(s.seconds for s in side)
+            book = sum(s.book for s in side)
+            tb = sum(s.tablebase for s in side)
+            searched = [s.seconds for s in side if not s.book and not s.tablebase]
+            per_search = sum(searched) / len(searched) if searched else 0
+            values = {
+                "moves": n,
+                "nodes": nodes,
+                "cutoffs": sum(s.cutoffs for s in side),
+                "seconds": round(seconds, 4),
+                "nodes_per_move": round(nodes / n, 1) if n else 0,
+                "seconds_per_move": round(seconds / n, 4) if n else 0,
+                "branching_factor": round((nodes - n) / interior, 3) if interior else 0,
+                "max_ply": max((s.max_ply for s in side), default=0),
+                "book_moves": book,
+                "book_rate": round(book / n, 3) if n else 0,
+                "book_seconds_saved": round(book * per_search, 4),
+                "tb_moves": tb,
+                "tb_probes": sum(s.tb_probes for s in side),
+                "tb_hits": sum(s.tb_hits for s in side),
+                "tb_seconds_saved": round(tb * per_search, 4),
+            }
+            for name in AGGREGATE_FIELDS:
+                row[f"{algorithm}_{name}"] = values[name]
+        return row
+
+
+def aggregate_columns() -> list[str]:
+    return [f"{algorithm}_{name}" for algorithm in ("minimax", "alphabeta") for name in AGGREGATE_FIELDS]
@@ -0,0 +1,80 @@
+from analysis import analyse, analyse_position, read_positions, write_results
+from opening_book import OPENING_FENS
+import analysis
+import chess
+import io
+import json
+
+MATE_IN_ONE = "6k1/5ppp/8/8/8/8/5PPP/R5K1 w - - 0 1"
+INPUT = [
+    "# comment lines and blank lines are skipped",
+    MATE_IN_ONE,
+    "",
+    '6k1/5ppp/8/8/8/8/5PPP/R5K1 w - - bm Ra8#; id "back rank";',
+    "not a position",
+    "7k/5Q2/6K1/8/8/8/8/8 b - - 0 1",
+] + list(OPENING_FENS.values())
+
+
+#rows come back in input order with EPD ids; bad lines and finished games get an error
+def test_rows_in_input_order():
+    rows = list(analyse(INPUT, depth=2))
+    assert [r["index"] for r in rows] == [n for n, _ in read_positions(INPUT)]
+    assert rows[0]["move"] == "a1a8" and rows[1]["id"] == "back rank" and rows[1]["move"] == "a1a8"
+    assert rows[2]["error"].startswith("bad position") and rows[3]["error"] == "game over"
+    for row in rows[4:]:
+        assert chess.Move.from_uci(row["move"]) in chess.Board(row["fen"]).legal_moves
+        assert row["depth"] == 2 and row["nodes"] > 0
+
+
+#FEN move counters may be followed by EPD operations; a failing search costs only its row
+def test_epd_operations_and_search_errors():
+    row = analyse_position(1, MATE_IN_ONE + ' id "counters"; bm Ra8#;', 1)
+    assert row["id"] == "counters" and row["move"] == "a1a8" and row["fen"] == MATE_IN_ONE
+    row = analyse_position(2, '6k1/5ppp/8/8/8/8/5PPP/R5K1 w - - hmvc 7; fmvn 40; id "ops";', 1)
+    assert row["id"] == "ops" and row["fen"].endswith(" 7 40")
+    #a search that raises on one position leaves the rows around it alone
+    real = analysis.search_move
+    broken = chess.Board(INPUT[-1]).fen()
+
+    def failing(board, *args, **kwargs):
+        if board.fen() == broken:
+            raise RuntimeError("broken search")
+        return real(board, *args, **kwargs)
+
+    analysis.search_move = failing
+    try:
+        rows = list(analyse(INPUT, depth=1))
+    finally:
+        analysis.search_move = real
+    assert [r["index"] for r in rows] == [n for n, _ in read_positions(INPUT)]
+    assert rows[-1]["error"] == "search failed: RuntimeError: broken search" and rows[-1]["move"] == ""
+    assert rows[0]["move"] == rows[1]["move"] == "a1a8"
+    assert rows[2]["error"].startswith("bad position") and rows[3]["error"] == "game over"
+    assert all(r["error"] == "" and r["move"] for r in rows[4:-1])
+
+
+#the pool gives the same rows in the same order, whatever the chunking
+def test_pool_matches_serial():
+    lines = INPUT * 3
+    serial = [(r["index"], r["move"], r["score"]) for r in analyse(lines, depth=2)]
+    pooled = [(r["index"], r["move"], r["score"]) for r in analyse(lines, depth=2, workers=2, chunksize=4, in_flight=2)]
+    assert pooled == serial
+
+
+def test_write_formats():
+    rows = list(analyse([MATE_IN_ONE], depth=1))
+    out = io.StringIO()
+    assert write_results(rows, out, "jsonl") == 1
+    assert json.loads(out.getvalue())["move"] == "a1a8"
+    out = io.StringIO()
+    write_results(iter(rows), out, "csv")
+    assert out.getvalue().splitlines()[0].startswith("index,id,fen,move")
+
+
+if __name__ == "__main__":
+    test_rows_in_input_order()
+    test_epd_operations_and_search_errors()
+    test_pool_matches_serial()
+    test_write_formats()
+    print("all analysis tests passed")
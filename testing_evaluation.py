@@ -0,0 +1,102 @@
+from chess_run import *
+from chess_run import _static_score
+from evaluation import bitboards, evaluate, evaluate_batch
+from testing_openings import OPENING_FENS
+import chess
+import engine
+import evaluation
+import gc
+import multiprocessing as mp
+import os
+import random
+import tempfile
+
+
+def _random_positions(count: int, seed: int = 5) -> list[chess.Board]:
+    rng = random.Random(seed)
+    boards = []
+    for _ in range(count):
+        board = chess.Board()
+        for _ in range(rng.randint(0, 120)):
+            if board.is_game_over():
+                break
+            board.push(rng.choice(list(board.legal_moves)))
+        boards.append(board)
+    return boards
+
+
+#the NumPy batch and the Python loop are the same function
+def test_batch_matches_loop():
+    boards = _random_positions(80) + [chess.Board(fen) for fen in OPENING_FENS.values()]
+    rows = [bitboards(b) for b in boards]
+    for material in (True, False):
+        assert evaluate_batch(rows, material) == [evaluate(b, material) for b in boards]
+    assert evaluate_batch([]) == []
+
+
+#scores are from white's side: the start is level and a mirrored position flips the sign
+def test_evaluation_symmetry():
+    assert evaluate(chess.Board()) == 0
+    for board in _random_positions(20, seed=9):
+        assert evaluate(board.mirror()) == -evaluate(board)
+
+
+#a depth-1 search with evaluate scores each move by its gain plus the child's static score
+def test_search_uses_batched_leaves():
+    options = SearchOptions(evaluate=True)
+    for fen in OPENING_FENS.values():
+        board = chess.Board(fen)
+        totals = []
+        for mv in board.legal_moves:
+            gain = material_gain(board, mv)
+            board.push(mv)
+            totals.append(gain + _static_score(board, not board.turn))
+            board.pop()
+        score, mv = search(board, 1, -10**9, 10**9, board.turn, ctx=SearchContext(options=options))
+        assert abs(score - max(totals)) < 1e-9
+        assert mv in board.legal_moves
+        mv = choose_bot_move(board, board.turn, 3, options=options)
+        assert mv in board.legal_moves
+
+
+def _batch_in_worker(rows):
+    #a forked worker finds the weights already loaded
+    return evaluation._weights is not None, evaluate_batch(rows)
+
+
+#the weights are written once, memory-mapped by later loads, and inherited by forked workers
+def test_weights_file_and_forking():
+    rows = [bitboards(b) for b in _random_positions(10, seed=3)]
+    expected = evaluate_batch(rows)
+    saved = evaluation._weights
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ[evaluation.TABLE_DIR_ENV] = tmp
+        try:
+            evaluation._weights = None
+            assert evaluate_batch(rows) == expected
+            assert os.listdir(tmp) == [os.path.basename(evaluation.table_path())]
+            evaluation._weights = None
+            assert evaluate_batch(rows) == expected
+            assert not evaluation._weights.flags.writeable
+        finally:
+            del os.environ[evaluation.TABLE_DIR_ENV]
+            evaluation._weights = saved
+    assert engine.evaluate_fens([chess.STARTING_FEN, OPENING_FENS["Queen's Gambit"]]) == \
+        [engine.evaluate_fen(chess.STARTING_FEN), engine.evaluate_fen(OPENING_FENS["Queen's Gambit"])]
+    if "fork" in mp.get_all_start_methods():
+        try:
+            with engine.forking(), mp.get_context("fork").Pool(1) as pool:
+                assert gc.get_freeze_count() > 0
+                assert pool.apply(_batch_in_worker, (rows,)) == (True, expected)
+            #the heap of the process that forked is not left frozen
+            assert gc.get_freeze_count() == 0
+        finally:
+            gc.unfreeze()
+
+
+if __name__ == "__main__":
+    test_batch_matches_loop()
+    test_evaluation_symmetry()
+    test_search_uses_batched_leaves()
+    test_weights_file_and_forking()
+    print("all evaluation tests passed")
@@ -0,0 +1,85 @@
+from game_archive import GameArchive, game_pgn
+from tournament import checkpoint_path, expand_manifest, run_tournament
+import chess
+import chess.pgn
+import io
+import os
+import random
+import tempfile
+
+
+def _random_game(seed: int, fen: str = chess.STARTING_FEN) -> chess.Board:
+    rng = random.Random(seed)
+    board = chess.Board(fen)
+    while not board.is_game_over() and len(board.move_stack) < 200:
+        board.push(rng.choice(list(board.legal_moves)))
+    return board
+
+
+#random games (castling, promotions, en passant, odd start positions) come back move for move
+def test_archive_round_trip():
+    games = [_random_game(i) for i in range(30)]
+    games.append(_random_game(99, "r3k2r/1P6/8/3pP3/8/8/6p1/R3K2R w KQkq d6 0 1"))
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "games.bin")
+        with GameArchive(path) as archive:
+            for i, board in enumerate(games):
+                assert archive.append(board, {"Round": i}) == i
+        #four bytes of record header plus two per move, besides the JSON headers
+        plies = sum(len(b.move_stack) for b in games)
+        assert os.path.getsize(path) < 8 + plies * 2 + len(games) * 40
+        with GameArchive(path) as archive:
+            assert len(archive) == len(games)
+            for n in (30, 0, 17):
+                headers, board = archive.read(n)
+                assert headers["Round"] == n and board.move_stack == games[n].move_stack
+                assert board.root().fen() == games[n].root().fen()
+            replayed = list(archive.games(start=5))
+            assert [b.fen() for _, b in replayed] == [b.fen() for b in games[5:]]
+        #a torn index entry is dropped when the archive is reopened
+        with open(path + ".idx", "ab") as f:
+            f.write(b"\x01\x02\x03")
+        with GameArchive(path) as archive:
+            assert len(archive) == len(games)
+            archive.append(games[0])
+            assert archive.read(len(games))[1].move_stack == games[0].move_stack
+
+
+def test_pgn_headers_and_times():
+    board = _random_game(4)
+    game = game_pgn(board, {"MinimaxDepth": 2}, [0.5, None, 0.25])
+    text = str(game)
+    assert '[MinimaxDepth "2"]' in text and "[%emt 0.500]" in text and "[%emt 0.250]" in text
+    again = chess.pgn.read_game(io.StringIO(text))
+    assert list(again.mainline_moves()) == board.move_stack
+
+
+#the tournament keeps every finished game in both formats
+def test_tournament_keeps_games():
+    with tempfile.TemporaryDirectory() as tmp:
+        output = os.path.join(tmp, "results.csv")
+        ckpt_dir = os.path.join(tmp, "checkpoints")
+        os.makedirs(ckpt_dir)
+        jobs = expand_manifest({
+            "openings": ["Start"],
+            "configs": [{"minimax_color": "white", "depth_minimax": 1, "depth_alphabeta": 1, "repetitions": 1}],
+        })
+        with open(checkpoint_path(ckpt_dir, jobs[0]), "w", encoding="utf-8") as f:
+            f.write(jobs[0].job_id + "\nf2f3\ne7e5\ng2g4\nd8h4\n")
+        pgn, archive_path = os.path.join(tmp, "games.pgn"), os.path.join(tmp, "games.bin")
+        run_tournament(jobs, output, ckpt_dir, processes=1, pgn_path=pgn, archive_path=archive_path)
+        with open(pgn, encoding="utf-8") as f:
+            game = chess.pgn.read_game(f)
+        assert game.headers["Result"] == "0-1" and game.headers["White"] == "minimax depth 1"
+        assert game.headers["JobId"] == jobs[0].job_id
+        assert [m.uci() for m in game.mainline_moves()] == ["f2f3", "e7e5", "g2g4", "d8h4"]
+        with GameArchive(archive_path) as archive:
+            headers, board = archive.read(0)
+        assert board.is_checkmate() and headers["Opening"] == "Start"
+
+
+if __name__ == "__main__":
+    test_archive_round_trip()
+    test_pgn_headers_and_times()
+    test_tournament_keeps_games()
+    print("all game archive tests passed")
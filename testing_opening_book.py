@@ -0,0 +1,60 @@
+from chess_run import *
+from opening_book import OPENING_LINES, OpeningBook, default_book
+import chess
+import chess.polyglot
+import os
+import random
+import tempfile
+
+
+#a saved book reads back the same through python-chess's own Polyglot reader (castling included)
+def test_polyglot_round_trip():
+    book = default_book()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "book.bin")
+        book.save(path)
+        reloaded = OpeningBook.from_polyglot(path)
+        with chess.polyglot.open_reader(path) as reader:
+            for line in OPENING_LINES.values():
+                board = chess.Board()
+                for uci in line:
+                    ours = {(mv, w) for mv, w in book.entries(board)}
+                    assert ours == {(mv, w) for mv, w in reloaded.entries(board)}
+                    assert ours == {(e.move, e.weight) for e in reader.find_all(board)}
+                    assert chess.Move.from_uci(uci) in {mv for mv, _ in ours}
+                    board.push_uci(uci)
+
+
+def test_pgn_book_weights_and_selection():
+    pgn = "1. e4 e5 2. Nf3 *\n\n1. e4 c5 *\n\n1. d4 d5 *\n"
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "games.pgn")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(pgn)
+        book = OpeningBook.from_pgn(path, weighted=False)
+    board = chess.Board()
+    assert book.entries(board) == [(chess.Move.from_uci("e2e4"), 2), (chess.Move.from_uci("d2d4"), 1)]
+    assert book.choose(board) == chess.Move.from_uci("e2e4")
+    book.weighted = True
+    picks = {book.choose(board, rng=random.Random(s)) for s in range(40)}
+    assert picks == {chess.Move.from_uci("e2e4"), chess.Move.from_uci("d2d4")}
+    board.push_uci("a2a3")
+    assert book.choose(board) is None
+
+
+#in book the move is answered without a search, out of book the bot searches as before
+def test_choose_bot_move_uses_book():
+    book = default_book(weighted=False)
+    board = chess.Board()
+    mv, stats = search_move(board, chess.WHITE, 3, book=book)
+    assert stats.book and stats.nodes == 0 and mv in board.legal_moves
+    board = chess.Board(chess.Board().fen().replace("w KQkq", "b KQkq"))
+    mv, stats = minmax_search_move(board, chess.BLACK, 1, book=book)
+    assert not stats.book and stats.nodes > 0
+
+
+if __name__ == "__main__":
+    test_polyglot_round_trip()
+    test_pgn_book_weights_and_selection()
+    test_choose_bot_move_uses_book()
+    print("all opening book tests passed")
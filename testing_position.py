@@ -0,0 +1,75 @@
+from chess_run import *
+from position import SearchPosition, board_perft, from_move, perft, to_move
+from testing_openings import OPENING_FENS
+import chess
+import chess.polyglot
+import random
+
+# standard perft positions with their published node counts
+PERFT_CASES = {
+    chess.STARTING_FEN: [20, 400, 8902],
+    "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1": [48, 2039, 97862],
+    "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1": [14, 191, 2812, 43238],
+    "r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1": [6, 264, 9467],
+    "rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8": [44, 1486, 62379],
+}
+
+
+def test_perft():
+    for fen, counts in PERFT_CASES.items():
+        pos = SearchPosition.from_board(chess.Board(fen))
+        for depth, expected in enumerate(counts, 1):
+            assert perft(pos, depth) == expected, (fen, depth)
+        assert pos.fen() == chess.Board(fen).fen(en_passant="fen")
+    for fen in OPENING_FENS.values():
+        assert perft(SearchPosition.from_board(chess.Board(fen)), 3) == board_perft(chess.Board(fen), 3), fen
+
+
+#random games: same legal moves, key, check and draw rules as python-chess, and unmake restores everything
+def test_make_unmake_matches_board():
+    rng = random.Random(3)
+    for _ in range(40):
+        board = chess.Board()
+        pos = SearchPosition.from_board(board)
+        for _ in range(160):
+            assert sorted(to_move(m).uci() for m in pos.legal_moves()) == sorted(m.uci() for m in board.legal_moves)
+            assert pos.key == chess.polyglot.zobrist_hash(board), board.fen()
+            assert pos.in_check() == board.is_check()
+            assert pos.is_insufficient_material() == board.is_insufficient_material()
+            if board.is_game_over():
+                break
+            mv = rng.choice(list(board.legal_moves))
+            board.push(mv)
+            pos.make(from_move(mv))
+        while board.move_stack:
+            board.pop()
+            pos.unmake()
+            assert pos.fen() == board.fen(en_passant="fen")
+            assert pos.key == chess.polyglot.zobrist_hash(board)
+
+
+#both searches give the same score on a SearchPosition as on the chess.Board
+def test_searches_run_on_position():
+    fens = list(OPENING_FENS.values()) + [
+        "6k1/5ppp/8/8/8/8/5PPP/R5K1 w - - 0 1",
+        "7k/5Q2/6K1/8/8/8/8/8 b - - 0 1",
+    ]
+    for fen in fens:
+        board = chess.Board(fen)
+        for depth in (1, 2, 3):
+            expected, _ = min_max_search(board, depth, chess.WHITE)
+            score, _ = min_max_search(SearchPosition.from_board(board), depth, chess.WHITE)
+            assert score == expected, (fen, depth)
+            score, mv = search(SearchPosition.from_board(board), depth, -10**9, 10**9, chess.WHITE,
+                               TranspositionTable(1))
+            assert score == expected, (fen, depth)
+            assert mv is None or mv in board.legal_moves
+    mv = choose_bot_move(chess.Board(), chess.WHITE, 3, options=SearchOptions(compact=True))
+    assert mv in chess.Board().legal_moves
+
+
+if __name__ == "__main__":
+    test_perft()
+    test_make_unmake_matches_board()
+    test_searches_run_on_position()
+    print("all position tests passed")
@@ -0,0 +1,79 @@
+from chess_run import minmax_search_move, search_move
+from position_cache import RECOUNT_FLUSHES, PositionCache
+from testing_openings import OPENING_FENS
+import chess
+import multiprocessing as mp
+import os
+import tempfile
+
+
+#a second search from a fresh process-like cache reads the first one's results back
+def test_second_search_reads_file():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "positions.db")
+        board = chess.Board(OPENING_FENS["Queen's Gambit"])
+        runs = []
+        for _ in range(2):
+            with PositionCache(path, "minimax") as cache:
+                runs.append(minmax_search_move(board, board.turn, 3, tt=cache))
+        (first_move, first), (second_move, second) = runs
+        assert second.score == first.score and second_move == first_move
+        assert second.nodes < first.nodes // 100
+        #another variant shares the file, not the results
+        with PositionCache(path, "alphabeta|") as cache:
+            _, stats = search_move(board, board.turn, 3, tt=cache)
+            assert cache.disk_hits == 0 and stats.score == first.score
+
+
+def _search_into(args):
+    path, fen = args
+    board = chess.Board(fen)
+    with PositionCache(path, "alphabeta|") as cache:
+        search_move(board, board.turn, 4, tt=cache)
+    return cache.disk_writes
+
+
+#several processes append to one file at once without losing writes
+def test_concurrent_writers():
+    fens = list(OPENING_FENS.values()) + [chess.STARTING_FEN]
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "positions.db")
+        with mp.Pool(4) as pool:
+            writes = pool.map(_search_into, [(path, fen) for fen in fens])
+        assert all(writes)
+        with PositionCache(path) as cache:
+            #the openings share no positions at these depths
+            assert cache.entries() == sum(writes)
+
+
+def test_eviction_bounds_file():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "positions.db")
+        with PositionCache(path, "alphabeta|", max_entries=50) as cache:
+            for fen in OPENING_FENS.values():
+                board = chess.Board(fen)
+                search_move(board, board.turn, 4, tt=cache)
+            cache.flush()
+            assert cache.evicted > 0 and cache.entries() <= 50
+        #rows another cache wrote are counted when a cache opens, or at its next recount
+        with PositionCache(path, "other|", max_entries=10**6) as other:
+            for key in range(100):
+                other.store(key, 3, 0, 0, None)
+        with PositionCache(path, "alphabeta|", max_entries=50) as cache, \
+                PositionCache(path, "other|", max_entries=10**6) as other:
+            cache.store(1, 3, 0, 0, None)
+            cache.flush()
+            assert cache.entries() <= 50
+            for flush in range(RECOUNT_FLUSHES):
+                other.store(1000 + flush, 3, 0, 0, None)
+                other.flush()
+                cache.store(flush, 3, 0, 0, None)
+                cache.flush()
+            assert cache.entries() <= 50
+
+
+if __name__ == "__main__":
+    test_second_search_reads_file()
+    test_concurrent_writers()
+    test_eviction_bounds_file()
+    print("all position cache tests passed")
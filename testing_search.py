@@ -0,0 +1,340 @@
+from chess_run import *
+from chess_run import _aspiration_width, _score_root_move
+from see import attackers, see
+from telemetry import GameTelemetry, aggregate_columns
+from testing_openings import OPENING_FENS
+from zobrist import board_key, push_keyed
+import chess
+import chess.polyglot
+import os
+import random
+import tempfile
+import time
+
+
+#incremental keys must match python-chess's polyglot hash after every move
+def test_zobrist_incremental():
+    rng = random.Random(7)
+    for _ in range(50):
+        board = chess.Board()
+        key = board_key(board)
+        for _ in range(100):
+            legal = list(board.legal_moves)
+            if not legal:
+                break
+            key = push_keyed(board, key, rng.choice(legal))
+            assert key == chess.polyglot.zobrist_hash(board), board.fen()
+
+
+#alpha-beta only prunes, so with or without a table it must agree with plain minimax
+def test_search_matches_minimax():
+    for fen in OPENING_FENS.values():
+        board = chess.Board(fen)
+        expected, _ = min_max_search(board, 3, board.turn)
+        score, _ = search(board, 3, -10**9, 10**9, board.turn)
+        assert score == expected, fen
+        score, _ = search(board, 3, -10**9, 10**9, board.turn, TranspositionTable(1))
+        assert score == expected, fen
+        score, _ = min_max_search(board, 3, board.turn, TranspositionTable(1))
+        assert score == expected, fen
+
+
+#the minimax of the original code: immediate_reward per edge, MATE_SCORE at a mated node
+def _reference_minimax(board, depth, bot_color):
+    if depth == 0 or board.is_game_over():
+        if board.is_checkmate():
+            return -MATE_SCORE if board.turn == bot_color else MATE_SCORE
+        return 0
+    totals = []
+    for move in board.legal_moves:
+        reward = immediate_reward(board, move, bot_color)
+        board.push(move)
+        totals.append(reward + _reference_minimax(board, depth - 1, bot_color))
+        board.pop()
+    return max(totals) if board.turn == bot_color else min(totals)
+
+
+#fixed positions with mates, promotions, en passant and exchanges keep the original scores
+def test_scores_match_reference_minimax():
+    fens = [
+        "6k1/5ppp/8/8/8/8/5PPP/R5K1 w - - 0 1",          # back-rank mate
+        "7k/8/8/8/8/1r6/r7/6K1 w - - 0 1",                # mated next move
+        "8/2P3k1/8/8/8/8/6p1/4K3 w - - 0 1",              # both sides promote
+        "4k3/8/8/3pP3/8/8/8/4K3 w - d6 0 2",              # en passant
+        "r1bqkb1r/pppp1ppp/2n2n2/4p2Q/2B1P3/8/PPPP1PPP/RNB1K1NR w KQkq - 4 4",
+        "2r3k1/5ppp/8/3q4/3N4/2Q5/5PPP/6K1 b - - 0 1",
+    ]
+    for fen in fens:
+        board = chess.Board(fen)
+        for depth in (1, 2, 3):
+            expected = _reference_minimax(board, depth, board.turn)
+            assert min_max_search(board, depth, board.turn)[0] == expected, (fen, depth)
+            assert min_max_search(board, depth, board.turn, TranspositionTable(1))[0] == expected, (fen, depth)
+            assert search(board, depth, -10**9, 10**9, board.turn)[0] == expected, (fen, depth)
+            ctx = SearchContext(options=SearchOptions(compact=True))
+            assert search(board, depth, -10**9, 10**9, board.turn, ctx=ctx)[0] == expected, (fen, depth)
+            assert board.fen() == fen
+
+
+def test_tt_reused_across_moves():
+    tt = TranspositionTable(1)
+    board = chess.Board()
+    for _ in range(4):
+        board.push(choose_bot_move(board, board.turn, 3, tt=tt))
+    stats = tt.stats()
+    assert stats["hits"] > 0
+    assert stats["hits"] + stats["misses"] >= stats["stores"]
+
+
+#every stage together yields each legal move exactly once, hash move first
+def test_staged_moves_cover_legal_moves():
+    rng = random.Random(11)
+    board = chess.Board()
+    for _ in range(80):
+        legal = list(board.legal_moves)
+        if not legal:
+            break
+        hash_move = rng.choice(legal)
+        staged = list(staged_moves(board, hash_move, killers=[rng.choice(legal)]))
+        assert staged[0] == hash_move
+        assert sorted(m.uci() for m in staged) == sorted(m.uci() for m in legal)
+        noisy = list(staged_moves(board, captures_only=True))
+        assert sorted(m.uci() for m in noisy) == sorted(m.uci() for m in legal if board.is_capture(m) or m.promotion)
+        board.push(rng.choice(legal))
+
+
+#quiet cutoffs fill killer slots and history, and instrument counts first-move cutoffs
+def test_killers_history_and_cutoff_rate():
+    board = chess.Board(OPENING_FENS["Queen's Gambit"])
+    ctx = SearchContext(instrument=True)
+    search(board, 4, -10**9, 10**9, board.turn, ctx=ctx)
+    assert any(k[0] is not None for k in ctx.killers)
+    assert any(ctx.history[chess.WHITE]) or any(ctx.history[chess.BLACK])
+    assert 0 < ctx.stats.first_move_cutoffs <= ctx.stats.cutoffs
+    assert 0.0 < ctx.stats.cutoff_rate() <= 1.0
+
+
+#depth 1 grabs the defended pawn; quiescence sees the recapture
+def test_quiescence_sees_recapture():
+    board = chess.Board("4k3/8/2p5/3p4/8/8/8/3QK3 w - - 0 1")
+    _, mv = search(board, 1, -10**9, 10**9, chess.WHITE)
+    assert mv == chess.Move.from_uci("d1d5")
+    for margin in (2, None):
+        ctx = SearchContext(options=SearchOptions(qdepth=4, delta_margin=margin))
+        score, mv = search(board, 1, -10**9, 10**9, chess.WHITE, ctx=ctx)
+        assert score == 0 and mv != chess.Move.from_uci("d1d5")
+
+
+#root split gives search()'s score, and the same move for a seed whatever the worker count
+def test_parallel_search_deterministic():
+    board = chess.Board(OPENING_FENS["Queen's Gambit"])
+    expected, _ = search(board, 3, -10**9, 10**9, board.turn)
+    picks = set()
+    for workers in (2, 3, 2):
+        score, mv = parallel_search(board, 3, board.turn, workers, seed=5)
+        assert score == expected
+        picks.add(mv)
+    assert len(picks) == 1
+
+
+#a time-limited move must come back near the budget, be legal and leave the board untouched
+def test_time_limited_move():
+    for fen in OPENING_FENS.values():
+        board = chess.Board(fen)
+        start = time.perf_counter()
+        mv = choose_bot_move(board, board.turn, MAX_DEPTH, time_limit=0.5)
+        assert time.perf_counter() - start < 1.5
+        assert board.fen() == fen
+        assert mv in board.legal_moves
+    _, mv, depth = iterative_deepening(chess.Board(), chess.WHITE, 2, 60)
+    assert depth == 2 and mv is not None
+
+
+#per-move stats come back with the move and add up into the per-game row
+def test_search_telemetry():
+    board = chess.Board()
+    telemetry = GameTelemetry()
+    mv, stats = minmax_search_move(board, board.turn, 2)
+    telemetry.record(mv, stats)
+    board.push(mv)
+    mv, stats = search_move(board, board.turn, 3)
+    telemetry.record(mv, stats)
+    assert stats.algorithm == "alphabeta" and stats.depth == 3
+    assert stats.nodes > stats.interior_nodes > 0 and stats.max_ply >= 3
+    row = telemetry.aggregates()
+    assert set(row) == set(aggregate_columns())
+    assert row["minimax_moves"] == row["alphabeta_moves"] == 1
+    assert row["minimax_nodes"] == 1 + 20 + 400
+
+
+#each selective technique on its own searches fewer nodes and still returns a legal move;
+#futility with a zero margin is exact when leaves score 0
+def test_selective_search_switches():
+    fens = [chess.STARTING_FEN, OPENING_FENS["Queen's Gambit"]]
+    plain_nodes, plain_scores = 0, []
+    for fen in fens:
+        board = chess.Board(fen)
+        ctx = SearchContext(TranspositionTable(4))
+        plain_scores.append(search(board, 4, -10**9, 10**9, board.turn, ctx=ctx)[0])
+        plain_nodes += ctx.stats.nodes
+    for options, counter in ((SearchOptions(null_move=2), "null_cutoffs"),
+                             (SearchOptions(lmr_moves=3), "lmr_reductions"),
+                             (SearchOptions(futility_margin=0), "futility_pruned")):
+        nodes, fired, scores = 0, 0, []
+        for fen in fens:
+            board = chess.Board(fen)
+            ctx = SearchContext(TranspositionTable(4), options=options)
+            score, mv = search(board, 4, -10**9, 10**9, board.turn, ctx=ctx)
+            assert mv in board.legal_moves and board.fen() == fen
+            scores.append(score)
+            nodes += ctx.stats.nodes
+            fired += getattr(ctx.stats, counter)
+        assert fired > 0 and nodes < plain_nodes, (options, nodes, plain_nodes)
+        if options.futility_margin is not None:
+            assert scores == plain_scores
+    #king and pawns only: no null move (zugzwang guard)
+    board = chess.Board("8/8/4k3/8/4P3/4K3/8/8 w - - 0 1")
+    ctx = SearchContext(options=SearchOptions(null_move=2))
+    search(board, 5, -10**9, 10**9, chess.WHITE, ctx=ctx)
+    assert ctx.stats.null_cutoffs == 0
+
+
+#PVS and aspiration windows change how much is searched, not the score
+def test_pvs_and_aspiration_scores():
+    fens = [chess.STARTING_FEN, "6k1/5ppp/8/8/8/8/5PPP/R5K1 w - - 0 1"] + list(OPENING_FENS.values())
+    researches = 0
+    for fen in fens:
+        board = chess.Board(fen)
+        _, plain = search_move(board, board.turn, 3, tt=TranspositionTable(4), options=SearchOptions(evaluate=True))
+        for options in (SearchOptions(pvs=True, evaluate=True), SearchOptions(aspiration=0.25, evaluate=True),
+                        SearchOptions(pvs=True, aspiration=0.25, evaluate=True)):
+            mv, stats = search_move(board, board.turn, 3, tt=TranspositionTable(4), options=options)
+            assert abs(stats.score - plain.score) < 1e-9 and mv in board.legal_moves, (fen, options)
+            assert stats.depth == 3
+            researches += stats.pvs_researches + stats.aspiration_researches
+    assert researches > 0
+    #evaluated scores widen the window to the last swing; material scores keep the width
+    assert _aspiration_width(SearchOptions(aspiration=0.25, evaluate=True), 0.6) == 0.6
+    assert _aspiration_width(SearchOptions(aspiration=0.25), 0.6) == 0.25
+
+
+#with evaluated (fractional) scores PVS's null windows still find the full-window score and a best move
+def test_pvs_matches_full_window_with_evaluate():
+    fens = ["6k1/5ppp/8/8/8/8/5PPP/R5K1 w - - 0 1", "r1bqkb1r/pppp1ppp/2n2n2/4p2Q/2B1P3/8/PPPP1PPP/RNB1K1NR w KQkq - 4 4"]
+    for fen in fens + list(OPENING_FENS.values()):
+        board = chess.Board(fen)
+        for depth in (2, 3):
+            plain = SearchContext(options=SearchOptions(evaluate=True))
+            expected, _ = search(board, depth, -10**9, 10**9, board.turn, ctx=plain)
+            ctx = SearchContext(options=SearchOptions(evaluate=True, pvs=True))
+            score, mv = search(board, depth, -10**9, 10**9, board.turn, ctx=ctx)
+            assert abs(score - expected) < 1e-9, (fen, depth)
+            #the move PVS picked is worth the same under a full-window search of it
+            total = _score_root_move(board, mv, depth, -10**9, 10**9, board.turn,
+                                     SearchContext(options=SearchOptions(evaluate=True)))
+            assert abs(total - expected) < 1e-9, (fen, depth, mv)
+
+
+#a seed makes the random tie-break repeatable; PVS has no random ties at all
+def test_seeded_ties_are_reproducible():
+    board = chess.Board(OPENING_FENS["Queen's Gambit"])
+    runs = [search_move(board, board.turn, 3, seed=11) for _ in range(2)]
+    assert runs[0][0] == runs[1][0] and runs[0][1].nodes == runs[1][1].nodes
+    #without seed= the tie-break is seeded from SearchOptions.seed
+    runs = [search_move(board, board.turn, 3, options=SearchOptions(seed=5)) for _ in range(2)]
+    assert runs[0][0] == runs[1][0] and runs[0][1].nodes == runs[1][1].nodes
+    assert {search_move(board, board.turn, 3)[0] for _ in range(3)} == {search_move(board, board.turn, 3, seed=0)[0]}
+    runs = [search_move(board, board.turn, 3, options=SearchOptions(pvs=True)) for _ in range(2)]
+    assert runs[0][0] == runs[1][0] and runs[0][1].nodes == runs[1][1].nodes
+
+
+#exchanges with x-rays, en passant and defended victims; attackers agree with python-chess
+def test_static_exchange():
+    cases = [("1k1r4/1pp4p/p7/4p3/8/P5P1/1PP4P/2K1R3 w - - 0 1", "e1e5", 1),
+             ("1k1r3q/1ppn3p/p4b2/4p3/8/P2N2P1/1PP1R1BP/2K1Q3 w - - 0 1", "d3e5", -2),
+             ("4k3/3r4/8/3p4/4P3/8/8/3RK3 w - - 0 1", "d1d5", 1),
+             ("4k3/3r4/8/3p4/8/8/8/3RK3 w - - 0 1", "d1d5", -4),
+             ("4k3/8/2p5/3q4/8/8/3Q4/3RK3 w - - 0 1", "d2d5", 1),
+             ("4k3/8/8/3pP3/8/8/8/4K3 w - d6 0 1", "e5d6", 1)]
+    for fen, uci, value in cases:
+        assert see(chess.Board(fen), chess.Move.from_uci(uci)) == value, (fen, uci)
+    board = chess.Board(OPENING_FENS["Queen's Gambit"])
+    for sq in chess.SQUARES:
+        assert attackers(board, sq, board.occupied) == int(board.attackers(chess.WHITE, sq) | board.attackers(chess.BLACK, sq))
+    #losing captures still come, after the winning ones and the killers
+    rooks = chess.Board("4k3/3r4/8/3p4/8/5N2/7p/3RK3 w - - 0 1")
+    staged = list(staged_moves(rooks, killers=[chess.Move.from_uci("e1e2")], see=True))
+    assert sorted(m.uci() for m in staged) == sorted(m.uci() for m in rooks.legal_moves)
+    assert [m.uci() for m in staged[:3]] == ["f3h2", "e1e2", "d1d5"]
+    ctx = SearchContext(options=SearchOptions(qdepth=6, see=True))
+    _, mv = search(board, 3, -10**9, 10**9, board.turn, ctx=ctx)
+    assert mv in board.legal_moves and ctx.stats.see_pruned > 0
+
+
+#a ponder hit answers from the background search; a miss stops it and leaves no answer
+def test_ponder_hit_and_miss():
+    board = chess.Board()
+    ponder = Ponder(chess.BLACK, 2, TranspositionTable(4))
+    ponder.start(board)
+    guess = ponder.guess
+    assert guess in board.legal_moves
+    answer = ponder.finish(guess)
+    board.push(guess)
+    assert answer in board.legal_moves and ponder.hits == 1
+    board.push(answer)
+    ponder.start(board)
+    miss = next(m for m in board.legal_moves if m != ponder.guess)
+    assert ponder.finish(miss) is None
+    assert ponder.report()["ponders"] == 2 and ponder.report()["hit_rate"] == 0.5
+    #on the clock: time spent pondering before the human moved is search time saved
+    timed = Ponder(chess.WHITE, MAX_DEPTH, TranspositionTable(4), time_limit=0.2)
+    board.push(miss)
+    timed.start(board)
+    time.sleep(0.5)
+    start = time.perf_counter()
+    answer = timed.finish(timed.guess)
+    assert time.perf_counter() - start < 1.0 and timed.saved_seconds > 0.2
+    board.push(timed.guess)
+    assert answer in board.legal_moves
+
+
+#a profiled decision leaves flamegraph, cProfile and summary files, and counts every node by ply
+def test_profile_decision():
+    board = chess.Board(OPENING_FENS["Queen's Gambit"])
+    _, stats = search_move(board, board.turn, 3)
+    assert stats.ply_nodes is None and "ply_nodes" not in stats.as_dict()
+    with tempfile.TemporaryDirectory() as tmp:
+        _, stats = search_move(board, board.turn, 3, options=SearchOptions(qdepth=2), profile=tmp)
+        assert sum(stats.ply_nodes.values()) == stats.nodes and max(stats.ply_nodes) == stats.max_ply
+        _, minimax = minmax_search_move(board, board.turn, 2, profile=tmp)
+        assert sum(minimax.ply_nodes.values()) == minimax.nodes
+        names = sorted(os.listdir(tmp))
+        assert [os.path.splitext(n)[1] for n in names] == [".collapsed", ".pstats", ".txt"] * 2
+        with open(os.path.join(tmp, names[0]), encoding="utf-8") as f:
+            lines = f.read().splitlines()
+        for line in lines:
+            stack, count = line.rsplit(" ", 1)
+            assert stack.startswith("chess_run:search_move") and int(count) > 0
+        with open(os.path.join(tmp, names[2]), encoding="utf-8") as f:
+            assert f"1 decision(s), {stats.nodes} nodes" in f.readline()
+
+
+if __name__ == "__main__":
+    test_zobrist_incremental()
+    test_search_matches_minimax()
+    test_scores_match_reference_minimax()
+    test_tt_reused_across_moves()
+    test_staged_moves_cover_legal_moves()
+    test_killers_history_and_cutoff_rate()
+    test_quiescence_sees_recapture()
+    test_parallel_search_deterministic()
+    test_time_limited_move()
+    test_search_telemetry()
+    test_selective_search_switches()
+    test_pvs_and_aspiration_scores()
+    test_pvs_matches_full_window_with_evaluate()
+    test_seeded_ties_are_reproducible()
+    test_static_exchange()
+    test_ponder_hit_and_miss()
+    test_profile_decision()
+    print("all search tests passed")
@@ -0,0 +1,116 @@
+from server import GameServer
+import asyncio
+import chess
+import json
+import time
+
+
+async def _connect(port: int):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+
+    async def ask(line: str, replies: int = 1) -> list[str]:
+        writer.write((line + "\n").encode())
+        await writer.drain()
+        return [(await reader.readline()).decode().strip() for _ in range(replies)]
+
+    return ask, writer
+
+
+async def _play(port: int, moves: int, new: str = "new white depth 2 budget 5") -> list[str]:
+    ask, writer = await _connect(port)
+    replies = await ask(new)
+    board = chess.Board(replies[0].split(maxsplit=2)[2])
+    for _ in range(moves):
+        mv = sorted(board.legal_moves, key=lambda m: m.uci())[0]
+        board.push(mv)
+        replies = await ask(f"move {mv.uci()}")
+        bot = chess.Move.from_uci(replies[0].split()[1])
+        assert bot in board.legal_moves
+        board.push(bot)
+    assert (await ask("fen"))[0] == f"fen {board.fen()}"
+    await ask("quit")
+    writer.close()
+    return replies
+
+
+#several sessions at once, each with its own board, and the metrics count every bot move
+def test_concurrent_sessions():
+    async def scenario():
+        #one worker for four games, so their searches have to queue
+        server = GameServer(workers=1)
+        port = await server.start(port=0)
+        try:
+            await asyncio.gather(*[_play(port, 3, "new white depth 3 budget 5") for _ in range(4)])
+            ask, writer = await _connect(port)
+            metrics = json.loads((await ask("metrics"))[0].split(maxsplit=1)[1])
+            writer.close()
+        finally:
+            await server.close()
+        assert metrics["sessions_total"] == 4 and metrics["moves"] == 12
+        assert metrics["queue_depth"] == 0 and metrics["max_queue_depth"] >= 1
+        assert metrics["latency"]["max"] >= metrics["queue_wait"]["max"]
+
+    asyncio.run(scenario())
+
+
+#a long search holds one worker; a shallow game on the other worker keeps moving
+def test_slow_search_does_not_stall_others():
+    async def scenario():
+        server = GameServer(workers=2)
+        port = await server.start(port=0)
+        try:
+            ask, writer = await _connect(port)
+            #the bot (white) moves first and may think for budget / 30 = 1.5 s
+            slow = asyncio.create_task(ask("new black depth 30 budget 45", replies=2))
+            await asyncio.sleep(0.3)
+            start = time.perf_counter()
+            await _play(port, 2, "new white depth 1 budget 5")
+            fast = time.perf_counter() - start
+            replies = await slow
+            slow_seconds = time.perf_counter() - start
+            writer.close()
+        finally:
+            await server.close()
+        assert replies[1].startswith("bot ")
+        assert fast < slow_seconds
+
+    asyncio.run(scenario())
+
+
+def test_errors_and_game_over():
+    async def scenario():
+        server = GameServer(workers=1)
+        port = await server.start(port=0)
+        try:
+            ask, writer = await _connect(port)
+            assert (await ask("move e2e4"))[0].startswith("error")
+            for budget in ("-5", "nan", "inf", "lots"):
+                assert (await ask(f"new white budget {budget}"))[0].startswith("error"), budget
+            await ask("new white depth 1 fen 6k1/5ppp/8/8/8/8/5PPP/R5K1 w - - 0 1")
+            assert (await ask("move a1a9"))[0].startswith("error")
+            writer.close()
+            ask, writer = await _connect(port)
+            await ask("new white depth 1 fen 6k1/5ppp/8/8/8/8/5PPP/R5K1 w - - 0 1")
+            assert await ask("move a1a8") == ["gameover 1-0 checkmate"]
+            assert (await ask("move a8a7"))[0] == "error not your move"
+            writer.close()
+            #a line past the stream limit gets an error reply and the connection is closed
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.write(b"x" * 100_000 + b"\n")
+            await writer.drain()
+            assert (await reader.readline()).startswith(b"error")
+            assert await reader.read() == b""
+            writer.close()
+            await asyncio.sleep(0.05)
+            assert server.metrics.sessions_active == 0
+        finally:
+            await server.close()
+
+    asyncio.run(scenario())
+
+
+if __name__ == "__main__":
+    test_concurrent_sessions()
+    test_slow_search_does_not_stall_others()
+    test_errors_and_game_over()
+    print("all server tests passed")
@@ -0,0 +1,93 @@
+from chess_run import *
+from tablebase import TB_WIN_SCORE, Tablebase, load_tablebase
+import chess
+import os
+
+
+class QueenTables:
+    """Stand-in for chess.syzygy.Tablebase on K+Q vs K / K vs K: the queen side wins,
+    and DTZ is the losing king's distance from the corner it is driven to."""
+
+    def get_wdl(self, board, default=None):
+        if board.pieces(chess.QUEEN, board.turn):
+            return 2
+        if board.pieces(chess.QUEEN, not board.turn):
+            return -2
+        return 0
+
+    def get_dtz(self, board, default=None):
+        wdl = self.get_wdl(board)
+        if not wdl:
+            return 0
+        loser = board.king(not board.turn if wdl > 0 else board.turn)
+        distance = chess.square_distance(loser, chess.A1) + 1
+        return distance if wdl > 0 else -distance
+
+    def close(self):
+        pass
+
+
+def _tablebase() -> Tablebase:
+    return Tablebase(QueenTables(), max_pieces=3)
+
+
+#at the root: mate when there is one, grab the hanging queen, otherwise drive the king
+def test_root_moves_from_tables():
+    tb = _tablebase()
+    board = chess.Board("7k/8/6K1/8/8/8/8/1Q6 w - - 0 1")
+    stats = SearchStats()
+    mv = tb.best_move(board, stats)
+    board.push(mv)
+    assert board.is_checkmate() and stats.tb_probes > 0
+    assert tb.best_move(chess.Board("8/8/8/8/8/8/6Qk/4K3 b - - 0 1")) == chess.Move.from_uci("h2g2")
+    assert tb.best_move(chess.Board()) is None
+    mv, stats = search_move(chess.Board("8/8/8/8/8/8/6Qk/4K3 b - - 0 1"), chess.BLACK, 3, tablebase=tb)
+    assert mv.uci() == "h2g2" and stats.tablebase and stats.nodes == 0
+
+
+#inside the search covered nodes are exact leaves: fewer nodes, a winning score, counted probes
+def test_search_uses_tables():
+    board = chess.Board("Q6r/8/3k4/8/8/8/8/4K3 w - - 0 1")
+    plain = SearchContext(TranspositionTable(1))
+    search(board, 3, -10**9, 10**9, chess.WHITE, ctx=plain)
+    ctx = SearchContext(TranspositionTable(1))
+    ctx.tablebase = _tablebase()
+    score, _ = search(board, 3, -10**9, 10**9, chess.WHITE, ctx=ctx)
+    #Qxh8 (or a fork that wins the rook a move later) reaches a won K+Q vs K
+    assert score == VAL[chess.ROOK] + TB_WIN_SCORE
+    assert ctx.stats.tb_hits > 0 and ctx.stats.nodes < plain.stats.nodes
+    assert ctx.tablebase.stats()["hits"] > 0
+
+
+def test_probe_cache_is_bounded():
+    tb = Tablebase(QueenTables(), max_pieces=3, cache_size=4)
+    for sq in range(8, 20):
+        board = chess.Board(None)
+        board.set_piece_at(chess.A1, chess.Piece(chess.KING, chess.WHITE))
+        board.set_piece_at(chess.H8, chess.Piece(chess.KING, chess.BLACK))
+        board.set_piece_at(sq, chess.Piece(chess.QUEEN, chess.WHITE))
+        assert tb.wdl(board) == 2 and tb.wdl(board) == 2
+    assert tb.stats()["hits"] == tb.stats()["misses"] == 12 and tb.stats()["cached"] == 4
+
+
+#with real tables (SYZYGY_PATH=/path/to/syzygy), K+Q vs K is won from the root
+def test_real_tables():
+    directory = os.environ.get("SYZYGY_PATH")
+    if not directory:
+        return
+    tb = load_tablebase(directory)
+    board = chess.Board("8/8/3k4/8/8/8/8/1Q2K3 w - - 0 1")
+    assert tb.wdl(board) == 2
+    for _ in range(40):
+        if board.is_game_over():
+            break
+        board.push(tb.best_move(board))
+    assert board.is_checkmate()
+
+
+if __name__ == "__main__":
+    test_root_moves_from_tables()
+    test_search_uses_tables()
+    test_probe_cache_is_bounded()
+    test_real_tables()
+    print("all tablebase tests passed")
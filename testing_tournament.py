@@ -0,0 +1,101 @@
+from tournament import *
+from tournament import _load_checkpoint, _play_game
+import csv
+import os
+import tempfile
+
+
+#a checkpointed game resumes from its saved moves, and finished jobs are skipped on rerun
+def test_resume_from_checkpoint():
+    with tempfile.TemporaryDirectory() as tmp:
+        output = os.path.join(tmp, "results.csv")
+        ckpt_dir = os.path.join(tmp, "checkpoints")
+        os.makedirs(ckpt_dir)
+        jobs = expand_manifest({
+            "openings": ["Start"],
+            "configs": [{"minimax_color": "white", "depth_minimax": 1, "depth_alphabeta": 1, "repetitions": 1}],
+        })
+        #fool's mate already on the board, plus a torn line from a crash mid-write
+        with open(checkpoint_path(ckpt_dir, jobs[0]), "w", encoding="utf-8") as f:
+            f.write(jobs[0].job_id + "\nf2f3\ne7e5\ng2g4\nd8h4\ne2e")
+        assert run_tournament(jobs, output, ckpt_dir, processes=1) == 1
+        with open(output, newline="", encoding="utf-8") as f:
+            rows = list(csv.DictReader(f))
+        assert [(r["job_id"], r["outcome"], r["winner"]) for r in rows] == [(jobs[0].job_id, "checkmate", "black")]
+        assert not os.listdir(ckpt_dir)
+        assert run_tournament(jobs, output, ckpt_dir, processes=1) == 0
+        #with a profile directory each game played gets its profile files
+        profiles = os.path.join(tmp, "profiles")
+        assert run_tournament(jobs, os.path.join(tmp, "again.csv"), ckpt_dir, processes=1, profile=profiles) == 1
+        prefix = f"game-{job_digest(jobs[0])}"
+        assert sorted(os.listdir(profiles)) == [prefix + ext for ext in (".collapsed", ".pstats", ".txt")]
+
+
+#moves saved after a torn line (or a torn job id) start on a line of their own
+def test_resume_after_torn_line():
+    with tempfile.TemporaryDirectory() as tmp:
+        job = expand_manifest({
+            "openings": ["Start"],
+            "configs": [{"minimax_color": "white", "depth_minimax": 1, "depth_alphabeta": 1}],
+        })[0]
+        path = checkpoint_path(tmp, job)
+        for torn, kept in ((job.job_id + "\ne2e4\ne7e5\ng1f", ["e2e4", "e7e5"]), (job.job_id[:2], [])):
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(torn)
+            _, _, moves, _ = _play_game(job, tmp, None, None, None, None)
+            with open(path, encoding="utf-8") as f:
+                lines = f.read().split("\n")
+            assert lines[0] == job.job_id and lines[-1] == "" and lines[1:-1] == moves
+            assert moves[:len(kept)] == kept and len(moves) > len(kept)
+            #and the rewritten file resumes
+            assert _load_checkpoint(path) == moves
+
+
+def test_manifest_shards_cover_jobs_once():
+    jobs = expand_manifest({
+        "openings": ["Queen's Gambit", "Start"],
+        "configs": [
+            {"minimax_color": "white", "depth_minimax": 2, "depth_alphabeta": 3, "repetitions": 3},
+            {"minimax_color": "white", "depth_minimax": 2, "depth_alphabeta": 3, "repetitions": 2},
+        ],
+    })
+    ids = [job.job_id for job in jobs]
+    assert len(ids) == len(set(ids)) == 10
+    sharded = [job.job_id for i in range(3) for job in shard_jobs(jobs, i, 3)]
+    assert sorted(sharded) == sorted(ids)
+
+
+#a config's options reach the alpha-beta bot and keep its jobs apart from plain ones
+def test_manifest_options():
+    jobs = expand_manifest({
+        "openings": ["Start"],
+        "configs": [
+            {"minimax_color": "white", "depth_minimax": 2, "depth_alphabeta": 3},
+            {"minimax_color": "white", "depth_minimax": 2, "depth_alphabeta": 3,
+             "options": {"null_move": 2, "futility_margin": 0.5}},
+        ],
+    })
+    assert jobs[0].job_id == "Start|white|2|3|0" and jobs[0].search_options() == SearchOptions()
+    assert jobs[1].options == "futility_margin=0.5,null_move=2"
+    assert jobs[1].search_options() == SearchOptions(null_move=2, futility_margin=0.5)
+    #repetitions seed the tie-break with their number unless the options fix a seed
+    jobs = expand_manifest({"openings": ["Start"], "configs": [
+        {"minimax_color": "white", "depth_minimax": 2, "depth_alphabeta": 3, "repetitions": 2},
+        {"minimax_color": "white", "depth_minimax": 2, "depth_alphabeta": 3, "repetitions": 2,
+         "options": {"seed": 7}}]})
+    assert [job.search_options().seed for job in jobs] == [0, 1, 7, 7]
+    try:
+        expand_manifest({"openings": ["Start"], "configs": [
+            {"minimax_color": "white", "depth_minimax": 2, "depth_alphabeta": 3, "options": {"nul_move": 2}}]})
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("unknown option accepted")
+
+
+if __name__ == "__main__":
+    test_resume_from_checkpoint()
+    test_resume_after_torn_line()
+    test_manifest_shards_cover_jobs_once()
+    test_manifest_options()
+    print("all tournament tests passed")
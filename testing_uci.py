@@ -0,0 +1,133 @@
+from chess_run import MATE_SCORE
+from telemetry import SearchStats
+from uci import UCIEngine, parse_position, score_field, think_time
+import chess
+import time
+
+
+def _bestmove(lines: list[str]) -> chess.Move:
+    return chess.Move.from_uci(lines[-1].split()[1])
+
+
+def test_handshake_and_fixed_depth():
+    out = []
+    engine = UCIEngine(out.append)
+    engine.handle("uci")
+    assert out[0].startswith("id name") and out[-1] == "uciok"
+    engine.handle("isready")
+    assert out[-1] == "readyok"
+    engine.handle("position startpos moves e2e4 e7e5 g1f3")
+    engine.handle("go depth 2")
+    engine.wait()
+    board = parse_position("startpos moves e2e4 e7e5 g1f3".split())
+    assert board.turn == chess.BLACK and _bestmove(out) in board.legal_moves
+    assert out[-2].startswith("info depth 2")
+    fen = "6k1/5ppp/8/8/8/8/5PPP/R5K1 w - - 0 1"
+    engine.handle(f"position fen {fen}")
+    engine.handle("go movetime 200")
+    engine.wait()
+    #mates are scored alike whatever their length, so only the sign is certain
+    assert _bestmove(out) in chess.Board(fen).legal_moves
+    assert int(out[-2].split("score mate ")[1].split()[0]) > 0
+    assert " pv " + out[-1].split()[1] in out[-2]
+    assert not engine.handle("quit")
+
+
+#stop arrives on the reading thread while the search runs in its own
+def test_stop_interrupts_infinite_search():
+    out = []
+    engine = UCIEngine(out.append)
+    engine.handle("position startpos")
+    engine.handle("go infinite")
+    time.sleep(0.3)
+    engine.handle("isready")
+    assert out[-1] == "readyok"
+    start = time.perf_counter()
+    engine.handle("stop")
+    assert time.perf_counter() - start < 1.0
+    assert _bestmove(out) in chess.Board().legal_moves
+
+
+#a new position or go during go infinite ends the running search instead of waiting for stop
+def test_position_stops_infinite_search():
+    out = []
+    engine = UCIEngine(out.append)
+    engine.handle("position startpos")
+    engine.handle("go infinite")
+    time.sleep(0.3)
+    start = time.perf_counter()
+    engine.handle("position startpos moves e2e4")
+    assert time.perf_counter() - start < 1.0
+    assert out[-1].startswith("bestmove")
+    engine.handle("go infinite")
+    time.sleep(0.3)
+    engine.handle("go depth 1")
+    engine.wait()
+    assert sum(line.startswith("bestmove") for line in out) == 3
+
+
+def test_bad_hash_value():
+    out = []
+    engine = UCIEngine(out.append)
+    tt = engine.tt
+    engine.handle("setoption name Hash value lots")
+    assert out[-1].startswith("info string") and engine.tt is tt
+    engine.handle("setoption name Hash value 2")
+    assert engine.hash_mb == 2
+
+
+#a malformed go is answered and the engine keeps reading; depths past MAX_DEPTH are capped
+def test_bad_go_values():
+    out = []
+    engine = UCIEngine(out.append)
+    engine.handle("position fen 6k1/5ppp/8/8/8/8/5PPP/R5K1 w - - 0 1")
+    assert engine.handle("go wtime abc")
+    assert out[-1].startswith("info string") and "wtime" in out[-1]
+    engine.handle("go depth 1000 movetime 100")
+    engine.wait()
+    assert _bestmove(out) in engine.board.legal_moves
+
+
+def test_mated_score():
+    board = chess.Board("7k/8/8/8/8/1r6/r7/6K1 w - - 0 1")
+    stats = SearchStats(score=-MATE_SCORE * 2, depth=4, pv=["g1h1", "b3b1"])
+    assert score_field(board, stats) == "mate -1"
+    #a line that doesn't end in mate falls back to the searched depth
+    stats.pv = ["g1h1"]
+    assert score_field(board, stats) == "mate -2"
+    assert score_field(board, SearchStats(score=0.5)) == "cp 50"
+
+
+#ucinewgame keeps the table, so a repeated search finds its old entries
+def test_ucinewgame_keeps_table_warm():
+    engine = UCIEngine(lambda line: None)
+    engine.handle("position startpos")
+    engine.handle("go depth 3")
+    engine.wait()
+    tt = engine.tt
+    hits = tt.stats()["hits"]
+    engine.handle("ucinewgame")
+    engine.handle("position startpos")
+    engine.handle("go depth 3")
+    engine.wait()
+    assert engine.tt is tt and tt.stats()["hits"] > hits
+
+
+def test_think_time():
+    board = chess.Board()
+    assert think_time(board, {"movetime": 500}) == 0.5
+    assert think_time(board, {"depth": 3}) is None
+    assert think_time(board, {"wtime": 60000, "btime": 1000, "movestogo": 20}) == 3.0
+    assert think_time(board, {"wtime": 100, "btime": 100}) < 0.1
+
+
+if __name__ == "__main__":
+    test_handshake_and_fixed_depth()
+    test_stop_interrupts_infinite_search()
+    test_position_stops_infinite_search()
+    test_bad_hash_value()
+    test_bad_go_values()
+    test_mated_score()
+    test_ucinewgame_keeps_table_warm()
+    test_think_time()
+    print("all uci tests passed")
@@ -0,0 +1,404 @@
+"""
+Resumable minimax-vs-alphabeta tournament runner.
+
+    python tournament.py manifest.json --output results.csv --checkpoints checkpoints/
+    python tournament.py manifest.json --output results_0.csv --shard 0 --num-shards 4
+    python tournament.py manifest.json --book default      # or a Polyglot .bin / a .pgn file
+    python tournament.py manifest.json --pgn games.pgn --archive games.bin
+    python tournament.py manifest.json --syzygy /path/to/syzygy
+    python tournament.py manifest.json --cache positions.db
+    python tournament.py manifest.json --profile profiles/
+
+The manifest lists openings and match configs:
+
+    {
+      "openings": ["Polish Opening: King's Indian Variation, Sokolsky Attack"],
+      "configs": [
+        {"minimax_color": "white", "depth_minimax": 2, "depth_alphabeta": 3, "repetitions": 10},
+        {"minimax_color": "white", "depth_minimax": 2, "depth_alphabeta": 3, "repetitions": 10,
+         "options": {"null_move": 2}}
+      ]
+    }
+
+Opening names are keys of OPENING_FENS ("Start" is the standard position).
+A config's "options" are SearchOptions fields for the alpha-beta bot (e.g. one of
+null_move, lmr_moves, futility_margin), so each technique can be compared with
+plain alpha-beta on node counts and results. Unless they set a seed, the alpha-beta
+bot breaks ties with the repetition number as its seed, so repetitions play
+different games and a rerun plays the same ones.
+Every game gets a stable job id. Jobs already in the output CSV are skipped.
+Each game's moves are appended and fsynced to a checkpoint file as they are
+played, so a restarted run replays them and carries on mid-game. With
+--num-shards N, shard i runs jobs i, i+N, i+2N, ...; give every shard its own
+output file. With --book, both bots play book moves while the position is in
+the book; each row reports the book hit rate and the search time it saved. With --pgn
+and/or --archive every finished game is also kept (see game_archive.py), written
+before its result row so a crash in between repeats a game rather than losing it.
+With --syzygy, both bots play covered endgames from the tablebase; the rows
+count tablebase moves and probes and the search time they saved. With --cache,
+every worker backs both bots' transposition tables with one SQLite file (see
+position_cache.py), so positions searched in earlier games, or earlier runs,
+are not searched again. With --profile, every game is profiled into that
+directory (see profiling.py): a flamegraph-ready .collapsed file of its sampled
+stacks, the cProfile .pstats and a .txt summary with the nodes searched per ply.
+"""
+import argparse
+import csv
+import hashlib
+import json
+import multiprocessing as mp
+import os
+from dataclasses import replace
+from typing import NamedTuple, Optional
+
+import chess
+
+from chess_run import SearchOptions, parse_color, run_game_two_bots_minmax_vs_pruning, side_name
+from engine import forking
+from game_archive import GameArchive, append_pgn, game_pgn
+from opening_book import OPENING_FENS, load_book
+from position_cache import PositionCache
+from profiling import Profile
+from tablebase import load_tablebase
+from telemetry import GameTelemetry, SearchStats, aggregate_columns
+
+OUTCOME_LABELS = {
+    0: "game_over",
+    1: "checkmate",
+    2: "stalemate",
+    3: "insufficient_material",
+    4: "seventyfive_move_rule",
+    5: "fivefold_repetition",
+}
+
+CSV_COLUMNS = ["job_id", "opening", "minimax_color", "alphabeta_color",
+               "depth_minimax", "depth_alphabeta", "alphabeta_options", "outcome", "winner"] + aggregate_columns()
+
+
+class Job(NamedTuple):
+    opening: str
+    minimax_color: chess.Color
+    depth_minimax: int
+    depth_alphabeta: int
+    repetition: int
+    # alpha-beta SearchOptions as "name=value,..." (see options_spec), "" for the defaults
+    options: str = ""
+
+    @property
+    def job_id(self) -> str:
+        job_id = (f"{self.opening}|{side_name(self.minimax_color)}|"
+                  f"{self.depth_minimax}|{self.depth_alphabeta}|{self.repetition}")
+        return f"{job_id}|{self.options}" if self.options else job_id
+
+    def search_options(self) -> SearchOptions:
+        options = parse_options(self.options)
+        if any(item.split("=", 1)[0] == "seed" for item in self.options.split(",")):
+            return options
+        return replace(options, seed=self.repetition)
+
+
+def options_spec(options: dict) -> str:
+    """Canonical text for a manifest's options dict; checks the names against SearchOptions."""
+    try:
+        SearchOptions(**options)
+    except TypeError as e:
+        raise ValueError(f"bad options in manifest: {e}") from None
+    return ",".join(f"{name}={json.dumps(options[name])}" for name in sorted(options))
+
+
+def parse_options(spec: str) -> SearchOptions:
+    if not spec:
+        return SearchOptions()
+    return SearchOptions(**{name: json.loads(value) for name, value in
+                            (item.split("=", 1) for item in spec.split(","))})
+
+
+def opening_fen(name: str) -> str:
+    if name == "Start":
+        return chess.STARTING_FEN
+    return OPENING_FENS[name]
+
+
+def load_manifest(path: str) -> list[Job]:
+    """Expand a manifest file into its job list, in a stable order."""
+    with open(path, encoding="utf-8") as f:
+        manifest = json.load(f)
+    return expand_manifest(manifest)
+
+
+def expand_manifest(manifest: dict) -> list[Job]:
+    jobs = []
+    #a config listed twice adds more repetitions rather than duplicate job ids
+    seen: dict[tuple, int] = {}
+    for opening in manifest["openings"]:
+        opening_fen(opening)  # fail early on unknown names
+        for cfg in manifest["configs"]:
+            color = parse_color(cfg["minimax_color"])
+            if color is None:
+                raise ValueError(f"bad minimax_color in manifest: {cfg['minimax_color']!r}")
+            options = options_spec(cfg.get("options", {}))
+            match = (opening, color, cfg["depth_minimax"], cfg["depth_alphabeta"], options)
+            first = seen.get(match, 0)
+            count = cfg.get("repetitions", 1)
+            seen[match] = first + count
+            for rep in range(first, first + count):
+                jobs.append(Job(*match[:4], rep, options))
+    return jobs
+
+
+def shard_jobs(jobs: list[Job], shard: int, num_shards: int) -> list[Job]:
+    return jobs[shard::num_shards]
+
+
+def completed_job_ids(output_path: str) -> set[str]:
+    if not os.path.exists(output_path):
+        return set()
+    with open(output_path, newline="", encoding="utf-8") as f:
+        return {row["job_id"] for row in csv.DictReader(f) if row.get("job_id")}
+
+
+def job_digest(job: Job) -> str:
+    """Short file-name-safe stand-in for the job id."""
+    return hashlib.sha1(job.job_id.encode("utf-8")).hexdigest()[:16]
+
+
+def checkpoint_path(checkpoint_dir: str, job: Job) -> str:
+    return os.path.join(checkpoint_dir, f"{job_digest(job)}.moves")
+
+
+def _load_checkpoint(path: str) -> list[str]:
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding="utf-8") as f:
+        #first line is the job id, a torn last line (crash mid-write) is dropped
+        lines = f.read().split("\n")
+    return [u for u in lines[1:-1] if u]
+
+
+def _rewrite_checkpoint(path: str, job: Job, moves: list[str]) -> None:
+    """Replace the file with the job id and moves, so that appending to it doesn't
+    extend a torn line; written aside and renamed, so a crash keeps one or the other."""
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write("".join(line + "\n" for line in [job.job_id] + moves))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+#books loaded in this process, by spec
+_books: dict = {}
+
+
+def _book(spec: Optional[str]):
+    if spec is None:
+        return None
+    if spec not in _books:
+        _books[spec] = load_book(spec)
+    return _books[spec]
+
+
+#tablebases opened in this process, by directory
+_tablebases: dict = {}
+
+
+def _tablebase(directory: Optional[str]):
+    if directory is None:
+        return None
+    if directory not in _tablebases:
+        _tablebases[directory] = load_tablebase(directory)
+    return _tablebases[directory]
+
+
+#position caches opened in this process, by file and search variant
+_caches: dict = {}
+
+
+def _cache(path: Optional[str], variant: str):
+    if path is None:
+        return None
+    if (path, variant) not in _caches:
+        _caches[path, variant] = PositionCache(path, variant)
+    return _caches[path, variant]
+
+
+def cache_variants(job: Job, syzygy: Optional[str]) -> tuple[str, str]:
+    """Cache variants of the job's minimax and alpha-beta bots: results are shared
+    only between searches that would score a position the same way."""
+    tables = f"|syzygy={syzygy}" if syzygy else ""
+    return "minimax" + tables, f"alphabeta|{job.options}" + tables
+
+
+def game_headers(job: Job, row: list) -> dict:
+    """PGN headers for a finished job: players, depths, opening and search time per side."""
+    values = dict(zip(CSV_COLUMNS, row))
+    names = {job.minimax_color: f"minimax depth {job.depth_minimax}",
+             not job.minimax_color: f"alphabeta depth {job.depth_alphabeta}"}
+    return {
+        "Event": "minimax vs alphabeta",
+        "Round": job.repetition + 1,
+        "White": names[chess.WHITE],
+        "Black": names[chess.BLACK],
+        "Opening": job.opening,
+        "JobId": job.job_id,
+        "MinimaxColor": side_name(job.minimax_color),
+        "MinimaxDepth": job.depth_minimax,
+        "AlphaBetaDepth": job.depth_alphabeta,
+        "AlphaBetaOptions": job.options,
+        "MinimaxSeconds": values["minimax_seconds"],
+        "AlphaBetaSeconds": values["alphabeta_seconds"],
+        "Termination": values["outcome"],
+    }
+
+
+def _play_job(args) -> tuple[Job, list, list, list]:
+    """Pool worker: replay the job's checkpoint (if any) and play the game to the end.
+    Returns the result row, the game's moves (UCI) and each move's search seconds
+    (None for moves replayed from the checkpoint). Search aggregates cover the moves
+    searched in this run only."""
+    job, checkpoint_dir, trace_path, book_spec, syzygy, cache_path, profile_dir = args
+    if profile_dir is None:
+        return _play_game(job, checkpoint_dir, trace_path, book_spec, syzygy, cache_path)
+    #every search of the game adds to this profile (see profiling.decision_profile)
+    with Profile(os.path.join(profile_dir, f"game-{job_digest(job)}"), title=job.job_id):
+        return _play_game(job, checkpoint_dir, trace_path, book_spec, syzygy, cache_path)
+
+
+def _play_game(job, checkpoint_dir, trace_path, book_spec, syzygy, cache_path):
+    telemetry = GameTelemetry(job.job_id, trace_path)
+    board = chess.Board(opening_fen(job.opening))
+    path = checkpoint_path(checkpoint_dir, job)
+    moves = _load_checkpoint(path)
+    for uci in moves:
+        board.push_uci(uci)
+    replayed = len(board.move_stack)
+    _rewrite_checkpoint(path, job, moves)
+    minimax_variant, alphabeta_variant = cache_variants(job, syzygy)
+    with open(path, "a", encoding="utf-8") as ckpt:
+
+        def save(move: chess.Move, stats: SearchStats) -> None:
+            ckpt.write(move.uci() + "\n")
+            ckpt.flush()
+            os.fsync(ckpt.fileno())
+            telemetry.record(move, stats)
+
+        outcome, winner = run_game_two_bots_minmax_vs_pruning(
+            board, job.minimax_color, job.depth_minimax, job.depth_alphabeta, on_move=save,
+            book=_book(book_spec), tablebase=_tablebase(syzygy), options=job.search_options(),
+            tt_min_max=_cache(cache_path, minimax_variant), tt_alpha_beta=_cache(cache_path, alphabeta_variant),
+        )
+    if cache_path is not None:
+        #the last move's results, before the worker moves on to another job
+        for variant in (minimax_variant, alphabeta_variant):
+            _cache(cache_path, variant).flush()
+    row = [
+        job.job_id,
+        job.opening,
+        side_name(job.minimax_color),
+        side_name(not job.minimax_color),
+        job.depth_minimax,
+        job.depth_alphabeta,
+        job.options,
+        OUTCOME_LABELS.get(outcome, "unknown"),
+        winner,
+    ]
+    aggregates = telemetry.aggregates()
+    row += [aggregates[c] for c in aggregate_columns()]
+    seconds = [None] * replayed + [stats.seconds for _, stats in telemetry.moves]
+    return job, row, [mv.uci() for mv in board.move_stack], seconds
+
+
+def run_tournament(jobs: list[Job], output_path: str, checkpoint_dir: str = "checkpoints",
+                   processes: Optional[int] = None, trace_path: Optional[str] = None,
+                   book: Optional[str] = None, pgn_path: Optional[str] = None,
+                   archive_path: Optional[str] = None, syzygy: Optional[str] = None,
+                   cache: Optional[str] = None, profile: Optional[str] = None) -> int:
+    """Play every job not already in output_path; returns how many games were played.
+    trace_path, if given, gets one JSONL line of search stats per move.
+    book is a load_book spec ("default", a .bin or a .pgn path).
+    pgn_path / archive_path, if given, get every finished game (PGN / GameArchive).
+    syzygy is a directory of Syzygy tables for both bots.
+    cache is a PositionCache file shared by every worker (and kept for later runs).
+    profile is a directory that gets a profile of every game (see profiling.py)."""
+    done = completed_job_ids(output_path)
+    todo = [job for job in jobs if job.job_id not in done]
+    print(f"{len(jobs)} jobs, {len(jobs) - len(todo)} already done, {len(todo)} to play")
+    if not todo:
+        return 0
+    os.makedirs(checkpoint_dir, exist_ok=True)
+    new_file = not os.path.exists(output_path) or os.path.getsize(output_path) == 0
+    played = 0
+    totals = dict.fromkeys(("moves", "book_moves", "book_seconds_saved", "tb_moves", "tb_probes",
+                            "tb_seconds_saved"), 0)
+    archive = GameArchive(archive_path) if archive_path is not None else None
+    with open(output_path, "a", newline="", encoding="utf-8") as csvfile:
+        writer = csv.writer(csvfile)
+        if new_file:
+            writer.writerow(CSV_COLUMNS)
+            csvfile.flush()
+            os.fsync(csvfile.fileno())
+        #built here once; the forked workers inherit the book and tables
+        _book(book)
+        with forking(), mp.Pool(processes) as pool:
+            for job, row, moves, seconds in pool.imap_unordered(_play_job, [(job, checkpoint_dir, trace_path, book, syzygy, cache, profile) for job in todo], chunksize=1):
+                if pgn_path is not None or archive is not None:
+                    board = chess.Board(opening_fen(job.opening))
+                    for uci in moves:
+                        board.push_uci(uci)
+                    headers = game_headers(job, row)
+                    if pgn_path is not None:
+                        append_pgn(pgn_path, game_pgn(board, headers, seconds))
+                    if archive is not None:
+                        archive.append(board, headers)
+                writer.writerow(row)
+                csvfile.flush()
+                os.fsync(csvfile.fileno())
+                #the row is on disk, the move list is no longer needed to resume
+                os.remove(checkpoint_path(checkpoint_dir, job))
+                played += 1
+                values = dict(zip(CSV_COLUMNS, row))
+                for name in totals:
+                    totals[name] += values[f"minimax_{name}"] + values[f"alphabeta_{name}"]
+    if archive is not None:
+        archive.close()
+    if book is not None and totals["moves"]:
+        print(f"book: {totals['book_moves']}/{totals['moves']} moves from book "
+              f"({totals['book_moves'] / totals['moves']:.1%}), "
+              f"~{totals['book_seconds_saved']:.2f}s of search saved")
+    if syzygy is not None and totals["moves"]:
+        print(f"tablebase: {totals['tb_moves']}/{totals['moves']} moves from tables, "
+              f"{totals['tb_probes']} probes, ~{totals['tb_seconds_saved']:.2f}s of search saved")
+    if cache is not None:
+        with PositionCache(cache, size_mb=0) as positions:
+            print(f"position cache: {positions.entries()} entries in {cache}")
+    if profile is not None:
+        print(f"profiles: {played} games in {profile}")
+    return played
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Resumable minimax vs alpha-beta tournament.")
+    parser.add_argument("manifest", help="JSON job manifest")
+    parser.add_argument("--output", default="minimax_vs_alphabeta_results.csv")
+    parser.add_argument("--checkpoints", default="checkpoints", help="directory for in-progress move lists")
+    parser.add_argument("--shard", type=int, default=0)
+    parser.add_argument("--num-shards", type=int, default=1)
+    parser.add_argument("--processes", type=int, default=None, help="pool size (default: all cores)")
+    parser.add_argument("--trace", default=None, help="optional per-move JSONL search trace")
+    parser.add_argument("--book", default=None, help='opening book: "default", a Polyglot .bin or a .pgn file')
+    parser.add_argument("--pgn", default=None, help="append every finished game to this PGN file")
+    parser.add_argument("--archive", default=None, help="append every finished game to this binary archive")
+    parser.add_argument("--syzygy", default=None, help="directory of Syzygy endgame tables")
+    parser.add_argument("--cache", default=None, help="SQLite file of search results shared across workers and runs")
+    parser.add_argument("--profile", default=None, help="directory for a profile of every game (see profiling.py)")
+    args = parser.parse_args()
+    if not 0 <= args.shard < args.num_shards:
+        parser.error("--shard must be in [0, --num-shards)")
+    jobs = shard_jobs(load_manifest(args.manifest), args.shard, args.num_shards)
+    run_tournament(jobs, args.output, args.checkpoints, args.processes, args.trace, args.book,
+                   args.pgn, args.archive, args.syzygy, args.cache,
+                   args.profile)
+
+
+if __name__ == "__main__":
+    main()
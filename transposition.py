@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""Bounded transposition table shared by the alpha-beta and minimax searches."""
+from typing import NamedTuple, Optional
+
+import chess
+
+# bound types
+EXACT = 0
+LOWER = 1   # search failed high, true score >= stored score
+UPPER = 2   # search failed low, true score <= stored score
+
+# rough cost of one filled slot (list pointer + tuple + ints + Move), used to size the table
+ENTRY_BYTES = 200
+
+
+class TTEntry(NamedTuple):
+    key: int
+    depth: int
+    score: int          # from the point of view of the side to move
+    flag: int
+    move: Optional[chess.Move]
+    age: int
+
+
+class TranspositionTable:
+    """Fixed number of slots indexed by Zobrist key, sized from a memory budget.
+
+    A slot is overwritten when it is empty, was written during an older
+    search, or the new result was searched at least as deep.
+    """
+
+    def __init__(self, size_mb: float = 16) -> None:
+        self.size = max(1, int(size_mb * 1024 * 1024) // ENTRY_BYTES)
+        self.slots: list[Optional[TTEntry]] = [None] * self.size
+        self.age = 0
+        self.hits = 0
+        self.misses = 0
+        self.collisions = 0
+        self.stores = 0
+
+    def new_search(self) -> None:
+        """Start a new move decision; entries from earlier ones become replaceable."""
+        self.age += 1
+
+    def clear(self) -> None:
+        self.slots = [None] * self.size
+        self.age = 0
+        self.hits = self.misses = self.collisions = self.stores = 0
+
+    def probe(self, key: int, depth: int = 0) -> Optional[TTEntry]:
+        """Entry for key, or None. depth is the depth the caller is about to search
+        (unused here; position_cache.PositionCache skips its file for shallow nodes)."""
+        entry = self.slots[key % self.size]
+        if entry is None:
+            self.misses += 1
+            return None
+        if entry.key != key:
+            #slot is held by another position
+            self.collisions += 1
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry
+
+    def store(self, key: int, depth: int, score: int, flag: int, move: Optional[chess.Move]) -> None:
+        idx = key % self.size
+        old = self.slots[idx]
+        if old is None or old.age != self.age or depth >= old.depth:
+            self.slots[idx] = TTEntry(key, depth, score, flag, move, self.age)
+            self.stores += 1
+
+    def stats(self) -> dict:
+        used = sum(1 for e in self.slots if e is not None)
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "collisions": self.collisions,
+            "stores": self.stores,
+            "size": self.size,
+            "fill": used / self.size,
+        }
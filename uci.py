@@ -0,0 +1,221 @@
+"""
+UCI front end for choose_bot_move, for GUIs, cutechess-cli and the match server.
+
+    python uci.py
+
+Supported: uci, isready, setoption (Hash, OwnBook, Compact), ucinewgame,
+position startpos|fen ... [moves ...], go [depth N] [movetime MS] [wtime MS]
+[btime MS] [winc MS] [binc MS] [movestogo N] [infinite], stop, quit.
+
+The search runs in its own thread while this one keeps reading commands, so
+stop (and quit) end it early: the move of the deepest finished iteration is
+sent as bestmove. A position, go or ucinewgame that arrives while a search is
+running (e.g. go infinite without a stop) stops it first. The transposition table lives as long as the process;
+ucinewgame only ages it, so one engine process can play many games warm.
+"""
+import sys
+import threading
+from typing import Callable, Optional
+
+import chess
+
+from chess_run import MATE_SCORE, MAX_DEPTH, SearchOptions, search_move
+from opening_book import default_book
+from transposition import TranspositionTable
+
+ENGINE_NAME = "CS 290 Chess Bot"
+DEFAULT_HASH_MB = 16
+# games are assumed to last this many more moves when the GUI gives no movestogo
+MOVES_TO_GO = 30
+
+
+def think_time(board: chess.Board, params: dict) -> Optional[float]:
+    """Seconds to spend on this move from the go parameters, or None for no clock."""
+    if "movetime" in params:
+        return params["movetime"] / 1000
+    left = params.get("wtime" if board.turn == chess.WHITE else "btime")
+    if left is None:
+        return None
+    inc = params.get("winc" if board.turn == chess.WHITE else "binc", 0)
+    budget = left / params.get("movestogo", MOVES_TO_GO) + inc * 0.8
+    #never plan to use more than half of what is left
+    return max(min(budget, left / 2), 1) / 1000
+
+
+def parse_go(tokens: list[str]) -> dict:
+    """Parameters of a go command; ValueError if a number isn't one."""
+    params = {}
+    i = 0
+    while i < len(tokens):
+        name = tokens[i]
+        if name == "infinite":
+            params["infinite"] = True
+        elif name in ("depth", "movetime", "wtime", "btime", "winc", "binc", "movestogo", "nodes", "mate"):
+            if i + 1 < len(tokens):
+                try:
+                    params[name] = int(tokens[i + 1])
+                except ValueError:
+                    raise ValueError(f"bad go {name} value {tokens[i + 1]!r}") from None
+                i += 1
+        i += 1
+    return params
+
+
+def parse_position(tokens: list[str]) -> chess.Board:
+    """Board for the arguments of a position command."""
+    if tokens and tokens[0] == "startpos":
+        board = chess.Board()
+        rest = tokens[1:]
+    elif tokens and tokens[0] == "fen":
+        end = tokens.index("moves") if "moves" in tokens else len(tokens)
+        board = chess.Board(" ".join(tokens[1:end]))
+        rest = tokens[end:]
+    else:
+        raise ValueError(f"bad position command: {' '.join(tokens)!r}")
+    if rest and rest[0] == "moves":
+        for uci in rest[1:]:
+            board.push_uci(uci)
+    return board
+
+
+def score_field(board: chess.Board, stats) -> str:
+    """The score part of an info line: cp, or mate N (negative when the engine is
+    the one mated) for a mate score. N counts the moves of the principal variation
+    if it ends in mate, else of the searched depth."""
+    #path sums of material stay far below MATE_SCORE, so only mates reach it
+    if abs(stats.score) < MATE_SCORE:
+        return f"cp {round(stats.score * 100)}"
+    line = board.copy(stack=False)
+    for uci in stats.pv:
+        line.push_uci(uci)
+    plies = len(stats.pv) if line.is_checkmate() else stats.depth
+    moves = (plies + 1) // 2
+    return f"mate {moves if stats.score > 0 else -moves}"
+
+
+class UCIEngine:
+    """One UCI session. handle() takes a command line and returns False after quit;
+    out receives every line the engine sends."""
+
+    def __init__(self, out: Callable[[str], None] = print) -> None:
+        self._out = out
+        self._out_lock = threading.Lock()
+        self.hash_mb = DEFAULT_HASH_MB
+        self.tt = TranspositionTable(self.hash_mb)
+        self.book = None
+        self.options = SearchOptions()
+        self.board = chess.Board()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def send(self, line: str) -> None:
+        with self._out_lock:
+            self._out(line)
+
+    def handle(self, line: str) -> bool:
+        tokens = line.split()
+        if not tokens:
+            return True
+        cmd, args = tokens[0], tokens[1:]
+        if cmd == "uci":
+            self.send(f"id name {ENGINE_NAME}")
+            self.send("id author CS 290")
+            self.send(f"option name Hash type spin default {DEFAULT_HASH_MB} min 1 max 4096")
+            self.send("option name OwnBook type check default false")
+            self.send("option name Compact type check default false")
+            self.send("uciok")
+        elif cmd == "isready":
+            self.send("readyok")
+        elif cmd == "setoption":
+            self._set_option(args)
+        elif cmd == "ucinewgame":
+            self.wait(stop=True)
+            #keep the table warm, just make this game's entries win replacement
+            self.tt.new_search()
+            self.board = chess.Board()
+        elif cmd == "position":
+            self.wait(stop=True)
+            try:
+                self.board = parse_position(args)
+            except ValueError as e:
+                self.send(f"info string {e}")
+        elif cmd == "go":
+            self.wait(stop=True)
+            try:
+                params = parse_go(args)
+            except ValueError as e:
+                self.send(f"info string {e}")
+            else:
+                self._go(params)
+        elif cmd == "stop":
+            self.wait(stop=True)
+        elif cmd == "quit":
+            self.wait(stop=True)
+            return False
+        else:
+            self.send(f"info string unknown command {cmd}")
+        return True
+
+    def _set_option(self, args: list[str]) -> None:
+        if "name" not in args:
+            return
+        end = args.index("value") if "value" in args else len(args)
+        name = " ".join(args[args.index("name") + 1:end]).lower()
+        value = " ".join(args[end + 1:])
+        if name == "hash":
+            try:
+                self.hash_mb = max(1, int(value))
+            except ValueError:
+                self.send(f"info string bad Hash value {value!r}")
+                return
+            self.tt = TranspositionTable(self.hash_mb)
+        elif name == "ownbook":
+            self.book = default_book() if value.lower() == "true" else None
+        elif name == "compact":
+            self.options = SearchOptions(compact=value.lower() == "true")
+
+    def _go(self, params: dict) -> None:
+        board = self.board.copy()
+        #the search keeps per-ply tables MAX_DEPTH deep
+        depth = max(1, min(MAX_DEPTH, params.get("depth", MAX_DEPTH)))
+        limit = None if params.get("infinite") else think_time(board, params)
+        if limit is None and "depth" not in params and not params.get("infinite"):
+            depth = 4
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._search, args=(board, depth, limit), daemon=True)
+        self._thread.start()
+
+    def _search(self, board: chess.Board, depth: int, limit: Optional[float]) -> None:
+        if board.is_game_over():
+            self.send("bestmove 0000")
+            return
+        mv, stats = search_move(board, board.turn, depth, tt=self.tt, time_limit=limit,
+                                options=self.options, book=self.book, stop=self._stop)
+        if not stats.book:
+            ms = int(stats.seconds * 1000)
+            nps = int(stats.nodes / stats.seconds) if stats.seconds else 0
+            pv = f" pv {' '.join(stats.pv)}" if stats.pv else ""
+            self.send(f"info depth {stats.depth} seldepth {stats.max_ply} score {score_field(board, stats)} "
+                      f"nodes {stats.nodes} nps {nps} time {ms}{pv}")
+        self.send(f"bestmove {mv.uci()}")
+
+    def wait(self, stop: bool = False) -> None:
+        """Wait for a running search to send its bestmove; stop=True ends it first."""
+        if self._thread is None:
+            return
+        if stop:
+            self._stop.set()
+        self._thread.join()
+        self._thread = None
+
+
+def main() -> None:
+    engine = UCIEngine(lambda line: print(line, flush=True))
+    for line in sys.stdin:
+        if not engine.handle(line):
+            break
+    engine.wait(stop=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+"""Polyglot Zobrist keys, computed once per root and updated move by move."""
+import chess
+import chess.polyglot
+
+_ARRAY = chess.polyglot.POLYGLOT_RANDOM_ARRAY
+_HASHER = chess.polyglot.ZobristHasher(_ARRAY)
+_TURN = _ARRAY[780]
+
+
+def board_key(board: chess.Board) -> int:
+    """Full Polyglot Zobrist hash of the position (same value as chess.polyglot)."""
+    return _HASHER(board)
+
+
+def _piece_key(piece_type: chess.PieceType, color: chess.Color, square: chess.Square) -> int:
+    return _ARRAY[64 * ((piece_type - 1) * 2 + int(color)) + square]
+
+
+def push_keyed(board: chess.Board, key: int, move: chess.Move) -> int:
+    """Push move onto board and return the key of the new position.
+
+    Only the squares the move touches are rehashed; castling rights and the
+    en passant file are taken off before the push and put back after it.
+    """
+    key ^= _HASHER.hash_castling(board) ^ _HASHER.hash_ep_square(board) ^ _TURN
+    if move:
+        color = board.turn
+        from_sq, to_sq = move.from_square, move.to_square
+        piece_type = board.piece_type_at(from_sq)
+        key ^= _piece_key(piece_type, color, from_sq)
+        if board.is_castling(move):
+            rank = chess.square_rank(from_sq)
+            if board.is_kingside_castling(move):
+                king_to, rook_to, rook_file = chess.square(6, rank), chess.square(5, rank), 7
+            else:
+                king_to, rook_to, rook_file = chess.square(2, rank), chess.square(3, rank), 0
+            #chess960 encodes castling as king-takes-rook
+            if board.occupied_co[color] & chess.BB_SQUARES[to_sq]:
+                rook_from = to_sq
+            else:
+                rook_from = chess.square(rook_file, rank)
+            key ^= _piece_key(chess.KING, color, king_to)
+            key ^= _piece_key(chess.ROOK, color, rook_from) ^ _piece_key(chess.ROOK, color, rook_to)
+        else:
+            if board.is_en_passant(move):
+                key ^= _piece_key(chess.PAWN, not color, to_sq - 8 if color == chess.WHITE else to_sq + 8)
+            else:
+                captured = board.piece_type_at(to_sq)
+                if captured:
+                    key ^= _piece_key(captured, not color, to_sq)
+            key ^= _piece_key(move.promotion or piece_type, color, to_sq)
+    board.push(move)
+    return key ^ _HASHER.hash_castling(board) ^ _HASHER.hash_ep_square(board)